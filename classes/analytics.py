@@ -0,0 +1,243 @@
+"""
+Utilisation, waiting time and bottleneck analytics over resource usage traces. A trace is the resource_usage
+DataFrame of Simulator (or the csv it writes), or a columnar equivalent: a dictionary with numpy arrays for the
+columns "Product", "Resource", "Machine_id", "Request moment", "Retrieve moment" and "Finish".
+All computations are numpy sweep-line passes, without filtering per product or per resource.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Product", "Resource", "Machine_id", "Request moment", "Retrieve moment", "Finish"]
+
+
+def to_columns(trace):
+    """
+    Convert a trace to a dictionary of numpy arrays, with the resource groups as integer codes
+    :return: dictionary with the columns, "group" (codes) and "groups" (names of the codes)
+    """
+    if isinstance(trace, dict) and "group" in trace:
+        return trace
+    columns = {name: np.asarray(trace[name]) for name in COLUMNS}
+    columns["groups"], columns["group"] = np.unique(columns["Resource"], return_inverse=True)
+    return columns
+
+
+def get_capacity(columns, capacity=None):
+    """
+    Number of machines per resource group (in the order of columns["groups"])
+    :param capacity: dictionary {resource group: capacity}, a Factory, or None to count the machines in the trace
+    """
+    if capacity is None:
+        counted = np.zeros(len(columns["groups"]))
+        np.maximum.at(counted, columns["group"], np.asarray(columns["Machine_id"]) + 1)
+        return counted
+    if hasattr(capacity, "CAPACITY"):
+        capacity = dict(zip(capacity.RESOURCE_NAMES, capacity.CAPACITY))
+    return np.array([capacity[group] for group in columns["groups"]])
+
+
+def busy_matrix(columns):
+    """
+    Sweep line over the claim intervals [Retrieve moment, Finish) of all machines
+    :return: times (T), busy (G x T), with busy[g, t] the number of machines of group g that is claimed
+             during [times[t], times[t + 1])
+    """
+    start = columns["Retrieve moment"]
+    finish = columns["Finish"]
+    times, index = np.unique(np.concatenate([start, finish]), return_inverse=True)
+    group = np.concatenate([columns["group"], columns["group"]])
+    delta = np.concatenate([np.ones(len(start)), -np.ones(len(finish))])
+    busy = np.zeros((len(columns["groups"]), len(times)))
+    np.add.at(busy, (group, index), delta)
+    return times, np.cumsum(busy, axis=1)
+
+
+def utilisation_curves(trace, capacity=None, by="Resource"):
+    """
+    Step curves of the number of claimed machines
+    :param by: "Resource" for a curve per resource group, "Machine" for a curve per machine (resource group and id)
+    :return: DataFrame with a row per breakpoint of a curve: the level holds from Time until the next breakpoint
+    """
+    columns = to_columns(trace)
+    if by == "Machine":
+        machines = np.char.add(np.char.add(columns["Resource"].astype(str), "_id="),
+                               columns["Machine_id"].astype(str))
+        columns["groups"], columns["group"] = np.unique(machines, return_inverse=True)
+        capacity = np.ones(len(columns["groups"]))
+    else:
+        capacity = get_capacity(columns, capacity)
+
+    group = np.concatenate([columns["group"], columns["group"]])
+    time = np.concatenate([columns["Retrieve moment"], columns["Finish"]])
+    delta = np.concatenate([np.ones(len(columns["group"])), -np.ones(len(columns["group"]))])
+    # Sort per group on time, releases before claims; each group sums to zero, so the running sum restarts per group
+    order = np.lexsort((delta, time, group))
+    group, time, level = group[order], time[order], np.cumsum(delta[order])
+    last = np.ones(len(group), dtype=bool)
+    last[:-1] = (group[1:] != group[:-1]) | (time[1:] != time[:-1])
+    curves = pd.DataFrame({by: columns["groups"][group[last]], "Time": time[last], "Busy": level[last]})
+    curves["Utilisation"] = curves["Busy"] / capacity[group[last]]
+    return curves
+
+
+def machine_utilisation(trace, horizon=None):
+    """
+    Fraction of the horizon (by default the makespan) that every machine is claimed
+    """
+    columns = to_columns(trace)
+    horizon = horizon or columns["Finish"].max()
+    table = pd.DataFrame({"Resource": columns["Resource"], "Machine_id": columns["Machine_id"],
+                          "Claimed": columns["Finish"] - columns["Retrieve moment"]})
+    table = table.groupby(["Resource", "Machine_id"], as_index=False)["Claimed"].sum()
+    table["Utilisation"] = table["Claimed"] / horizon
+    return table
+
+
+def _waiting(columns):
+    wait = columns["Retrieve moment"] - columns["Request moment"]
+    count = np.bincount(columns["group"], minlength=len(columns["groups"]))
+    total = np.bincount(columns["group"], weights=wait, minlength=len(columns["groups"]))
+    maximum = np.zeros(len(columns["groups"]))
+    np.maximum.at(maximum, columns["group"], wait)
+    return {"Resource": columns["groups"], "Count": count, "Total wait": total,
+            "Mean wait": total / np.maximum(count, 1), "Max wait": maximum}
+
+
+def waiting_times(trace):
+    """
+    Waiting time between "Request moment" and "Retrieve moment" per resource group
+    """
+    return pd.DataFrame(_waiting(to_columns(trace)))
+
+
+def bottleneck(trace, capacity=None):
+    """
+    Resource group with the highest utilisation over time, ties are broken by the order of the group names
+    :return: DataFrame with the intervals [Start, End) and the bottleneck group and its utilisation in them
+    """
+    columns = to_columns(trace)
+    capacity = get_capacity(columns, capacity)
+    times, busy = busy_matrix(columns)
+    utilisation = busy / capacity[:, None]
+    group = np.argmax(utilisation, axis=0)[:-1]
+    level = utilisation[group, np.arange(len(group))]
+    # Merge consecutive intervals with the same bottleneck
+    change = np.ones(len(group), dtype=bool)
+    change[1:] = group[1:] != group[:-1]
+    first = np.flatnonzero(change)
+    ends = np.append(first[1:], len(group))
+    return pd.DataFrame({"Start": times[first], "End": times[ends],
+                         "Resource": columns["groups"][group[first]],
+                         "Utilisation": np.maximum.reduceat(level, first)})
+
+
+def _summary(columns, capacity):
+    capacity = get_capacity(columns, capacity)
+    makespan = columns["Finish"].max()
+    nr_groups = len(columns["groups"])
+    claimed = np.bincount(columns["group"], weights=columns["Finish"] - columns["Retrieve moment"],
+                          minlength=nr_groups)
+    times, busy = busy_matrix(columns)
+    utilisation = busy[:, :-1] / capacity[:, None]
+    # Intervals in which no machine is claimed have no bottleneck
+    active = utilisation.max(axis=0) > 0
+    group = np.argmax(utilisation, axis=0)[active]
+    bottleneck_time = np.bincount(group, weights=np.diff(times)[active], minlength=nr_groups)
+    summary = _waiting(columns)
+    summary["Capacity"] = capacity
+    summary["Utilisation"] = claimed / (capacity * makespan)
+    summary["Bottleneck share"] = bottleneck_time / makespan
+    summary["Makespan"] = np.full(nr_groups, makespan)
+    return summary
+
+
+def summarise(trace, capacity=None):
+    """
+    Per resource group: mean utilisation over the makespan, waiting times and the share of the makespan in which
+    the group is the bottleneck
+    """
+    return pd.DataFrame(_summary(to_columns(trace), capacity))
+
+
+def compare_schedules(traces, capacity=None):
+    """
+    Compare several schedules
+    :param traces: dictionary {name: trace} or list of traces
+    :return: DataFrame with the summary per schedule and resource group
+    """
+    if not isinstance(traces, dict):
+        traces = dict(enumerate(traces))
+    summaries = []
+    names = []
+    for name, trace in traces.items():
+        summary = _summary(to_columns(trace), capacity)
+        summaries.append(summary)
+        names.append(np.full(len(summary["Resource"]), name, dtype=object))
+    table = {"Schedule": np.concatenate(names)}
+    for key in summaries[0]:
+        table[key] = np.concatenate([summary[key] for summary in summaries])
+    return pd.DataFrame(table)
+
+
+def critical_path(trace, plan):
+    """
+    Light critical-path summary of a schedule of simulator_3. An activity is ready when its product is released
+    (activity 0) or at its offset (0, i) after activity 0 started; it waits from then until it retrieves its
+    machines. The product that blocks a waiting activity is the one that released the machine at the moment it was
+    retrieved.
+    :param trace: resource usage of the schedule, with the column "Activity"
+    :param plan: production plan with the products (plan.PRODUCTS) of the trace
+    :return: dictionary with arrays indexed by product: "finish", "lateness" (finish minus deadline), "wait" (total
+             waiting time of its activities) and "blocked_by" (the product that blocked its longest wait, -1 if none),
+             and "critical": the chain of blocking products that ends with the product that finishes last
+    """
+    product = np.asarray(trace["Product"], dtype=int)
+    activity = np.asarray(trace["Activity"], dtype=int)
+    resource = np.asarray(trace["Resource"])
+    machine_id = np.asarray(trace["Machine_id"])
+    request = np.asarray(trace["Request moment"], dtype=float)
+    retrieve = np.asarray(trace["Retrieve moment"], dtype=float)
+    finish = np.asarray(trace["Finish"], dtype=float)
+    n = len(plan.PRODUCTS)
+
+    product_finish = np.full(n, -np.inf)
+    np.maximum.at(product_finish, product, finish)
+    deadlines = np.array([plan.PRODUCTS[p].DEADLINE for p in range(0, n)], dtype=float)
+
+    started = np.full(n, np.nan)
+    first = activity == 0
+    started[product[first]] = retrieve[first]
+    offset = np.array([plan.PRODUCTS[p].TEMPORAL_RELATIONS.get((0, i), 0) if i > 0 else 0
+                       for p, i in zip(product.tolist(), activity.tolist())], dtype=float)
+    ready = np.where(first, request, started[product] + offset)
+    wait = np.maximum(retrieve - ready, 0)
+    product_wait = np.bincount(product, weights=wait, minlength=n)
+
+    # Product that released every machine at every moment
+    released = {(r, m, f): p for r, m, f, p in zip(resource.tolist(), machine_id.tolist(), finish.tolist(),
+                                                     product.tolist())}
+    blocked_by = np.full(n, -1)
+    for k in np.argsort(-wait, kind="stable"):
+        if wait[k] <= 0:
+            break
+        p = product[k]
+        if blocked_by[p] < 0:
+            holder = released.get((resource[k], machine_id[k], retrieve[k]))
+            if holder is not None and holder != p:
+                blocked_by[p] = holder
+
+    chain = [int(np.argmax(product_finish))]
+    while blocked_by[chain[-1]] >= 0 and blocked_by[chain[-1]] not in chain:
+        chain.append(int(blocked_by[chain[-1]]))
+    return {"finish": product_finish, "lateness": product_finish - deadlines, "wait": product_wait,
+            "blocked_by": blocked_by, "critical": chain}
+
+
+def focus_products(summary):
+    """
+    Products that drive the objectives of a schedule: the late products, the products that blocked them and the
+    products on the critical chain
+    """
+    late = np.flatnonzero(summary["lateness"] > 0)
+    blockers = summary["blocked_by"][late]
+    return sorted(set(late.tolist()) | set(blockers[blockers >= 0].tolist()) | set(summary["critical"]))
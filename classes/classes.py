@@ -35,6 +35,14 @@ class Product:
             self.PREDECESSORS[j].append(i)
             self.SUCCESSORS[i].append(j)
 
+    def min_flow_time(self):
+        """
+        Lower bound on the time between the start of activity 0 and the end of the product: the largest offset
+        (0, i) plus the minimal processing time of activity i
+        """
+        return max(self.TEMPORAL_RELATIONS.get((0, i), 0) + activity.PROCESSING_TIME[0]
+                   for i, activity in enumerate(self.ACTIVITIES))
+
 
 class Factory:
     def __init__(self, NAME, RESOURCE_NAMES, CAPACITY):
@@ -81,6 +89,34 @@ class ProductionPlan:
         """
         self.SEQUENCE = sequence
 
+    def is_deterministic(self):
+        """
+        Check whether all processing times are fixed, in that case the simulation does not depend on the seed
+        :return: boolean
+        """
+        return all(activity.PROCESSING_TIME[0] == activity.PROCESSING_TIME[1]
+                   for product in self.PRODUCTS for activity in product.ACTIVITIES)
+
+    def check_feasibility(self):
+        """
+        Check for every product type in the plan whether its activities fit in the factory
+        :return: list of problems, empty if the plan is feasible
+        """
+        problems = []
+        checked = set()
+        for product in self.PRODUCTS:
+            if id(product.ACTIVITIES) in checked:
+                continue
+            checked.add(id(product.ACTIVITIES))
+            for i, activity in enumerate(product.ACTIVITIES):
+                for r, need in enumerate(activity.NEEDS):
+                    if need > self.FACTORY.CAPACITY[r]:
+                        problems.append(f'product {product.NAME}, activity {i} needs {need} machines of '
+                                        f'{self.FACTORY.RESOURCE_NAMES[r]}, the capacity is {self.FACTORY.CAPACITY[r]}')
+                if i > 0 and (0, i) not in product.TEMPORAL_RELATIONS:
+                    problems.append(f'product {product.NAME}, activity {i} has no temporal relation (0, {i})')
+        return problems
+
     def convert_to_dataframe(self):
         df = pd.DataFrame()
         df["Product_ID"] = self.PRODUCT_IDS
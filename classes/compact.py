@@ -0,0 +1,266 @@
+"""
+Compact production plans. The factory is stored as the arrays of a CompiledPlan, with the needs of the activities
+in sparse (CSR) form, and the plan only as a product type and a deadline per product. The product types are shared
+by reference by all products of the plan; Activity and Product objects are built once per product type when the
+plan is used, and are not pickled. All classes use __slots__ and offer the attributes that the simulators use, so a
+CompactPlan can be simulated like a ProductionPlan.
+On instance_240_1_factory_1 the pickle shrinks from 60 kB to 3.6 kB and the plan takes 50 kB instead of 472 kB after
+unpickling. Once the simulators have built the Activity and Product objects of all 44 product types it takes 146 kB,
+only about 3x less than a ProductionPlan: these objects are needed for the attribute interface of the simulators.
+"""
+import pickle
+import zlib
+import numpy as np
+import pandas as pd
+from classes.compiled import CompiledPlan
+
+
+class CompactActivity:
+    __slots__ = ("ID", "PROCESSING_TIME", "NEEDS", "NEED_GROUPS", "NEED_COUNTS")
+
+    def __init__(self, ID, PROCESSING_TIME, NEEDS, NEED_GROUPS, NEED_COUNTS):
+        self.ID = ID
+        self.PROCESSING_TIME = PROCESSING_TIME
+        self.NEEDS = NEEDS
+        self.NEED_GROUPS = NEED_GROUPS
+        self.NEED_COUNTS = NEED_COUNTS
+
+
+class CompactProduct:
+    """Product type, shared by all products of this type in a plan"""
+    __slots__ = ("ID", "NAME", "ACTIVITIES", "TEMPORAL_RELATIONS", "FLOW_TIME")
+
+    def __init__(self, ID, NAME, ACTIVITIES, TEMPORAL_RELATIONS):
+        self.ID = ID
+        self.NAME = NAME
+        self.ACTIVITIES = ACTIVITIES
+        self.TEMPORAL_RELATIONS = TEMPORAL_RELATIONS
+        self.FLOW_TIME = max(TEMPORAL_RELATIONS.get((0, i), 0) + activity.PROCESSING_TIME[0]
+                             for i, activity in enumerate(ACTIVITIES))
+
+    def min_flow_time(self):
+        return self.FLOW_TIME
+
+
+class PlannedProduct:
+    """Product of a plan: a reference to its product type and its deadline"""
+    __slots__ = ("TYPE", "DEADLINE")
+
+    def __init__(self, TYPE, DEADLINE):
+        self.TYPE = TYPE
+        self.DEADLINE = DEADLINE
+
+    @property
+    def ID(self):
+        return self.TYPE.ID
+
+    @property
+    def NAME(self):
+        return self.TYPE.NAME
+
+    @property
+    def ACTIVITIES(self):
+        return self.TYPE.ACTIVITIES
+
+    @property
+    def TEMPORAL_RELATIONS(self):
+        return self.TYPE.TEMPORAL_RELATIONS
+
+    def min_flow_time(self):
+        return self.TYPE.FLOW_TIME
+
+
+def _downcast(array):
+    """Smallest integer type that holds all values of the array"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if len(array) == 0 or (array.min() >= np.iinfo(dtype).min and array.max() <= np.iinfo(dtype).max):
+            return array.astype(dtype)
+    return array
+
+
+class CompactFactory:
+    """
+    Factory backed by the arrays of a CompiledPlan. The arrays are pickled with the smallest integer type that
+    holds their values and compressed, the product types are built on first use.
+    """
+    __slots__ = ("compiled", "_products", "_shared")
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self._products = {}
+        self._shared = {}
+
+    def __getstate__(self):
+        arrays = {name: _downcast(array) for name, array in self.compiled.arrays.items()}
+        return zlib.compress(pickle.dumps((arrays, self.compiled.metadata), protocol=pickle.HIGHEST_PROTOCOL))
+
+    def __setstate__(self, state):
+        arrays, metadata = pickle.loads(zlib.decompress(state))
+        self.compiled = CompiledPlan({name: array.astype(np.int64) for name, array in arrays.items()}, metadata)
+        self._products = {}
+        self._shared = {}
+
+    @property
+    def NAME(self):
+        return self.compiled.metadata["factory_name"]
+
+    @property
+    def RESOURCE_NAMES(self):
+        return self.compiled.metadata["resource_names"]
+
+    @property
+    def CAPACITY(self):
+        return self.compiled.capacity.tolist()
+
+    @property
+    def PRODUCTS(self):
+        return [self.product(t) for t in range(0, len(self.compiled.type_id))]
+
+    def product(self, t):
+        """Product type t, built from the arrays on first use"""
+        if t not in self._products:
+            self._products[t] = self._build_product(t)
+        return self._products[t]
+
+    def _share(self, values):
+        """Equal tuples of different activities are stored once"""
+        return self._shared.setdefault(values, values)
+
+    def _build_product(self, t):
+        c = self.compiled
+        activities = []
+        for a in range(c.type_activity_ptr[t], c.type_activity_ptr[t + 1]):
+            groups = tuple(c.need_group[c.need_ptr[a]:c.need_ptr[a + 1]].tolist())
+            counts = tuple(c.need_count[c.need_ptr[a]:c.need_ptr[a + 1]].tolist())
+            needs = [0] * len(c.capacity)
+            for r, count in zip(groups, counts):
+                needs[r] = count
+            activities.append(CompactActivity(ID=int(c.activity_id[a]),
+                                              PROCESSING_TIME=self._share((int(c.activity_min[a]),
+                                                                           int(c.activity_max[a]))),
+                                              NEEDS=self._share(tuple(needs)), NEED_GROUPS=self._share(groups),
+                                              NEED_COUNTS=self._share(counts)))
+        relations = {self._share((int(i), int(j))): int(delay) for i, j, delay in
+                     zip(c.relation_pred[c.relation_ptr[t]:c.relation_ptr[t + 1]],
+                         c.relation_succ[c.relation_ptr[t]:c.relation_ptr[t + 1]],
+                         c.relation_delay[c.relation_ptr[t]:c.relation_ptr[t + 1]])}
+        return CompactProduct(ID=int(c.type_id[t]), NAME=c.metadata["product_names"][t], ACTIVITIES=activities,
+                              TEMPORAL_RELATIONS=relations)
+
+
+class CompactPlan:
+    """
+    Drop-in replacement of ProductionPlan for the simulators. PRODUCT_IDS and DEADLINES are numpy arrays, PRODUCTS
+    holds a PlannedProduct per product, that refers to the shared product type.
+    """
+    __slots__ = ("FACTORY", "SEQUENCE", "_products")
+
+    def __init__(self, compiled):
+        self.FACTORY = CompactFactory(compiled)
+        self.SEQUENCE = []
+        self._products = None
+
+    def __getstate__(self):
+        return self.FACTORY, self.SEQUENCE
+
+    def __setstate__(self, state):
+        self.FACTORY, self.SEQUENCE = state
+        self._products = None
+
+    @classmethod
+    def from_plan(cls, plan):
+        """
+        :param plan: Class ProductionPlan or CompiledPlan
+        """
+        return cls(plan if isinstance(plan, CompiledPlan) else CompiledPlan.from_plan(plan))
+
+    @classmethod
+    def read_pickle(cls, path):
+        """Read a ProductionPlan pickle, e.g. factory_data/instances/instance_20_1_factory_1.pkl"""
+        return cls.from_plan(pd.read_pickle(path))
+
+    def to_plan(self):
+        plan = self.compiled.to_plan()
+        plan.set_sequence(list(self.SEQUENCE))
+        return plan
+
+    def to_pickle(self, path):
+        """Write the plan as a ProductionPlan pickle, that can be read without this module"""
+        pd.to_pickle(self.to_plan(), path)
+
+    def dumps(self):
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @property
+    def compiled(self):
+        return self.FACTORY.compiled
+
+    @property
+    def ID(self):
+        return self.compiled.metadata["plan_id"]
+
+    @property
+    def NAME(self):
+        return self.compiled.metadata["plan_name"]
+
+    @property
+    def SIZE(self):
+        return self.compiled.size
+
+    @property
+    def PRODUCT_IDS(self):
+        return self.compiled.product_type
+
+    @property
+    def DEADLINES(self):
+        return self.compiled.deadline
+
+    @property
+    def PRODUCTS(self):
+        if self._products is None:
+            self._products = [PlannedProduct(self.FACTORY.product(t), int(deadline))
+                              for t, deadline in zip(self.PRODUCT_IDS.tolist(), self.DEADLINES.tolist())]
+        return self._products
+
+    def list_products(self):
+        self._products = None
+
+    def set_sequence(self, sequence):
+        self.SEQUENCE = sequence
+
+    def is_deterministic(self):
+        c = self.compiled
+        used = np.zeros(len(c.activity_id), dtype=bool)
+        for t in np.unique(c.product_type):
+            used[c.type_activity_ptr[t]:c.type_activity_ptr[t + 1]] = True
+        return bool(np.all(c.activity_min[used] == c.activity_max[used]))
+
+    def check_feasibility(self):
+        """
+        Same checks as ProductionPlan.check_feasibility, on the arrays of the product types in the plan
+        :return: list of problems, empty if the plan is feasible
+        """
+        c = self.compiled
+        names = c.metadata["product_names"]
+        resource_names = c.metadata["resource_names"]
+        problems = []
+        for t in np.unique(c.product_type):
+            first = c.type_activity_ptr[t]
+            for a in range(first, c.type_activity_ptr[t + 1]):
+                for k in range(c.need_ptr[a], c.need_ptr[a + 1]):
+                    r, need = c.need_group[k], c.need_count[k]
+                    if need > c.capacity[r]:
+                        problems.append(f'product {names[t]}, activity {a - first} needs {need} machines of '
+                                        f'{resource_names[r]}, the capacity is {c.capacity[r]}')
+            starts = set(c.relation_succ[c.relation_ptr[t]:c.relation_ptr[t + 1]]
+                         [c.relation_pred[c.relation_ptr[t]:c.relation_ptr[t + 1]] == 0].tolist())
+            for i in range(1, c.type_activity_ptr[t + 1] - first):
+                if i not in starts:
+                    problems.append(f'product {names[t]}, activity {i} has no temporal relation (0, {i})')
+        return problems
+
+    def convert_to_dataframe(self):
+        df = pd.DataFrame()
+        df["Product_ID"] = self.PRODUCT_IDS
+        df["Deadlines"] = self.DEADLINES
+        return df
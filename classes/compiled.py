@@ -0,0 +1,123 @@
+import numpy as np
+from classes.classes import Activity, Product, Factory, ProductionPlan
+
+
+class CompiledPlan:
+    """
+    Array representation of a ProductionPlan. The product types of the factory are stored as templates, the plan
+    itself only as a product type and a deadline per product.
+
+    Arrays (all int64):
+        capacity           (R)    number of machines per resource group
+        type_activity_ptr  (T+1)  activities of product type t are type_activity_ptr[t]:type_activity_ptr[t+1]
+        type_id            (T)    Product.ID of the product type
+        activity_id        (A)    Activity.ID
+        activity_min       (A)    lower bound of PROCESSING_TIME
+        activity_max       (A)    upper bound of PROCESSING_TIME
+        activity_offset    (A)    TEMPORAL_RELATIONS[(0, i)], the offset of activity i to the first activity
+        need_ptr           (A+1)  needs of activity a are need_ptr[a]:need_ptr[a+1]
+        need_group         (N)    resource group of a need
+        need_count         (N)    number of machines of that group
+        relation_ptr       (T+1)  temporal relations of product type t are relation_ptr[t]:relation_ptr[t+1]
+        relation_pred      (E)    first activity of the relation
+        relation_succ      (E)    second activity of the relation
+        relation_delay     (E)    delay of the relation
+        product_type       (n)    product type of each product in the plan
+        deadline           (n)    deadline of each product in the plan
+    """
+    ARRAY_NAMES = ["capacity", "type_activity_ptr", "type_id", "activity_id", "activity_min", "activity_max",
+                   "activity_offset", "need_ptr", "need_group", "need_count", "relation_ptr", "relation_pred",
+                   "relation_succ", "relation_delay", "product_type", "deadline"]
+
+    def __init__(self, arrays, metadata):
+        """
+        :param arrays: dictionary with the arrays in ARRAY_NAMES
+        :param metadata: dictionary with the names of the plan, factory, resource groups and product types
+        """
+        self.arrays = arrays
+        self.metadata = metadata
+        for name in self.ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_plan(cls, plan):
+        factory = plan.FACTORY
+        nr_resources = len(factory.RESOURCE_NAMES)
+        type_activity_ptr, type_id = [0], []
+        activity_id, activity_min, activity_max, activity_offset = [], [], [], []
+        need_ptr, need_group, need_count = [0], [], []
+        relation_ptr, relation_pred, relation_succ, relation_delay = [0], [], [], []
+        for product in factory.PRODUCTS:
+            type_id.append(product.ID)
+            for i, activity in enumerate(product.ACTIVITIES):
+                activity_id.append(activity.ID)
+                activity_min.append(activity.PROCESSING_TIME[0])
+                activity_max.append(activity.PROCESSING_TIME[1])
+                activity_offset.append(product.TEMPORAL_RELATIONS[(0, i)] if i > 0 else 0)
+                for r in range(0, nr_resources):
+                    if activity.NEEDS[r] > 0:
+                        need_group.append(r)
+                        need_count.append(activity.NEEDS[r])
+                need_ptr.append(len(need_group))
+            type_activity_ptr.append(len(activity_id))
+            for (i, j), delay in product.TEMPORAL_RELATIONS.items():
+                relation_pred.append(i)
+                relation_succ.append(j)
+                relation_delay.append(delay)
+            relation_ptr.append(len(relation_pred))
+
+        arrays = {"capacity": factory.CAPACITY, "type_activity_ptr": type_activity_ptr, "type_id": type_id,
+                  "activity_id": activity_id, "activity_min": activity_min, "activity_max": activity_max,
+                  "activity_offset": activity_offset, "need_ptr": need_ptr, "need_group": need_group,
+                  "need_count": need_count, "relation_ptr": relation_ptr, "relation_pred": relation_pred,
+                  "relation_succ": relation_succ, "relation_delay": relation_delay,
+                  "product_type": plan.PRODUCT_IDS, "deadline": plan.DEADLINES}
+        arrays = {name: np.asarray(values, dtype=np.int64) for name, values in arrays.items()}
+        metadata = {"plan_id": plan.ID, "plan_name": plan.NAME, "factory_name": factory.NAME,
+                    "resource_names": list(factory.RESOURCE_NAMES),
+                    "product_names": [product.NAME for product in factory.PRODUCTS]}
+        return cls(arrays, metadata)
+
+    @property
+    def size(self):
+        return len(self.product_type)
+
+    def activities(self, p):
+        """
+        Range of the activities (indices in the activity arrays) of product p in the plan
+        """
+        t = self.product_type[p]
+        return range(self.type_activity_ptr[t], self.type_activity_ptr[t + 1])
+
+    def to_factory(self):
+        """
+        Rebuild the Factory object graph
+        """
+        resource_names = self.metadata["resource_names"]
+        factory = Factory(NAME=self.metadata["factory_name"], RESOURCE_NAMES=list(resource_names),
+                          CAPACITY=self.capacity.tolist())
+        for t, name in enumerate(self.metadata["product_names"]):
+            product = Product(ID=int(self.type_id[t]), NAME=name)
+            for a in range(self.type_activity_ptr[t], self.type_activity_ptr[t + 1]):
+                needs = [0 for _ in resource_names]
+                for k in range(self.need_ptr[a], self.need_ptr[a + 1]):
+                    needs[self.need_group[k]] = int(self.need_count[k])
+                product.add_activity(Activity(ID=int(self.activity_id[a]),
+                                              PROCESSING_TIME=[int(self.activity_min[a]), int(self.activity_max[a])],
+                                              PRODUCT=name, PRODUCT_ID=str(self.type_id[t]), NEEDS=needs))
+            relations = {}
+            for e in range(self.relation_ptr[t], self.relation_ptr[t + 1]):
+                relations[(int(self.relation_pred[e]), int(self.relation_succ[e]))] = int(self.relation_delay[e])
+            product.set_temporal_relations(TEMPORAL_RELATIONS=relations)
+            factory.add_product(product)
+        return factory
+
+    def to_plan(self):
+        """
+        Rebuild the ProductionPlan object graph, such that it can be used by the simulators
+        """
+        plan = ProductionPlan(ID=self.metadata["plan_id"], SIZE=self.size, NAME=self.metadata["plan_name"],
+                              FACTORY=self.to_factory(), PRODUCT_IDS=self.product_type.tolist(),
+                              DEADLINES=self.deadline.tolist())
+        plan.list_products()
+        return plan
@@ -0,0 +1,286 @@
+"""
+Long-lived local evaluation service. The server keeps the production plans loaded inside a pool of worker
+processes, collects the sequences that several search clients send in, groups concurrent requests into batches
+and returns (makespan, tardiness) for every sequence. The EvaluationClient can be used as f_eval in methods/.
+
+Messages are newline-delimited JSON:
+    request:  {"id": 0, "instance": "20_1_factory_1", "simulator": "simulator_3", "seed": 1,
+               "sim_time": 10000000, "claim": "unit", "dispatching": "fifo", "sequence": [3, 0, 1, 2]}
+    response: {"id": 0, "makespan": 971, "tardiness": 972}
+"""
+import os
+import json
+import socket
+import asyncio
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from classes.general import Settings, evaluation_key
+
+# Plans loaded by a worker process, keyed by instance name
+_plans = {}
+
+
+def _load_plan(instance):
+    if instance not in _plans:
+        _plans[instance] = pd.read_pickle(f"factory_data/instances/instance_{instance}.pkl")
+    return _plans[instance]
+
+
+def evaluate_batch(instance, simulator_name, seed, sim_time, claim, dispatching, sequences):
+    """
+    Simulate a batch of sequences for one instance, executed inside a worker process
+    :param instance: name of the instance, e.g. "20_1_factory_1"
+    :param simulator_name: "simulator_1", "simulator_2" or "simulator_3"
+    :param seed: random seed used for every simulation
+    :param sim_time: simulation horizon
+    :param claim: claim of the machines of an activity, as Settings.claim
+    :param dispatching: order of the waiting requests, as Settings.dispatching
+    :param sequences: list of sequences (lists of integers)
+    :return: list of (makespan, tardiness) tuples, and whether the results are seed-independent
+    """
+    if simulator_name == "simulator_1":
+        from classes.simulator_1 import Simulator
+    if simulator_name == "simulator_2":
+        from classes.simulator_2 import Simulator
+    if simulator_name == "simulator_3":
+        from classes.simulator_3 import Simulator
+    if simulator_name == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
+
+    plan = _load_plan(instance)
+    results = []
+    for sequence in sequences:
+        plan.set_sequence(sequence)
+        simulator = Simulator(plan, printing=False, claim=claim, dispatching=dispatching)
+        makespan, tardiness = simulator.simulate(SIM_TIME=sim_time, RANDOM_SEED=seed, write=False)
+        results.append((float(makespan), float(tardiness)))
+    return results, plan.is_deterministic()
+
+
+def _preload(instances):
+    for instance in instances:
+        _load_plan(instance)
+
+
+def parse_address(address):
+    """
+    An address is either "host:port" for a localhost TCP server or the path of a Unix socket
+    """
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return address, None
+
+
+class EvaluationServer:
+    def __init__(self, address="127.0.0.1:8765", processes=None, batch_window=0.005, max_batch=64, instances=(),
+                 cache_size=100000):
+        """
+        :param address: "host:port" or path of a Unix socket
+        :param processes: number of worker processes, by default the number of cores
+        :param batch_window: seconds to wait for more requests before a batch is dispatched
+        :param max_batch: maximum number of sequences in one batch
+        :param instances: instances that are loaded in every worker at start-up
+        :param cache_size: maximum number of cached results, results of deterministic plans are shared by all seeds
+        """
+        self.address = address
+        self.processes = processes
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.instances = list(instances)
+        self.pool = None
+        self.nr_workers = 1
+        self.queue = None
+        self.cache_size = cache_size
+        self.cache = {}
+        self.deterministic = {}
+        self.nr_requests = 0
+        self.nr_batches = 0
+        self.nr_cache_hits = 0
+
+    async def handle_client(self, reader, writer):
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                future = asyncio.get_running_loop().create_future()
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request is a JSON object")
+                except ValueError as error:
+                    request = {}
+                    future.set_exception(error)
+                else:
+                    await self.queue.put((request, future))
+                task = asyncio.ensure_future(self.respond(request, future, writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def respond(self, request, future, writer, lock):
+        try:
+            makespan, tardiness = await future
+            response = {"id": request.get("id"), "makespan": makespan, "tardiness": tardiness}
+        except Exception as error:
+            response = {"id": request.get("id"), "error": repr(error)}
+        async with lock:
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Group the requests that can be simulated by the same plan and simulator
+            groups = {}
+            for request, future in batch:
+                # A malformed request is answered with an error, the other requests of the batch are served
+                try:
+                    key = (request["instance"], request.get("simulator", "simulator_3"), request.get("seed", 1),
+                           request.get("sim_time", 10000000), request.get("claim", "unit"),
+                           request.get("dispatching", "fifo"))
+                    cache_key = self.cache_key(key, request["sequence"])
+                    hash((key, cache_key))
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                if cache_key in self.cache:
+                    self.nr_cache_hits += 1
+                    future.set_result(self.cache[cache_key])
+                    continue
+                groups.setdefault(key, []).append((request["sequence"], future))
+
+            # Spread large groups over the workers
+            for key, items in groups.items():
+                chunk = -(-len(items) // self.nr_workers)
+                for start in range(0, len(items), chunk):
+                    self.nr_batches += 1
+                    self.nr_requests += len(items[start:start + chunk])
+                    asyncio.ensure_future(self.dispatch(key, items[start:start + chunk]))
+
+    def cache_key(self, key, sequence):
+        instance, simulator, seed, sim_time, claim, dispatching = key
+        setting = Settings(instance=instance, simulator=simulator, seed=seed, claim=claim, dispatching=dispatching)
+        return evaluation_key(setting, sequence, self.deterministic.get(instance, False), sim_time=sim_time)
+
+    async def dispatch(self, key, items):
+        loop = asyncio.get_running_loop()
+        sequences = [sequence for sequence, _ in items]
+        try:
+            results, deterministic = await loop.run_in_executor(self.pool, evaluate_batch, *key, sequences)
+        except Exception as error:
+            for _, future in items:
+                future.set_exception(error)
+            return
+        self.deterministic[key[0]] = deterministic
+        for (sequence, future), result in zip(items, results):
+            self.cache[self.cache_key(key, sequence)] = result
+            future.set_result(result)
+        while len(self.cache) > self.cache_size:
+            self.cache.pop(next(iter(self.cache)))
+
+    async def serve(self):
+        self.nr_workers = self.processes or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.nr_workers, initializer=_preload,
+                                        initargs=(self.instances,))
+        self.queue = asyncio.Queue()
+        host, port = parse_address(self.address)
+        if port is None:
+            server = await asyncio.start_unix_server(self.handle_client, path=host)
+        else:
+            server = await asyncio.start_server(self.handle_client, host=host, port=port)
+        print(f"Evaluation server listening on {self.address}")
+        batcher = asyncio.ensure_future(self.batcher())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown()
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+class EvaluationClient:
+    def __init__(self, setting, address="127.0.0.1:8765", sim_time=10000000):
+        """
+        Thin blocking client of the EvaluationServer, that can be used as f_eval in the search methods
+        :param setting: Class Settings, provides instance, simulator, seed, claim, dispatching, l1 and l2
+        :param address: "host:port" or path of a Unix socket
+        :param sim_time: simulation horizon
+        """
+        self.setting = setting
+        self.sim_time = sim_time
+        host, port = parse_address(address)
+        if port is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(host)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rwb")
+        self.request_id = 0
+
+    def evaluate_many(self, sequences):
+        """
+        Send all sequences at once, such that the server can evaluate them in one batch
+        :return: list of (makespan, tardiness) tuples
+        """
+        ids = []
+        for sequence in sequences:
+            request = {"id": self.request_id, "instance": self.setting.instance, "simulator": self.setting.simulator,
+                       "seed": self.setting.seed, "sim_time": self.sim_time, "claim": self.setting.claim,
+                       "dispatching": self.setting.dispatching, "sequence": [int(i) for i in sequence]}
+            self.file.write((json.dumps(request) + "\n").encode())
+            ids.append(self.request_id)
+            self.request_id += 1
+        self.file.flush()
+
+        # Read all responses of the batch before raising, otherwise the next call would read the remaining ones
+        responses = {}
+        errors = []
+        while len(responses) + len(errors) < len(ids):
+            response = json.loads(self.file.readline())
+            if "error" in response:
+                errors.append(response["error"])
+                continue
+            responses[response["id"]] = (response["makespan"], response["tardiness"])
+        if errors:
+            raise RuntimeError(f'Evaluation server failed for {len(errors)} sequences: {errors[0]}')
+        return [responses[i] for i in ids]
+
+    def evaluate(self, sequence):
+        return self.evaluate_many([sequence])[0]
+
+    def fitness(self, makespan, tardiness):
+        # Infeasible plans have an infinite fitness, also when one of the weights is zero
+        if makespan == float("inf"):
+            return float("inf")
+        return self.setting.l1 * makespan + self.setting.l2 * tardiness
+
+    def fitness_many(self, sequences):
+        return [self.fitness(makespan, tardiness) for makespan, tardiness in self.evaluate_many(sequences)]
+
+    def __call__(self, x, i=None):
+        return self.fitness(*self.evaluate(x))
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
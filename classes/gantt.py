@@ -0,0 +1,179 @@
+"""
+Gantt pipeline for large schedules. A resource usage table (written by Simulator.simulate) is restricted to a time
+window and resource subset, the bars are aggregated to the time bucket of one pixel and the result is either
+rasterised directly to a PNG with numpy, or handed to Altair with a bounded chart width.
+"""
+import os
+import zlib
+import struct
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+
+PALETTE = ["#1f77b4", "#aec7e8", "#ff7f0e", "#ffbb78", "#2ca02c", "#98df8a", "#d62728", "#ff9896", "#9467bd",
+           "#c5b0d5", "#8c564b", "#c49c94", "#e377c2", "#f7b6d2", "#7f7f7f", "#c7c7c7", "#bcbd22", "#dbdb8d",
+           "#17becf", "#9edae5"]
+
+
+# Column names used by older versions of the simulator
+LEGACY_COLUMNS = {"Equipment type": "Resource", "Machine": "Machine_id", "Claim time": "Retrieve moment",
+                  "Start use": "Start", "Release time": "Finish"}
+
+
+def read_schedule(file_name):
+    schedule = pd.read_csv(file_name, index_col=0)
+    if "Resource" not in schedule:
+        schedule = schedule.rename(columns=LEGACY_COLUMNS)
+    schedule['Machine'] = schedule['Resource'] + '_id=' + schedule['Machine_id'].astype(str)
+    return schedule
+
+
+def select(schedule, window=None, resources=None):
+    """
+    Restrict the schedule to a time window and a subset of resource groups
+    :param window: tuple (start, end), bars are clipped to the window
+    :param resources: list of resource group names
+    """
+    if resources is not None:
+        schedule = schedule[schedule["Resource"].isin(resources)]
+    if window is not None:
+        start, end = window
+        schedule = schedule[(schedule["Finish"] > start) & (schedule["Retrieve moment"] < end)].copy()
+        schedule["Retrieve moment"] = schedule["Retrieve moment"].clip(lower=start)
+        schedule["Finish"] = schedule["Finish"].clip(upper=end)
+    return schedule
+
+
+def aggregate_bars(schedule, bucket):
+    """
+    Merge consecutive bars of the same product on the same machine if the gap between them is smaller than the
+    time bucket. With bucket equal to the time per pixel the chart looks the same, but contains far fewer marks.
+    """
+    schedule = schedule.sort_values(["Machine", "Retrieve moment"])
+    machine = schedule["Machine"].to_numpy()
+    product = schedule["Product"].to_numpy()
+    start = schedule["Retrieve moment"].to_numpy(dtype=float)
+    finish = schedule["Finish"].to_numpy(dtype=float)
+    if len(start) == 0:
+        return schedule[["Machine", "Resource", "Product", "Retrieve moment", "Finish"]]
+
+    # A new bar starts where the machine or product changes, or where the gap is too large
+    new_bar = np.ones(len(start), dtype=bool)
+    new_bar[1:] = (machine[1:] != machine[:-1]) | (product[1:] != product[:-1]) | (start[1:] - finish[:-1] >= bucket)
+    first = np.flatnonzero(new_bar)
+    bars = pd.DataFrame({"Machine": machine[first],
+                         "Resource": schedule["Resource"].to_numpy()[first],
+                         "Product": product[first],
+                         "Retrieve moment": start[first],
+                         "Finish": np.maximum.reduceat(finish, first)})
+    return bars
+
+
+def rasterize(schedule, width=2000, row_height=12, window=None, machines=None):
+    """
+    Draw the schedule into an RGB image, one row of pixels per machine
+    :param width: number of pixels of the time axis
+    :param window: tuple (start, end), by default the whole schedule
+    :param machines: order of the machine rows, by default sorted by name
+    :return: numpy array (height, width, 3) of uint8
+    """
+    if machines is None:
+        machines = sorted(schedule["Machine"].unique())
+    if window is None:
+        window = (0, schedule["Finish"].max() if len(schedule) else 1)
+    start, end = window
+    scale = width / max(end - start, 1)
+
+    row = pd.Series(np.arange(len(machines)), index=machines)[schedule["Machine"]].to_numpy()
+    x0 = np.floor((schedule["Retrieve moment"].to_numpy(dtype=float) - start) * scale).astype(np.int64)
+    x1 = np.ceil((schedule["Finish"].to_numpy(dtype=float) - start) * scale).astype(np.int64)
+    x0 = np.clip(x0, 0, width - 1)
+    x1 = np.clip(np.maximum(x1, x0 + 1), 1, width)
+    palette = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in PALETTE], dtype=np.uint8)
+    colors = palette[schedule["Product"].to_numpy() % len(palette)]
+
+    # Paint all pixel columns of all bars at once
+    lengths = x1 - x0
+    bar = np.repeat(np.arange(len(x0)), lengths)
+    columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + x0[bar]
+    image = np.full((len(machines), width, 3), 255, dtype=np.uint8)
+    image[row[bar], columns] = colors[bar]
+
+    # Stretch the machine rows and draw a light separator line between them
+    image = np.repeat(image, row_height, axis=0)
+    image[row_height - 1::row_height] = 220
+    return image
+
+
+def write_png(image, file_name):
+    """
+    Write an RGB image (numpy array of uint8) as PNG, without dependencies other than zlib
+    """
+    height, width, _ = image.shape
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * 3)], axis=1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(file_name, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        file.write(chunk(b"IEND", b""))
+
+
+def gantt_chart(schedule, max_width=2000, height=700, window=None, resources=None):
+    """
+    Altair chart of the schedule, with the bars aggregated to the time per pixel and a bounded width
+    """
+    import altair as alt
+
+    schedule = select(schedule, window=window, resources=resources)
+    if window is None:
+        window = (0, schedule["Finish"].max() if len(schedule) else 1)
+    width = min(max_width, max(window[1] - window[0], 1))
+    bars = aggregate_bars(schedule, bucket=(window[1] - window[0]) / width)
+    return alt.Chart(bars).mark_bar().encode(
+        x='Retrieve moment',
+        x2='Finish',
+        y='Machine',
+        color=alt.Color('Product:N',
+                        legend=alt.Legend(padding=5))
+    ).properties(
+        width=width,
+        height=height
+    )
+
+
+def render(file_name, output_location, width=2000, row_height=12, window=None, resources=None):
+    """
+    Rasterise one resource usage file to a PNG
+    """
+    schedule = read_schedule(file_name)
+    machines = sorted(schedule["Machine"].unique()) if resources is None else None
+    schedule = select(schedule, window=window, resources=resources)
+    if window is None:
+        window = (0, schedule["Finish"].max() if len(schedule) else 1)
+    bars = aggregate_bars(schedule, bucket=(window[1] - window[0]) / width)
+    write_png(rasterize(bars, width=width, row_height=row_height, window=window, machines=machines),
+              output_location)
+    return output_location
+
+
+def _render(arguments):
+    return render(*arguments)
+
+
+def render_directory(input_dir="results/resource_usage", output_dir="results/gannts", processes=None, width=2000,
+                     row_height=12, window=None, resources=None):
+    """
+    Rasterise every resource usage file in a directory, in parallel
+    :return: list of the written files
+    """
+    tasks = []
+    for file_name in sorted(os.listdir(input_dir)):
+        if file_name.endswith(".csv"):
+            tasks.append((os.path.join(input_dir, file_name), os.path.join(output_dir, file_name[:-4] + ".png"),
+                          width, row_height, window, resources))
+    with Pool(processes) as pool:
+        return pool.map(_render, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1))))
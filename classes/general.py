@@ -1,10 +1,13 @@
 import copy
 import numpy as np
+from collections import OrderedDict
+from classes.analytics import focus_products
 
 
 class Settings:
     def __init__(self, size=5, method="local_search", time_limit=180, budget=400, stop_criterium="Time",
-                 simulator="Seclin", seed=1, instance="5_1", objective="makespan", init="random", l1=1, l2=1, k=40, m=20):
+                 simulator="Seclin", seed=1, instance="5_1", objective="makespan", init="random", l1=1, l2=1, k=40, m=20,
+                 claim="unit", dispatching="fifo"):
         self.method = method
         self.init = init
         self.time_limit = time_limit
@@ -19,30 +22,46 @@ class Settings:
         self.l2 = l2
         self.k = k
         self.m = m
+        self.claim = claim
+        self.dispatching = dispatching
 
     def make_file_name(self):
+        # Runs with the default per-unit claims and fifo dispatching keep their old file names
+        variant = f'_claim={self.claim}' if self.claim != "unit" else ''
+        variant += f'_dispatching={self.dispatching}' if self.dispatching != "fifo" else ''
         if self.stop_criterium == "Time":
             return f'{self.method}_simulator={self.simulator}_time_limit={self.time_limit}_seed={self.seed}_instance_' \
-                   f'{self.instance}_objective={self.objective}_init={self.init}'
+                   f'{self.instance}_objective={self.objective}_init={self.init}{variant}'
 
         else:
             return f'{self.method}_simulator={self.simulator}_budget={self.budget}_seed={self.seed}_instance_' \
-                   f'{self.instance}_objective={self.objective}_init={self.init}'
+                   f'{self.instance}_objective={self.objective}_init={self.init}{variant}'
 
 
-def evaluator_simpy(plan, setting, sequence, sim_time=10000000, printing=False):
-
+def evaluator_simpy_objectives(plan, setting, sequence, sim_time=10000000, printing=False):
+    """
+    Objective vector of a sequence: makespan and total tardiness, both infinite if the plan is infeasible
+    """
     if setting.simulator == "simulator_1":
         from classes.simulator_1 import Simulator
     if setting.simulator == "simulator_2":
         from classes.simulator_2 import Simulator
     if setting.simulator == "simulator_3":
         from classes.simulator_3 import Simulator
+    if setting.simulator == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
 
     plan.set_sequence(sequence)
-    simulator = Simulator(plan, printing=printing)
+    simulator = Simulator(plan, printing=printing, claim=setting.claim, dispatching=setting.dispatching)
     makespan, lateness = simulator.simulate(SIM_TIME=sim_time, RANDOM_SEED=setting.seed, write=False)
-    fitness = setting.l1 * makespan + setting.l2 * lateness
+    if not simulator.feasible:
+        return float("inf"), float("inf")
+    return makespan, lateness
+
+
+def evaluator_simpy(plan, setting, sequence, sim_time=10000000, printing=False):
+    makespan, lateness = evaluator_simpy_objectives(plan, setting, sequence, sim_time=sim_time, printing=printing)
+    fitness = setting.l1 * makespan + setting.l2 * lateness if makespan != float("inf") else float("inf")
 
     if printing:
         print(f"Makespan is {makespan}")
@@ -52,6 +71,76 @@ def evaluator_simpy(plan, setting, sequence, sim_time=10000000, printing=False):
     return fitness
 
 
+def evaluator_simpy_seeds(plan, setting, sequence, seeds, sim_time=10000000, printing=False):
+    """
+    Mean fitness of a sequence over several seeds. A plan with fixed processing times is simulated only once,
+    because all seeds give the same result.
+    """
+    if plan.is_deterministic():
+        seeds = list(seeds)[:1]
+    fitnesses = []
+    for seed in seeds:
+        seed_setting = copy.copy(setting)
+        seed_setting.seed = seed
+        fitnesses.append(evaluator_simpy(plan, seed_setting, sequence, sim_time=sim_time, printing=printing))
+    return sum(fitnesses) / len(fitnesses)
+
+
+class CriticalPathEvaluator:
+    """
+    Fitness function f_eval(x, i) as evaluator_simpy, that also keeps the critical-path summary of the last
+    simulated sequences. focus(x) gives the positions in x of the products that drive its objectives (late products,
+    their blockers and the critical chain), so the search methods can focus their moves on them without simulating x
+    again. Only simulator_3 and simulator_3_lean give a summary.
+    """
+    def __init__(self, plan, setting, sim_time=10000000, memory=64):
+        if setting.simulator == "simulator_3":
+            from classes.simulator_3 import Simulator
+        elif setting.simulator == "simulator_3_lean":
+            from classes.simulator_3_lean import Simulator
+        else:
+            raise ValueError(f'No critical-path summary for {setting.simulator}, use simulator_3 or simulator_3_lean')
+        self.plan = plan
+        self.setting = setting
+        self.sim_time = sim_time
+        self.memory = memory
+        self.simulator = Simulator(plan, claim=setting.claim, dispatching=setting.dispatching, summarise=True)
+        self.summaries = OrderedDict()
+
+    def __call__(self, x, i=None):
+        key = tuple(int(k) for k in x)
+        self.plan.set_sequence(list(key))
+        makespan, lateness = self.simulator.simulate(SIM_TIME=self.sim_time, RANDOM_SEED=self.setting.seed,
+                                                     write=False)
+        if not self.simulator.feasible:
+            return float("inf")
+        self.summaries[key] = self.simulator.summary
+        self.summaries.move_to_end(key)
+        if len(self.summaries) > self.memory:
+            self.summaries.popitem(last=False)
+        return self.setting.l1 * makespan + self.setting.l2 * lateness
+
+    def focus(self, x):
+        """
+        Positions in x of the products that drive its objectives, None if x was not simulated recently
+        """
+        summary = self.summaries.get(tuple(int(k) for k in x))
+        if summary is None:
+            return None
+        products = set(focus_products(summary))
+        return [k for k, p in enumerate(x) if int(p) in products]
+
+
+def evaluation_key(setting, sequence, deterministic, sim_time=10000000):
+    """
+    Key under which the result of a simulation can be cached. Results of a deterministic plan are seed-independent,
+    so their key does not contain the seed and is shared by all seeds.
+    """
+    seed = None if deterministic else setting.seed
+    return setting.instance, setting.simulator, setting.claim, setting.dispatching, seed, sim_time, \
+        tuple(int(i) for i in sequence)
+
+
 def combine_sequences(best_sequences, x=None):
     unique_months = list(best_sequences.keys())
     fermentation_sequence = []
@@ -0,0 +1,89 @@
+"""
+Multi-objective evaluation: a sequence is simulated once, and its objective vector (makespan, total tardiness) is
+kept in an archive of the non-dominated sequences. A weighted fitness l1 * makespan + l2 * tardiness for any weights
+is answered from the archive, without simulating again. The search itself is guided by one weight vector, the
+archive collects the trade-offs of all sequences it evaluates, so one search run covers a whole grid of weights.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ParetoArchive:
+    """
+    Non-dominated objective vectors of the evaluated sequences, all objectives are minimised. Sequences with equal
+    objective vectors are stored once, the first one is kept.
+    """
+    def __init__(self, names=("Makespan", "Tardiness")):
+        self.names = list(names)
+        self.sequences = []
+        self.objectives = np.empty((0, len(self.names)))
+        self.nr_evaluations = 0
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def add(self, sequence, objectives):
+        """
+        Add the objective vector of a sequence, infeasible (infinite) vectors are not kept
+        :return: True if the sequence is in the archive after adding it
+        """
+        objectives = np.asarray(objectives, dtype=float)
+        if not np.all(np.isfinite(objectives)):
+            return False
+        if len(self.sequences) and np.any(np.all(self.objectives <= objectives, axis=1)):
+            return False
+        keep = ~np.all(objectives <= self.objectives, axis=1)
+        self.sequences = [s for s, k in zip(self.sequences, keep) if k] + [[int(i) for i in sequence]]
+        self.objectives = np.vstack([self.objectives[keep], objectives])
+        return True
+
+    def scores(self, weights):
+        """Weighted fitness of every sequence in the archive"""
+        return self.objectives @ np.asarray(weights, dtype=float)
+
+    def best(self, weights):
+        """
+        Best sequence in the archive for a weight vector, e.g. (l1, l2)
+        :return: sequence, objective vector and weighted fitness
+        """
+        if not len(self.sequences):
+            return None, None, float("inf")
+        scores = self.scores(weights)
+        k = int(np.argmin(scores))
+        return self.sequences[k], self.objectives[k], scores[k]
+
+    def grid(self, weights_list):
+        """Best sequence in the archive for every weight vector, as a table"""
+        table = []
+        for weights in weights_list:
+            sequence, objectives, fitness = self.best(weights)
+            row = {f'w{j + 1}': w for j, w in enumerate(weights)}
+            if sequence is not None:
+                row.update(dict(zip(self.names, objectives)))
+            row.update({"Fitness": fitness, "Sequence": sequence})
+            table.append(row)
+        return pd.DataFrame(table)
+
+    def to_dataframe(self):
+        """The front, sorted on the first objective"""
+        order = np.argsort(self.objectives[:, 0], kind="stable")
+        df = pd.DataFrame(self.objectives[order], columns=self.names)
+        df["Sequence"] = [self.sequences[k] for k in order]
+        return df
+
+    def evaluator(self, f_objectives, weights):
+        """
+        Fitness function for the search methods: every evaluated sequence is added to the archive, the search is
+        guided by the weighted fitness of the given weights
+        :param f_objectives: function of a sequence that returns its objective vector
+        """
+        weights = np.asarray(weights, dtype=float)
+
+        def f_eval(x, i=None):
+            objectives = np.asarray(f_objectives(x), dtype=float)
+            self.nr_evaluations += 1
+            self.add(x, objectives)
+            if not np.all(np.isfinite(objectives)):
+                return float("inf")
+            return float(objectives @ weights)
+        return f_eval
@@ -0,0 +1,273 @@
+"""
+Online rescheduling of a production sequence that is being executed with simulator_3. The products that have been
+released before a wall time (one product of the sequence every 3 time units) are frozen. Their simulation is run
+once, up to the wall time, and its state is kept: the free machines, the running activities, and the activities
+that wait for machines, with their requests in the order of arrival. New orders are appended to the undecided
+tail, and only the tail is optimised. Every evaluation restores the state at the wall time and simulates the tail
+and the rest of the frozen activities from there; with fixed processing times, an unchanged tail gives the same
+schedule as a simulation of the complete sequence.
+"""
+import math
+import random
+from collections import deque, namedtuple
+import numpy as np
+import pandas as pd
+import simpy
+from classes.compact import CompactPlan
+from classes.compiled import CompiledPlan
+from classes.simulator_3_lean import Simulator
+from methods.iterated_greedy import iterated_greedy
+from methods.local_search import local_search
+
+# An activity of a frozen product that has not started at the wall time. held are the machines it has already
+# obtained, waiting are its requests that still wait, as (number in the order of arrival, needs, priority).
+# Activities after activity 0 start at start_after or later, activity 0 as soon as it has its machines.
+Waiting = namedtuple('Waiting', 'product, activity, position, duration, request, start_after, held, waiting')
+# An activity of a frozen product that is running at the wall time
+Running = namedtuple('Running', 'product, activity, machines, request, retrieve, finish')
+
+
+class FreezeSimulator(Simulator):
+    """simulator_3_lean that stops at the wall time, and keeps track of the activities that have not completed"""
+    def __init__(self, plan, printing=False, claim="unit", dispatching="fifo"):
+        super().__init__(plan, printing=printing, claim=claim, dispatching=dispatching)
+        self.waiting = {}
+        self.running = {}
+
+    def product(self, p, position):
+        activity = self.plan.PRODUCTS[p].ACTIVITIES[0]
+        request_time = self.env.now
+        duration = self.duration(activity)
+        requests = self.request(activity, self.dispatch_priority(p, position))
+        self.waiting[(p, 0)] = (position, duration, request_time, None, requests)
+        yield self.env.all_of(requests)
+        self.start(p, 0, activity, duration, requests, request_time)
+        self.request_activities(p, position, request_time)
+
+    def request_activities(self, p, position, request_time):
+        product = self.plan.PRODUCTS[p]
+        activities = product.ACTIVITIES
+        durations = [self.duration(activity) for activity in activities[1:]]
+        priority = self.dispatch_priority(p, position)
+        for i in range(1, len(activities)):
+            requests = self.request(activities[i], priority)
+            start_after = self.env.now + product.TEMPORAL_RELATIONS[(0, i)]
+            self.waiting[(p, i)] = (position, durations[i - 1], request_time, start_after, requests)
+            waiting = self.env.all_of(requests + [self.env.timeout(product.TEMPORAL_RELATIONS[(0, i)])])
+            waiting.callbacks.append(lambda _, i=i, requests=requests:
+                                     self.start(p, i, activities[i], durations[i - 1], requests, request_time))
+
+    def start(self, p, i, activity, duration, requests, request_time):
+        del self.waiting[(p, i)]
+        self.running[(p, i)] = Running(p, i, [machine for request in requests for machine in request.value],
+                                       request_time, self.env.now, self.env.now + duration)
+        super().start(p, i, activity, duration, requests, request_time)
+
+    def release_machines(self, p, i, machines, request_time, retrieve_time):
+        del self.running[(p, i)]
+        super().release_machines(p, i, machines, request_time, retrieve_time)
+
+    def freeze(self, freeze_time, RANDOM_SEED):
+        """
+        Simulate the products of the sequence up to the wall time, the events at the wall time are not processed
+        :return: state at the wall time: free machines per resource group, Running and Waiting activities
+        """
+        if not self.deterministic:
+            random.seed(RANDOM_SEED)
+        self.env = simpy.Environment()
+        self.resource_usage = []
+        self.factory = self.machine_store()
+        self.nr_activities = self.activities_to_complete()
+        self.nr_completed = 0
+        self.horizon = float("inf")
+        self.completed = self.env.event()
+        self.env.process(self.product_generator())
+        if freeze_time > 0:
+            self.env.run(until=freeze_time)
+        self.resource_usage = pd.DataFrame(self.resource_usage)
+
+        numbers = {id(event): number for number, event in self.factory.requests.items()}
+        waiting = []
+        for (p, i), (position, duration, request_time, start_after, requests) in self.waiting.items():
+            waiting.append(Waiting(p, i, position, duration, request_time, start_after,
+                                   [machine for request in requests if request.triggered for machine in request.value],
+                                   [(numbers[id(request)], request.needs, request.priority) for request in requests
+                                    if not request.triggered]))
+        free = {name: list(machines) for name, machines in self.factory.free.items()}
+        return free, list(self.running.values()), waiting
+
+
+class TailSimulator(Simulator):
+    """
+    simulator_3_lean that continues from the state at the wall time: the frozen activities are restored, and the
+    products of plan.SEQUENCE are released from release_time onwards
+    """
+    def __init__(self, plan, state, finished, release_time, printing=False, claim="unit", dispatching="fifo"):
+        """
+        :param state: free machines, running activities and waiting activities, see FreezeSimulator.freeze
+        :param finished: Series with the finish of the completed activities of every frozen product
+        :param release_time: time at which the first product of the tail is released
+        """
+        super().__init__(plan, printing=printing, claim=claim, dispatching=dispatching)
+        self.state = state
+        self.finished = finished
+        self.release_time = release_time
+        # Positions in the complete sequence, for dispatching by sequence
+        self.offset = release_time // 3
+
+    def activities_to_complete(self):
+        free, running, waiting = self.state
+        return super().activities_to_complete() + len(running) + sum(
+            len(self.plan.PRODUCTS[activity.product].ACTIVITIES) if activity.activity == 0 else 1
+            for activity in waiting)
+
+    def restore(self):
+        free, running, waiting = self.state
+        for name, machines in free.items():
+            self.factory.free[name] = deque(machines)
+        for activity in running:
+            self.env.timeout(activity.finish).callbacks.append(
+                lambda _, a=activity: self.release_machines(a.product, a.activity, a.machines, a.request, a.retrieve))
+
+        # The waiting requests are made again in their order of arrival
+        requests = {}
+        for number, k, needs, priority in sorted((number, k, needs, priority) for k, activity in enumerate(waiting)
+                                                 for number, needs, priority in activity.waiting):
+            requests.setdefault(k, []).append(self.factory.get(needs, priority=priority))
+        for k, activity in enumerate(waiting):
+            held = self.env.event()
+            held.succeed(activity.held)
+            activity_requests = requests.get(k, []) + [held]
+            if activity.activity == 0:
+                self.env.process(self.resume(activity, activity_requests))
+            else:
+                waiting_event = self.env.all_of(activity_requests + [self.env.timeout(activity.start_after)])
+                waiting_event.callbacks.append(lambda _, a=activity, r=activity_requests: self.start(
+                    a.product, a.activity, self.plan.PRODUCTS[a.product].ACTIVITIES[a.activity], a.duration, r,
+                    a.request))
+
+    def resume(self, activity, requests):
+        """Product of which activity 0 waits for machines at the wall time"""
+        yield self.env.all_of(requests)
+        self.start(activity.product, 0, self.plan.PRODUCTS[activity.product].ACTIVITIES[0], activity.duration,
+                   requests, activity.request)
+        self.request_activities(activity.product, activity.position, activity.request)
+
+    def product_generator(self):
+        self.restore()
+        if self.nr_activities == 0:
+            self.completed.succeed()
+        yield self.env.timeout(self.release_time)
+        for position, p in enumerate(self.plan.SEQUENCE):
+            self.env.process(self.product(p, self.offset + position))
+            yield self.env.timeout(3)
+
+    def objectives(self):
+        """Makespan and total tardiness of the frozen products and the tail"""
+        finish = self.resource_usage.groupby("Product")["Finish"].max() if len(self.resource_usage) else \
+            pd.Series(dtype=float)
+        finish = finish.combine(self.finished, max, fill_value=0)
+        deadlines = pd.Series({p: self.plan.PRODUCTS[p].DEADLINE for p in finish.index})
+        tardiness = (finish - deadlines).clip(lower=0).sum()
+        return finish.max(), tardiness
+
+
+class Rescheduler:
+    """
+    Rescheduling of a running production sequence:
+        rescheduler = Rescheduler(plan, sequence, freeze_time=300, l1=0.5, l2=0.5)
+        new_products = rescheduler.add_orders([("Beer A", 900), ("Beer B", 1000)])
+        sequence, fitness = rescheduler.reschedule(method="local_search", budget=100)
+    The product indices of the new orders follow the products of the plan; rescheduler.plan is the extended plan.
+    """
+    def __init__(self, plan, sequence, freeze_time, l1=1, l2=1, seed=1, sim_time=10000000, claim="unit",
+                 dispatching="fifo", printing=False):
+        """
+        :param plan: Class ProductionPlan, CompactPlan or CompiledPlan
+        :param sequence: production sequence that is being executed
+        :param freeze_time: wall time, the products released before this time are frozen
+        """
+        compiled = plan if isinstance(plan, CompiledPlan) else getattr(plan, "compiled", None)
+        if compiled is None:
+            compiled = CompiledPlan.from_plan(plan)
+        self.plan = CompactPlan(compiled)
+        self.freeze_time = freeze_time
+        self.l1 = l1
+        self.l2 = l2
+        self.seed = seed
+        self.sim_time = sim_time
+        self.claim = claim
+        self.dispatching = dispatching
+        self.printing = printing
+
+        sequence = [int(i) for i in sequence]
+        nr_frozen = min(len(sequence), max(math.ceil(freeze_time / 3), 0))
+        self.frozen = sequence[:nr_frozen]
+        self.tail = sequence[nr_frozen:]
+        self.release_time = 3 * nr_frozen
+
+        # State of the frozen products at the wall time
+        self.plan.set_sequence(self.frozen)
+        simulator = FreezeSimulator(self.plan, claim=claim, dispatching=dispatching)
+        self.state = simulator.freeze(freeze_time, seed)
+        self.done = simulator.resource_usage
+        self.finished = self.done.groupby("Product")["Finish"].max() if len(self.done) else pd.Series(dtype=float)
+
+    def add_orders(self, orders):
+        """
+        Append new products to the plan and to the end of the tail
+        :param orders: list of (product type, deadline), the product type is its name or its index in the factory
+        :return: indices of the new products
+        """
+        compiled = self.plan.compiled
+        names = compiled.metadata["product_names"]
+        types = [names.index(t) if isinstance(t, str) else int(t) for t, _ in orders]
+        arrays = dict(compiled.arrays)
+        arrays["product_type"] = np.concatenate([compiled.product_type, np.asarray(types, dtype=np.int64)])
+        arrays["deadline"] = np.concatenate([compiled.deadline,
+                                             np.asarray([deadline for _, deadline in orders], dtype=np.int64)])
+        new_products = list(range(compiled.size, compiled.size + len(orders)))
+        self.plan = CompactPlan(CompiledPlan(arrays, compiled.metadata))
+        self.tail = self.tail + new_products
+        return new_products
+
+    def simulator(self, tail):
+        self.plan.set_sequence([int(i) for i in tail])
+        return TailSimulator(self.plan, self.state, self.finished, self.release_time, printing=self.printing,
+                             claim=self.claim, dispatching=self.dispatching)
+
+    def evaluate(self, tail, i=None):
+        """Fitness of the complete sequence with the given tail, only the tail is simulated"""
+        simulator = self.simulator(tail)
+        makespan, tardiness = simulator.simulate(SIM_TIME=self.sim_time, RANDOM_SEED=self.seed, write=False)
+        return self.l1 * makespan + self.l2 * tardiness if simulator.feasible else float("inf")
+
+    def schedule(self, tail=None):
+        """Complete schedule: the activities completed before the wall time, followed by the simulated rest"""
+        simulator = self.simulator(self.tail if tail is None else tail)
+        simulator.simulate(SIM_TIME=self.sim_time, RANDOM_SEED=self.seed, write=False)
+        return pd.concat([self.done, simulator.resource_usage], ignore_index=True)
+
+    def sequence(self):
+        return self.frozen + self.tail
+
+    def reschedule(self, method="local_search", stop_criterium="Budget", budget=100, time_limit=60,
+                   output_file="results_rescheduling.txt", printing=False, write=False):
+        """
+        Optimise the tail with local_search or iterated_greedy, warm-started from the current tail
+        :return: complete sequence and its fitness
+        """
+        f_eval = lambda x, i: self.evaluate(x, i)
+        init = np.asarray(self.tail)
+        if method == "local_search":
+            _, best_tail = local_search(len(init), f_eval, time_limit=time_limit, stop_criterium=stop_criterium,
+                                        budget=budget, output_file=output_file, printing=printing, write=write,
+                                        init=init)
+        elif method == "iterated_greedy":
+            _, best_tail = iterated_greedy(len(init), f_eval, d=min(7, len(init)), seed=self.seed,
+                                           time_limit=time_limit, output_file=output_file, printing=printing,
+                                           write=write, stop_criterium=stop_criterium, budget=budget, init=init)
+        else:
+            raise ValueError(f'unknown method {method}, use local_search or iterated_greedy')
+        self.tail = [int(i) for i in best_tail]
+        return self.sequence(), self.evaluate(self.tail)
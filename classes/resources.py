@@ -0,0 +1,141 @@
+"""
+SimPy resource that hands out the machines of a factory in bundles. A request for the needs of an activity, e.g.
+[("Tank", 1), ("Filter", 2)], is granted in one event and only when the complete bundle is free, so that no machine
+is held while the other machines of the bundle are still missing.
+PriorityMachineStore serves the waiting requests by priority instead of in the order of arrival.
+"""
+import heapq
+from collections import deque, namedtuple
+from simpy.core import BoundClass
+from simpy.resources import base
+
+Machine = namedtuple('Machine', 'resource_group, id')
+
+
+class BundlePut(base.Put):
+    """Release a list of machines"""
+    def __init__(self, resource, machines):
+        self.machines = machines
+        super().__init__(resource)
+
+
+class BundleGet(base.Get):
+    """Request a bundle, the value of the event is the list of the claimed machines"""
+    def __init__(self, resource, needs, priority=0):
+        self.needs = needs
+        self.priority = priority
+        self.number = None
+        super().__init__(resource)
+
+    def cancel(self):
+        if not self.triggered:
+            self.resource.withdraw(self)
+
+
+class MachineStore(base.BaseResource):
+    """
+    Store of machines with atomic multi-unit claims. Waiting requests are checked in the order of arrival, every
+    request that fits in the free machines is granted, also if an earlier request still has to wait (like a
+    FilterStore). Per resource group the machines are handed out in the same order as by the FilterStore of the
+    simulators: lowest id first, released machines at the back.
+    Waiting requests are indexed per resource group instead of kept in get_queue: only requests that need a resource
+    group with machines released since the last check can be granted, all other waiting requests still do not fit.
+    """
+    def __init__(self, env, resource_names, capacity):
+        super().__init__(env, capacity=sum(capacity))
+        self.free = {name: deque(Machine(name, j) for j in range(0, count))
+                     for name, count in zip(resource_names, capacity)}
+        self.requests = {}
+        self.waiting = {name: set() for name in resource_names}
+        self.nr_requests = 0
+        self.released = set()
+
+    put = BoundClass(BundlePut)
+    get = BoundClass(BundleGet)
+
+    def _do_put(self, event):
+        for machine in event.machines:
+            self.free[machine.resource_group].append(machine)
+            self.released.add(machine.resource_group)
+        event.succeed()
+
+    def _do_get(self, event):
+        if all(len(self.free[name]) >= count for name, count in event.needs):
+            event.succeed([self.free[name].popleft() for name, count in event.needs for _ in range(0, count)])
+
+    def withdraw(self, event):
+        del self.requests[event.number]
+        for name, count in event.needs:
+            self.waiting[name].discard(event.number)
+
+    def _trigger_get(self, put_event):
+        # Check the waiting requests for the released resource groups in the order of arrival
+        released = [name for name in self.released if self.waiting[name]]
+        self.released.clear()
+        numbers = set()
+        for name in released:
+            numbers.update(self.waiting[name])
+        for number in sorted(numbers):
+            event = self.requests[number]
+            self._do_get(event)
+            if event.triggered:
+                self.withdraw(event)
+                # Stop when no released machines are left
+                if not any(self.free[name] for name in released):
+                    break
+
+        if put_event is None and self.get_queue:
+            # A new request: grant it at once, or let it wait
+            event = self.get_queue.pop()
+            self._do_get(event)
+            if not event.triggered:
+                event.number = self.nr_requests
+                self.nr_requests += 1
+                self.requests[event.number] = event
+                for name, count in event.needs:
+                    self.waiting[name].add(event.number)
+
+
+class PriorityMachineStore(MachineStore):
+    """
+    MachineStore that serves waiting requests by priority, lowest first and ties in the order of arrival. The
+    waiting requests of every resource group are kept in a heap, so a request is queued and granted in O(log n).
+    A bundle that waits for several resource groups is in the heap of each of them, granted bundles are removed
+    from the heaps when they reach the top.
+    """
+    def __init__(self, env, resource_names, capacity):
+        super().__init__(env, resource_names, capacity)
+        self.waiting = {name: [] for name in resource_names}
+
+    def withdraw(self, event):
+        del self.requests[event.number]
+
+    def _trigger_get(self, put_event):
+        released = self.released
+        self.released = set()
+        if put_event is None and self.get_queue:
+            # Queue a new request, it competes by priority with the requests that are already waiting
+            event = self.get_queue.pop()
+            event.number = self.nr_requests
+            self.nr_requests += 1
+            self.requests[event.number] = event
+            for name, count in event.needs:
+                heapq.heappush(self.waiting[name], (event.priority, event.number, event))
+                released.add(name)
+
+        for name in released:
+            heap = self.waiting[name]
+            blocked = []
+            while heap and self.free[name]:
+                entry = heapq.heappop(heap)
+                event = entry[2]
+                if event.number not in self.requests:
+                    continue
+                self._do_get(event)
+                if event.triggered:
+                    self.withdraw(event)
+                else:
+                    # A bundle that waits for another resource group
+                    blocked.append(entry)
+            for entry in blocked:
+                heapq.heappush(heap, entry)
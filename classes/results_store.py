@@ -0,0 +1,149 @@
+"""
+Binary store of the results of the search runs. Every run is a directory named by Settings.make_file_name(), with an
+.npy file per column of its history: the sequence columns as 2-D arrays of the smallest integer type (iteration x
+position), the other columns as float arrays. The columns are opened memory-mapped, so the best sequence or the
+convergence curve of a run is read without loading or parsing the rest of the run. index.csv has a row per run with
+its settings and final result, to select and aggregate thousands of runs without opening them.
+Runs that are not in the store yet are imported from their text (or csv) file in results/results_algorithm on first
+use.
+"""
+import os
+import re
+import numpy as np
+import pandas as pd
+from classes.compact import _downcast
+
+# Settings in the file names of Settings.make_file_name()
+FILE_NAME_PATTERN = re.compile(r'^(?P<method>.+?)_simulator=(?P<simulator>.+?)_'
+                               r'(?:budget=(?P<budget>[^_]+)|time_limit=(?P<time_limit>[^_]+))_seed=(?P<seed>[^_]+)_'
+                               r'instance_(?P<instance>.+?)_objective=(?P<objective>.+?)_init=(?P<init>[^_]+?)'
+                               r'(?:_claim=(?P<claim>[^_]+?))?(?:_dispatching=(?P<dispatching>[^_]+?))?$')
+INDEX_COLUMNS = ["method", "simulator", "stop_criterium", "budget", "time_limit", "seed", "instance", "objective",
+                 "init", "claim", "dispatching", "l1", "l2", "size", "iterations", "best_fitness", "time"]
+
+
+def parse_sequence(value):
+    """Sequence as written by the search methods, e.g. "[3, 1, 2]" or "[ 3  1  2]", or a list or array"""
+    if isinstance(value, str):
+        return [int(i) for i in value.strip()[1:-1].replace(",", " ").split()]
+    return [int(i) for i in value]
+
+
+def settings_of(key):
+    """Settings in a file name of Settings.make_file_name(), None for file names of another form"""
+    match = FILE_NAME_PATTERN.match(key)
+    if match is None:
+        return None
+    fields = match.groupdict()
+    fields["stop_criterium"] = "Time" if fields["time_limit"] is not None else "Budget"
+    fields["claim"] = fields["claim"] or "unit"
+    fields["dispatching"] = fields["dispatching"] or "fifo"
+    weights = re.match(r'^l1=([^_]+)_l2=([^_]+)$', fields["objective"])
+    if weights is not None:
+        fields["l1"], fields["l2"] = float(weights.group(1)), float(weights.group(2))
+    return fields
+
+
+class ResultsStore:
+    def __init__(self, root="results/results_store", text_directory="results/results_algorithm"):
+        self.root = root
+        self.text_directory = text_directory
+        self._index = None
+
+    @staticmethod
+    def key(setting):
+        """A run is identified by the file name of its Settings"""
+        return setting if isinstance(setting, str) else setting.make_file_name()
+
+    def directory(self, setting):
+        return os.path.join(self.root, "runs", self.key(setting))
+
+    @property
+    def index(self):
+        if self._index is None:
+            path = os.path.join(self.root, "index.csv")
+            self._index = pd.read_csv(path, index_col="key") if os.path.exists(path) else \
+                pd.DataFrame(columns=INDEX_COLUMNS).rename_axis("key")
+        return self._index
+
+    def write_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        self.index.to_csv(os.path.join(self.root, "index.csv"))
+
+    def __contains__(self, setting):
+        return self.key(setting) in self.index.index
+
+    def save(self, setting, results, write_index=True):
+        """
+        Store the history of a run
+        :param setting: Settings of the run, or its file name
+        :param results: DataFrame with a row per iteration, as written by the search methods
+        """
+        key = self.key(setting)
+        directory = self.directory(key)
+        os.makedirs(directory, exist_ok=True)
+        for name in results.columns:
+            if "sequence" in name.lower():
+                array = _downcast(np.array([parse_sequence(value) for value in results[name]], dtype=np.int64))
+            else:
+                array = np.asarray(results[name], dtype=float)
+            np.save(os.path.join(directory, f'{name}.npy'), array)
+
+        if isinstance(setting, str):
+            fields = settings_of(key) or {}
+        else:
+            fields = {name: getattr(setting, name) for name in INDEX_COLUMNS if hasattr(setting, name)}
+        sequence_column = "Best_sequence" if "Best_sequence" in results.columns else "Sequence"
+        fields.update({"size": len(parse_sequence(results[sequence_column].iloc[-1])), "iterations": len(results),
+                       "best_fitness": results["Best_fitness"].iloc[-1] if "Best_fitness" in results.columns else
+                       results["Fitness"].min(),
+                       "time": results["Time"].iloc[-1] if "Time" in results.columns else np.nan})
+        self.index.loc[key] = pd.Series(fields).reindex(INDEX_COLUMNS)
+        if write_index:
+            self.write_index()
+
+    def import_text(self, setting, path=None, write_index=True):
+        """Store a run from the text file of a search method, its sequences are parsed once here"""
+        key = self.key(setting)
+        if path is None:
+            path = os.path.join(self.text_directory, f'{key}.txt')
+            if not os.path.exists(path):
+                path = os.path.join(self.text_directory, f'{key}.csv')
+        self.save(setting, pd.read_csv(path), write_index=write_index)
+
+    def import_directory(self, directory=None):
+        """Store all runs in a directory of text files, that are not in the store yet"""
+        directory = directory or self.text_directory
+        files = {file[:-4]: file for file in sorted(os.listdir(directory), reverse=True)
+                 if file.endswith(".txt") or file.endswith(".csv")}
+        new = [key for key in sorted(files) if key not in self]
+        for key in new:
+            self.import_text(key, os.path.join(directory, files[key]), write_index=False)
+        self.write_index()
+        return new
+
+    def column(self, setting, name):
+        """Column of the history of a run, memory-mapped"""
+        key = self.key(setting)
+        path = os.path.join(self.directory(key), f'{name}.npy')
+        if not os.path.exists(path) and key not in self:
+            self.import_text(setting)
+        return np.load(path, mmap_mode="r")
+
+    def columns(self, setting):
+        if setting not in self:
+            self.import_text(setting)
+        return [file[:-4] for file in sorted(os.listdir(self.directory(setting))) if file.endswith(".npy")]
+
+    def best_sequence(self, setting):
+        """Best sequence at the end of a run"""
+        return [int(i) for i in self.column(setting, "Best_sequence")[-1]]
+
+    def convergence(self, setting, name="Best_fitness"):
+        """Best fitness per iteration of a run"""
+        return np.asarray(self.column(setting, name))
+
+    def history(self, setting):
+        """All columns of a run except the sequences, as a DataFrame"""
+        return pd.DataFrame({name: self.column(setting, name) for name in self.columns(setting)
+                             if "sequence" not in name.lower()})
@@ -0,0 +1,137 @@
+"""
+Cache of completed experiment runs. A run is identified by a hash of the fields of its Settings, the contents of its
+instance file and the source files of the simulator and search method it uses. A changed script, that leaves these
+unchanged, finds its runs in the cache; a changed simulator, method or instance gives new hashes, so only those runs
+are computed again. Every cached run is a directory results/run_cache/<hash> with run.json (settings, instance,
+source files and the summary row of the run) and copies of its output files, that are restored when it is reused.
+A run is stale when its hash no longer matches the current files, stale runs can be removed with gc().
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from classes.general import Settings
+
+# Source files that every simulation uses
+COMMON_SOURCES = ["classes/classes.py", "classes/resources.py", "classes/general.py", "classes/validation.py",
+                  "classes/analytics.py", "classes/compiled.py"]
+# Modules in methods/ of the search methods that use other modules than the one of their own name
+METHOD_MODULES = {"local_search": ["local_search", "ask_tell"],
+                  "parallel_local_search": ["local_search", "ask_tell"],
+                  "random_search": ["random_search", "ask_tell"],
+                  "iterated_greedy": ["iterated_greedy", "ask_tell"],
+                  "tabu_search": ["tabu_search", "local_search", "ask_tell"]}
+# Modules in classes/ that evaluate the sequences of a search method, e.g. the process pool of the pooled methods
+METHOD_CLASSES = {"parallel_local_search": ["shared_plan"],
+                  "genetic_algorithm": ["shared_plan"]}
+
+
+def source_files(simulator, methods):
+    """
+    Source files that determine the result of a run
+    :param simulator: name of the simulator module, e.g. "simulator_3"
+    :param methods: names of the modules in methods/ that the run uses, e.g. ["rolling_horizon", "local_search"]
+    """
+    modules = [module for method in methods for module in METHOD_MODULES.get(method, [method])]
+    classes = [module for method in methods for module in METHOD_CLASSES.get(method, [])]
+    return [f'classes/{simulator}.py'] + COMMON_SOURCES + [f'methods/{module}.py' for module in modules] + \
+        [f'classes/{module}.py' for module in classes]
+
+
+class RunCache:
+    def __init__(self, root="results/run_cache"):
+        self.root = root
+        self._file_hashes = {}
+
+    def file_hash(self, path):
+        """Hash of the contents of a file, recomputed only when the file has changed"""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        cached = self._file_hashes.get(path)
+        if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, "rb") as file:
+                cached = ((stat.st_mtime_ns, stat.st_size), hashlib.sha256(file.read()).hexdigest())
+            self._file_hashes[path] = cached
+        return cached[1]
+
+    def key(self, setting, instance_file, sources):
+        """Hash of a run"""
+        content = {"settings": {name: value for name, value in sorted(vars(setting).items())},
+                   "instance": self.file_hash(instance_file),
+                   "sources": {path: self.file_hash(path) for path in sorted(sources)}}
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def directory(self, key):
+        return os.path.join(self.root, key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self.directory(key), "run.json"))
+
+    def save(self, key, setting, instance_file, sources, row, files=()):
+        """
+        Cache a completed run
+        :param row: summary of the run, e.g. its row in the summary table
+        :param files: output files of the run, copies are kept in the cache
+        """
+        directory = self.directory(key)
+        os.makedirs(directory, exist_ok=True)
+        outputs = {}
+        for k, path in enumerate(files):
+            if os.path.exists(path):
+                outputs[path] = f'output_{k}{os.path.splitext(path)[1]}'
+                shutil.copyfile(path, os.path.join(directory, outputs[path]))
+        manifest = {"key": key, "file_name": setting.make_file_name(), "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "settings": vars(setting), "instance_file": instance_file, "sources": list(sources),
+                    "row": row, "outputs": outputs}
+        with open(os.path.join(directory, "run.json"), "w") as file:
+            json.dump(manifest, file, indent=1, default=lambda value: value.item() if hasattr(value, "item") else
+                      str(value))
+
+    def manifest(self, key):
+        with open(os.path.join(self.directory(key), "run.json")) as file:
+            return json.load(file)
+
+    def load(self, key, restore=True):
+        """
+        Summary row of a cached run, its output files are copied back to their original location
+        """
+        manifest = self.manifest(key)
+        if restore:
+            for path, name in manifest["outputs"].items():
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copyfile(os.path.join(self.directory(key), name), path)
+        return manifest["row"]
+
+    def keys(self):
+        if not os.path.exists(self.root):
+            return []
+        return sorted(key for key in os.listdir(self.root) if key in self)
+
+    def is_stale(self, key):
+        """A run is stale when its settings, instance and sources give another hash now"""
+        manifest = self.manifest(key)
+        setting = Settings(**manifest["settings"])
+        return self.key(setting, manifest["instance_file"], manifest["sources"]) != key
+
+    def list(self):
+        """Table of all cached runs"""
+        table = []
+        for key in self.keys():
+            manifest = self.manifest(key)
+            table.append({"key": key[:12], "file_name": manifest["file_name"], "created": manifest["created"],
+                          "stale": self.is_stale(key)})
+        return table
+
+    def gc(self, dry_run=False):
+        """
+        Remove the stale runs from the cache
+        :return: keys of the removed runs
+        """
+        stale = [key for key in self.keys() if self.is_stale(key)]
+        if not dry_run:
+            for key in stale:
+                shutil.rmtree(self.directory(key))
+        return stale
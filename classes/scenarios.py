@@ -0,0 +1,123 @@
+"""
+What-if scenarios for capacity planning: one production sequence is simulated under variants of the factory, such
+as an extra fermenter, one filter less or faster filtration. A scenario is a dictionary with a "name" and the
+overrides:
+    "capacity":                {resource group: number of machines}
+    "processing_time":         {(product name, activity index): (minimal, maximal processing time)}
+    "processing_time_factor":  {resource group: factor for the processing times of the activities that need it}
+The scenario plans share all arrays of the compiled base plan that they do not override, no factory is copied.
+"""
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from classes.analytics import summarise
+from classes.compact import CompactPlan
+from classes.compiled import CompiledPlan
+
+_base = None
+
+
+def capacity_variants(factory, groups=None, deltas=(-1, 1)):
+    """
+    Scenarios with one machine more or less of a resource group, together with the base scenario
+    :param factory: Class Factory or CompactFactory
+    :param groups: resource groups to vary, by default all
+    """
+    scenarios = [{"name": "base"}]
+    for group, capacity in zip(factory.RESOURCE_NAMES, factory.CAPACITY):
+        if groups is not None and group not in groups:
+            continue
+        for delta in deltas:
+            if capacity + delta > 0:
+                scenarios.append({"name": f"{group} {delta:+d}", "capacity": {group: capacity + delta}})
+    return scenarios
+
+
+def scenario_plan(compiled, scenario):
+    """
+    CompactPlan of a scenario, only the overridden arrays of the compiled base plan are replaced
+    """
+    arrays = dict(compiled.arrays)
+    resource_names = compiled.metadata["resource_names"]
+    if "capacity" in scenario:
+        capacity = compiled.capacity.copy()
+        for group, count in scenario["capacity"].items():
+            capacity[resource_names.index(group)] = count
+        arrays["capacity"] = capacity
+    if "processing_time" in scenario or "processing_time_factor" in scenario:
+        low, high = compiled.activity_min.copy(), compiled.activity_max.copy()
+        need_activity = np.repeat(np.arange(len(low)), np.diff(compiled.need_ptr))
+        for group, factor in scenario.get("processing_time_factor", {}).items():
+            activities = np.unique(need_activity[compiled.need_group == resource_names.index(group)])
+            low[activities] = np.round(low[activities] * factor)
+            high[activities] = np.round(high[activities] * factor)
+        for (product_name, i), (minimal, maximal) in scenario.get("processing_time", {}).items():
+            a = compiled.type_activity_ptr[compiled.metadata["product_names"].index(product_name)] + i
+            low[a], high[a] = minimal, maximal
+        arrays["activity_min"], arrays["activity_max"] = low, high
+    return CompactPlan(CompiledPlan(arrays, compiled.metadata))
+
+
+def _initialise(base):
+    global _base
+    _base = base
+
+
+def _simulate(task):
+    index, scenario, sequence, simulator_name, seed, sim_time = task
+    if simulator_name == "simulator_1":
+        from classes.simulator_1 import Simulator
+    if simulator_name == "simulator_2":
+        from classes.simulator_2 import Simulator
+    if simulator_name == "simulator_3":
+        from classes.simulator_3 import Simulator
+    if simulator_name == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
+
+    plan = scenario_plan(_base, scenario)
+    plan.set_sequence(sequence)
+    simulator = Simulator(plan, printing=False)
+    makespan, tardiness = simulator.simulate(SIM_TIME=sim_time, RANDOM_SEED=seed, write=False)
+    summary = None
+    if simulator.feasible:
+        capacity = dict(zip(plan.FACTORY.RESOURCE_NAMES, plan.FACTORY.CAPACITY))
+        summary = summarise(simulator.resource_usage, capacity)
+    return index, seed, makespan, tardiness, simulator.infeasibility, summary
+
+
+def run_scenarios(plan, sequence, scenarios, simulator="simulator_3", seeds=(1,), sim_time=10000000,
+                  processes=None):
+    """
+    Simulate a production sequence under every scenario, in parallel. The compiled base plan is sent once to every
+    worker process, a task only holds the overrides of its scenario.
+    :param plan: Class ProductionPlan, CompactPlan or CompiledPlan
+    :param seeds: random seeds, scenarios with fixed processing times are simulated for the first seed only
+    :return: DataFrame with a row per scenario, seed and resource group
+    """
+    compiled = plan if isinstance(plan, CompiledPlan) else getattr(plan, "compiled", None)
+    if compiled is None:
+        compiled = CompiledPlan.from_plan(plan)
+    sequence = [int(i) for i in sequence]
+    tasks = []
+    for index, scenario in enumerate(scenarios):
+        # A scenario can override fixed processing times of the base plan with ranges, or the other way around
+        scenario_seeds = list(seeds)[:1] if scenario_plan(compiled, scenario).is_deterministic() else seeds
+        tasks += [(index, scenario, sequence, simulator, seed, sim_time) for seed in scenario_seeds]
+
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), initializer=_initialise,
+                             initargs=(compiled,)) as pool:
+        results = list(pool.map(_simulate, tasks))
+
+    table = []
+    for index, seed, makespan, tardiness, infeasibility, summary in results:
+        row = {"Scenario": scenarios[index].get("name", str(index)), "Seed": seed, "Makespan": makespan,
+               "Tardiness": tardiness, "Infeasibility": infeasibility}
+        if summary is None:
+            table.append(row)
+            continue
+        for g, group in enumerate(summary["Resource"]):
+            table.append({**row, "Resource": group, "Capacity": summary["Capacity"][g],
+                          "Utilisation": summary["Utilisation"][g], "Bottleneck share": summary["Bottleneck share"][g],
+                          "Mean wait": summary["Mean wait"][g]})
+    return pd.DataFrame(table)
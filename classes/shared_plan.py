@@ -0,0 +1,244 @@
+"""
+Shared-memory representation of a compiled production plan. The arrays of a CompiledPlan are copied once into a
+shared memory block; worker processes attach to that block and use numpy views on it. Sequences and results move
+through shared ring buffers, so per task only a slot index passes through the synchronisation primitives.
+"""
+import os
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from classes.compiled import CompiledPlan
+
+
+class SharedPlan:
+    def __init__(self, shm, arrays, metadata, layout, owner):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.compiled = CompiledPlan(arrays, metadata)
+
+    @classmethod
+    def create(cls, plan):
+        """
+        Copy the compiled plan into a new shared memory block
+        :param plan: Class ProductionPlan or CompiledPlan
+        """
+        compiled = plan if isinstance(plan, CompiledPlan) else CompiledPlan.from_plan(plan)
+        layout = {}
+        offset = 0
+        for name in CompiledPlan.ARRAY_NAMES:
+            layout[name] = (offset, len(compiled.arrays[name]))
+            offset += len(compiled.arrays[name])
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1) * 8)
+        arrays = cls._views(shm, layout)
+        for name in CompiledPlan.ARRAY_NAMES:
+            arrays[name][:] = compiled.arrays[name]
+        return cls(shm, arrays, compiled.metadata, layout, owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Attach to an existing shared plan, without copying the arrays
+        :param handle: tuple returned by SharedPlan.handle()
+        """
+        name, layout, metadata = handle
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, cls._views(shm, layout), metadata, layout, owner=False)
+
+    @staticmethod
+    def _views(shm, layout):
+        buffer = np.ndarray((shm.size // 8,), dtype=np.int64, buffer=shm.buf)
+        return {name: buffer[offset:offset + length] for name, (offset, length) in layout.items()}
+
+    def handle(self):
+        """
+        Small picklable description of the shared plan, that is sent to the workers
+        """
+        return self.shm.name, self.layout, self.compiled.metadata
+
+    def close(self):
+        self.compiled = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedRing:
+    """
+    Ring buffer of fixed-width task slots in shared memory, with one producer (the parent) and many consumers
+    (the workers). A task slot holds a stop flag and the seed, followed by a sequence. The result slot with the same
+    index holds (makespan, tardiness, status); a worker of which the simulation fails sets status 1 and puts the
+    error message in the errors queue.
+    """
+    def __init__(self, capacity, width, context=None):
+        context = context or mp.get_context()
+        self.capacity = capacity
+        self.width = width
+        self.tasks_shm = shared_memory.SharedMemory(create=True, size=capacity * (width + 2) * 8)
+        self.results_shm = shared_memory.SharedMemory(create=True, size=capacity * 3 * 8)
+        self.counters_shm = shared_memory.SharedMemory(create=True, size=2 * 8)
+        self.items = context.Semaphore(0)
+        self.done = context.Semaphore(0)
+        self.lock = context.Lock()
+        self.errors = context.SimpleQueue()
+        self.owner = True
+        self._views()
+        self.counters[:] = 0
+
+    def _views(self):
+        self.tasks = np.ndarray((self.capacity, self.width + 2), dtype=np.int64, buffer=self.tasks_shm.buf)
+        self.results = np.ndarray((self.capacity, 3), dtype=np.float64, buffer=self.results_shm.buf)
+        # counters[0] is the head (next slot to write), counters[1] the tail (next slot to read)
+        self.counters = np.ndarray((2,), dtype=np.int64, buffer=self.counters_shm.buf)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ["tasks_shm", "results_shm", "counters_shm"]:
+            state[name] = state[name].name
+        for name in ["tasks", "results", "counters"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name in ["tasks_shm", "results_shm", "counters_shm"]:
+            setattr(self, name, shared_memory.SharedMemory(name=state[name]))
+        self.owner = False
+        self._views()
+
+    def push(self, seed, sequence, stop=False):
+        """
+        Write a task in the next slot (producer side), the caller makes sure that this slot is free
+        :param stop: the worker that takes this task ends
+        :return: index of the slot
+        """
+        slot = self.counters[0] % self.capacity
+        self.tasks[slot, 0] = stop
+        self.tasks[slot, 1] = seed
+        self.tasks[slot, 2:] = sequence
+        self.counters[0] += 1
+        self.items.release()
+        return slot
+
+    def pop(self):
+        """
+        Take the next task (consumer side)
+        :return: index of the slot
+        """
+        self.items.acquire()
+        with self.lock:
+            slot = self.counters[1] % self.capacity
+            self.counters[1] += 1
+        return slot
+
+    def close(self):
+        self.tasks = self.results = self.counters = None
+        for shm in [self.tasks_shm, self.results_shm, self.counters_shm]:
+            shm.close()
+            if self.owner:
+                shm.unlink()
+
+
+def _worker(plan_handle, ring, simulator_name, sim_time, claim, dispatching):
+    if simulator_name == "simulator_1":
+        from classes.simulator_1 import Simulator
+    if simulator_name == "simulator_2":
+        from classes.simulator_2 import Simulator
+    if simulator_name == "simulator_3":
+        from classes.simulator_3 import Simulator
+    if simulator_name == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
+
+    ring.owner = False
+    shared = SharedPlan.attach(plan_handle)
+    # The simulators work on the object graph, which is built once from the shared arrays
+    plan = shared.compiled.to_plan()
+    simulator = Simulator(plan, printing=False, claim=claim, dispatching=dispatching)
+    while True:
+        slot = ring.pop()
+        if ring.tasks[slot, 0]:
+            break
+        try:
+            plan.set_sequence(ring.tasks[slot, 2:].tolist())
+            makespan, tardiness = simulator.simulate(SIM_TIME=sim_time, RANDOM_SEED=int(ring.tasks[slot, 1]),
+                                                     write=False)
+            ring.results[slot] = makespan, tardiness, 0
+        except Exception as error:
+            # The worker stays alive, the parent raises the error once all tasks of the batch are done
+            ring.errors.put(repr(error))
+            ring.results[slot] = np.nan, np.nan, 1
+        ring.done.release()
+    shared.close()
+    ring.close()
+
+
+class SharedPlanPool:
+    def __init__(self, plan, simulator="simulator_3", processes=None, sim_time=10000000, capacity=None, claim="unit",
+                 dispatching="fifo"):
+        """
+        Pool of worker processes that evaluate sequences of one production plan, kept in shared memory
+        :param plan: Class ProductionPlan or CompiledPlan
+        :param simulator: "simulator_1", "simulator_2" or "simulator_3"
+        :param processes: number of worker processes, by default the number of cores
+        :param sim_time: simulation horizon
+        :param capacity: number of slots in the ring buffer
+        :param claim: claim of the machines of an activity, as Settings.claim
+        :param dispatching: order of the waiting requests, as Settings.dispatching
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.shared = SharedPlan.create(plan)
+        self.ring = SharedRing(max(capacity or 4 * self.processes, self.processes), self.shared.compiled.size)
+        self.workers = []
+        for _ in range(0, self.processes):
+            worker = mp.Process(target=_worker, args=(self.shared.handle(), self.ring, simulator, sim_time, claim,
+                                                        dispatching),
+                                daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def evaluate_many(self, sequences, seed=1):
+        """
+        Evaluate a batch of sequences
+        :return: numpy array with a row (makespan, tardiness) per sequence
+        """
+        results = np.empty((len(sequences), 2))
+        for start in range(0, len(sequences), self.ring.capacity):
+            chunk = sequences[start:start + self.ring.capacity]
+            slots = [self.ring.push(seed, sequence) for sequence in chunk]
+            for _ in chunk:
+                self._wait()
+            failed = int(self.ring.results[slots, 2].sum())
+            if failed:
+                messages = [self.ring.errors.get() for _ in range(0, failed)]
+                raise RuntimeError(f'{failed} simulations failed in the worker processes, the first with '
+                                   f'{messages[0]}')
+            results[start:start + len(chunk)] = self.ring.results[slots, :2]
+        return results
+
+    def _wait(self, interval=1.0):
+        """Wait for the next finished task, a worker that was killed (e.g. out of memory) raises an error"""
+        while not self.ring.done.acquire(timeout=interval):
+            dead = [worker for worker in self.workers if not worker.is_alive()]
+            if dead:
+                raise RuntimeError(f'{len(dead)} worker processes died (exit code {dead[0].exitcode}), the pool '
+                                   f'can not finish its tasks')
+
+    def fitness_many(self, sequences, setting):
+        results = self.evaluate_many(sequences, seed=setting.seed)
+        # Infeasible plans have an infinite fitness, also when one of the weights is zero
+        return [setting.l1 * makespan + setting.l2 * tardiness if makespan != float("inf") else float("inf")
+                for makespan, tardiness in results.tolist()]
+
+    def close(self):
+        for _ in self.workers:
+            self.ring.push(0, 0, stop=True)
+        for worker in self.workers:
+            worker.join()
+        self.ring.close()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -3,10 +3,13 @@ import simpy
 import random
 import pandas as pd
 from collections import namedtuple
+from classes.resources import MachineStore, PriorityMachineStore
+from classes.validation import validate_schedule
+from classes.analytics import critical_path
 
 
 class Simulator:
-    def __init__(self, plan, printing=False):
+    def __init__(self, plan, printing=False, claim="unit", dispatching="fifo", summarise=False):
         self.plan = plan
         self.RESOURCE_NAMES = plan.FACTORY.RESOURCE_NAMES
         self.NR_RESOURCES = len(self.RESOURCE_NAMES)
@@ -15,13 +18,70 @@ class Simulator:
         self.env = simpy.Environment()
         self.resource_usage = []
         self.printing = printing
+        # With fixed processing times the simulation does not depend on the random seed
+        self.deterministic = plan.is_deterministic()
+        self.feasible = True
+        self.infeasibility = None
+        # "unit": every machine is requested by its own process, "bundle": the machines of an activity are
+        # claimed together in one event, see MachineStore
+        self.claim = claim
+        # Order in which waiting requests are served: "fifo" (order of arrival), "sequence" (position in the
+        # production sequence), "deadline" or "slack", see dispatch_priority
+        self.dispatching = dispatching
+        # Keep a critical-path summary of every simulated schedule in self.summary, see analytics.critical_path
+        self.summarise = summarise
+        self.summary = None
 
-    def resource_request(self, product, resource_group):
-        resource = yield self.factory.get(lambda resource: resource.resource_group == resource_group)
+    def resource_request(self, product, resource_group, priority=0):
+        if self.dispatching == "fifo":
+            resource = yield self.factory.get(lambda resource: resource.resource_group == resource_group)
+        else:
+            resource = (yield self.factory.get([(resource_group, 1)], priority=priority))[0]
         if self.printing:
             print(product, 'requested', resource.resource_group, ' id ', resource.id, 'at', self.env.now)
         return resource
 
+    def dispatch_priority(self, p, position):
+        """
+        Priority of the requests of product p, lower is served first. The slack is the time left until the deadline
+        minus the minimal flow time of the product, at the moment of the request.
+        :param position: position of product p in the production sequence
+        """
+        if self.dispatching == "sequence":
+            return position
+        if self.dispatching == "deadline":
+            return self.plan.PRODUCTS[p].DEADLINE
+        if self.dispatching == "slack":
+            return self.plan.PRODUCTS[p].DEADLINE - self.env.now - self.plan.PRODUCTS[p].min_flow_time()
+        return 0
+
+    def request_resources(self, p, needs, position=0):
+        """
+        Request the machines for the needs of an activity, one process per unit (claim="unit") or one bundle
+        request that is granted when all machines are free (claim="bundle")
+        :param position: position of product p in the production sequence
+        :return: list of request events and the resource group of every requested machine
+        """
+        priority = self.dispatch_priority(p, position)
+        resources_required_act = []
+        resources_names_act = []
+        if self.claim == "bundle":
+            bundle = [(self.RESOURCE_NAMES[r], needs[r]) for r in range(0, self.NR_RESOURCES) if needs[r] > 0]
+            if bundle:
+                resources_required_act.append(self.factory.get(bundle, priority=priority))
+            resources_names_act = [resource_name for resource_name, need in bundle for _ in range(0, need)]
+            return resources_required_act, resources_names_act
+
+        for r in range(0, self.NR_RESOURCES):
+            need = needs[r]
+            if need > 0:
+                for _ in range(0, need):
+                    resource_name = self.RESOURCE_NAMES[r]
+                    resources_required_act.append(self.env.process(self.resource_request(product=p, resource_group=resource_name,
+                                                                                          priority=priority)))
+                    resources_names_act.append(resource_name)
+        return resources_required_act, resources_names_act
+
     def product(self, p, priority):
 
         # FIRST DO THE REQUESTING
@@ -32,19 +92,9 @@ class Simulator:
         for i in range(0, 1):
             activity = activities[i]
             needs = activity.NEEDS
-            duration = random.randint(*activity.PROCESSING_TIME)
+            duration = activity.PROCESSING_TIME[0] if self.deterministic else random.randint(*activity.PROCESSING_TIME)
             durations.append(duration)
-            resources_required_act = []
-            resources_names_act = []
-            for r in range(0, self.NR_RESOURCES):
-                need = needs[r]
-                if need > 0:
-                    for _ in range(0, need):
-                        resource_name = self.RESOURCE_NAMES[r]
-                        resources_required_act.append(self.env.process(self.resource_request(product=p, resource_group=resource_name)))
-                        resources_names_act.append(resource_name)
-            resources_required[i] = resources_required_act
-            resources_names[i] = resources_names_act
+            resources_required[i], resources_names[i] = self.request_resources(p, needs, priority)
 
         request_time = self.env.now
         yield self.env.all_of(resources_required[i])
@@ -56,19 +106,9 @@ class Simulator:
         for i in range(1, len(activities)):
             activity = activities[i]
             needs = activity.NEEDS
-            duration = random.randint(*activity.PROCESSING_TIME)
+            duration = activity.PROCESSING_TIME[0] if self.deterministic else random.randint(*activity.PROCESSING_TIME)
             durations.append(duration)
-            resources_required_act = []
-            resources_names_act = []
-            for r in range(0, self.NR_RESOURCES):
-                need = needs[r]
-                if need > 0:
-                    for _ in range(0, need):
-                        resource_name = self.RESOURCE_NAMES[r]
-                        resources_required_act.append(self.env.process(self.resource_request(product=p, resource_group=resource_name)))
-                        resources_names_act.append(resource_name)
-            resources_required[i] = resources_required_act
-            resources_names[i] = resources_names_act
+            resources_required[i], resources_names[i] = self.request_resources(p, needs, priority)
 
         for i in range(1, len(activities)):
             delay_factor = self.plan.PRODUCTS[p].TEMPORAL_RELATIONS[(0, i)]
@@ -98,9 +138,16 @@ class Simulator:
         end_time = self.env.now
 
         # NOW RELEASE ALL RESOURCES THAT WERE NEEDED
-        for j in range(0, len(resources_required)):
-            r = resources_required[j].value
-            yield self.factory.put(r)
+        if self.claim == "bundle":
+            machines = resources_required[0].value if resources_required else []
+            yield self.factory.put(machines)
+        else:
+            machines = [request.value for request in resources_required]
+        for j in range(0, len(machines)):
+            r = machines[j]
+            if self.claim != "bundle":
+                # The stores of the dispatching rules release lists of machines
+                yield self.factory.put(r if self.dispatching == "fifo" else [r])
             resource_name = resources_names[j]
             if self.printing:
                 print(f'Product {p} released resources: {resource_name} at time: {end_time}')
@@ -114,6 +161,22 @@ class Simulator:
                                         "Retrieve moment": retrieve_time,
                                         "Start": start_time,
                                         "Finish": end_time})
+        self.activity_completed()
+
+    def activity_completed(self):
+        """Count the completed activities, the run ends when all activities are completed or SIM_TIME is passed"""
+        self.nr_completed += 1
+        if (self.nr_completed == self.nr_activities or self.env.now >= self.horizon) and not self.completed.triggered:
+            self.completed.succeed()
+
+    def infeasible(self, reason):
+        """End the run with an infeasible result"""
+        self.feasible = False
+        self.infeasibility = reason
+        self.resource_usage = pd.DataFrame(self.resource_usage)
+        if self.printing:
+            print(f'WARNING: infeasible plan, {reason}')
+        return float("inf"), float("inf")
 
     def product_generator(self):
         """Generate activities that arrive at the factory. For certain activities there are temporal relations,
@@ -132,24 +195,50 @@ class Simulator:
         self.plan.SEQUENCE = [int(i) for i in self.plan.SEQUENCE]
         if self.printing:
             print(f'START Factory simulation for seed {RANDOM_SEED}')
-        random.seed(RANDOM_SEED)
+        if not self.deterministic:
+            random.seed(RANDOM_SEED)
         # Reset environment
         self.env = simpy.Environment()
         self.resource_usage = []
+        self.feasible = True
+        self.infeasibility = None
+        self.summary = None
 
-        # TO DO: REPLACE WITH FACTORY STORE TYPE
-        self.factory = simpy.FilterStore(self.env, capacity=sum(self.CAPACITY))
-        Resource = namedtuple('Machine', 'resource_group, id')
-        items = []
-        for r in range(0, self.NR_RESOURCES):
-            for j in range(0, self.CAPACITY[r]):
-                resource = Resource(self.RESOURCE_NAMES[r], j)
-                items.append(copy.copy(resource))
-        self.factory.items = items
+        # Activities that need more machines than the factory has can never start
+        problems = self.plan.check_feasibility()
+        if problems:
+            return self.infeasible(problems[0])
+
+        if self.dispatching != "fifo":
+            self.factory = PriorityMachineStore(self.env, self.RESOURCE_NAMES, self.CAPACITY)
+        elif self.claim == "bundle":
+            self.factory = MachineStore(self.env, self.RESOURCE_NAMES, self.CAPACITY)
+        else:
+            # TO DO: REPLACE WITH FACTORY STORE TYPE
+            self.factory = simpy.FilterStore(self.env, capacity=sum(self.CAPACITY))
+            Resource = namedtuple('Machine', 'resource_group, id')
+            items = []
+            for r in range(0, self.NR_RESOURCES):
+                for j in range(0, self.CAPACITY[r]):
+                    resource = Resource(self.RESOURCE_NAMES[r], j)
+                    items.append(copy.copy(resource))
+            self.factory.items = items
+        self.nr_activities = sum(len(self.plan.PRODUCTS[p].ACTIVITIES) for p in self.plan.SEQUENCE)
+        self.nr_completed = 0
+        self.horizon = SIM_TIME
+        self.completed = self.env.event()
         self.env.process(self.product_generator())
 
-        # Execute!
-        self.env.run(until=SIM_TIME)
+        # Execute! Without events left before all activities are completed, the simulation is stalled
+        try:
+            self.env.run(until=self.completed)
+        except RuntimeError:
+            if self.env.peek() != simpy.core.Infinity:
+                raise
+            return self.infeasible(f'stalled at time {self.env.now}, {self.nr_activities - self.nr_completed} '
+                                   f'activities can not obtain their resources')
+        if self.nr_completed < self.nr_activities:
+            return self.infeasible(f'not all activities are completed before SIM_TIME={SIM_TIME}')
 
         # Process results
         self.resource_usage = pd.DataFrame(self.resource_usage)
@@ -163,10 +252,15 @@ class Simulator:
                 print(f'Product {p} finished at time {finish}, while the deadline was {self.plan.PRODUCTS[p].DEADLINE}.')
             tardiness += max(0, finish - self.plan.PRODUCTS[p].DEADLINE)
 
+        if self.summarise:
+            self.summary = critical_path(self.resource_usage, self.plan)
+
         if self.printing:
             print(f"The makespan corresponding to this schedule is {makespan}")
             print(f"The lateness corresponding to this schedule is {tardiness}")
         if write:
+            for problem in validate_schedule(self.resource_usage, self.plan, simulator="simulator_3"):
+                print(f'WARNING: invalid schedule in {output_location}, {problem}')
             self.resource_usage.to_csv(output_location)
 
         return makespan, tardiness
\ No newline at end of file
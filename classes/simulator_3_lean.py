@@ -0,0 +1,206 @@
+import simpy
+import random
+import pandas as pd
+from classes.resources import MachineStore, PriorityMachineStore
+from classes.validation import validate_schedule
+from classes.analytics import critical_path
+
+
+class Simulator:
+    """
+    Lean version of simulator_3 with the same model and results: one generator per product, the activities of a
+    product are driven by callbacks. Every machine is requested with a single-unit get on a MachineStore instead
+    of a process per machine, and the machines are released by callbacks instead of yielding a put per machine.
+    With claim="bundle" the machines of an activity are requested in one bundle, and with dispatching other than
+    "fifo" the waiting requests are served by priority, as in simulator_3.
+    """
+    def __init__(self, plan, printing=False, claim="unit", dispatching="fifo", summarise=False):
+        self.plan = plan
+        self.RESOURCE_NAMES = plan.FACTORY.RESOURCE_NAMES
+        self.NR_RESOURCES = len(self.RESOURCE_NAMES)
+        self.CAPACITY = plan.FACTORY.CAPACITY
+        self.env = simpy.Environment()
+        self.resource_usage = []
+        self.printing = printing
+        # With fixed processing times the simulation does not depend on the random seed
+        self.deterministic = plan.is_deterministic()
+        self.feasible = True
+        self.infeasibility = None
+        self.claim = claim
+        self.dispatching = dispatching
+        # Keep a critical-path summary of every simulated schedule in self.summary, see analytics.critical_path
+        self.summarise = summarise
+        self.summary = None
+        # Single-unit requests per resource group, and the resource groups of the needs of every activity
+        self.units = {name: [(name, 1)] for name in self.RESOURCE_NAMES}
+        self.groups = {}
+
+    def needed_groups(self, activity):
+        key = id(activity)
+        if key not in self.groups:
+            self.groups[key] = [self.RESOURCE_NAMES[r] for r in range(0, self.NR_RESOURCES)
+                                for _ in range(0, activity.NEEDS[r])]
+        return self.groups[key]
+
+    def dispatch_priority(self, p, position):
+        """Priority of the requests of product p, lower is served first, see simulator_3"""
+        if self.dispatching == "sequence":
+            return position
+        if self.dispatching == "deadline":
+            return self.plan.PRODUCTS[p].DEADLINE
+        if self.dispatching == "slack":
+            return self.plan.PRODUCTS[p].DEADLINE - self.env.now - self.plan.PRODUCTS[p].min_flow_time()
+        return 0
+
+    def request(self, activity, priority):
+        if self.claim == "bundle":
+            bundle = [(self.RESOURCE_NAMES[r], activity.NEEDS[r]) for r in range(0, self.NR_RESOURCES)
+                      if activity.NEEDS[r] > 0]
+            return [self.factory.get(bundle, priority=priority)] if bundle else []
+        return [self.factory.get(self.units[name], priority=priority) for name in self.needed_groups(activity)]
+
+    def duration(self, activity):
+        return activity.PROCESSING_TIME[0] if self.deterministic else random.randint(*activity.PROCESSING_TIME)
+
+    def product(self, p, position):
+        """Request activity 0 at arrival, and all other activities when activity 0 has obtained its machines"""
+        product = self.plan.PRODUCTS[p]
+        activities = product.ACTIVITIES
+        request_time = self.env.now
+        duration = self.duration(activities[0])
+        requests = self.request(activities[0], self.dispatch_priority(p, position))
+        yield self.env.all_of(requests)
+        self.start(p, 0, activities[0], duration, requests, request_time)
+        self.request_activities(p, position, request_time)
+
+    def request_activities(self, p, position, request_time):
+        """Request all activities after activity 0, each starts after its offset to activity 0"""
+        product = self.plan.PRODUCTS[p]
+        activities = product.ACTIVITIES
+        durations = [self.duration(activity) for activity in activities[1:]]
+        priority = self.dispatch_priority(p, position)
+        for i in range(1, len(activities)):
+            requests = self.request(activities[i], priority)
+            waiting = self.env.all_of(requests + [self.env.timeout(product.TEMPORAL_RELATIONS[(0, i)])])
+            waiting.callbacks.append(lambda _, i=i, requests=requests:
+                                     self.start(p, i, activities[i], durations[i - 1], requests, request_time))
+
+    def start(self, p, i, activity, duration, requests, request_time):
+        retrieve_time = self.env.now
+        if self.printing:
+            print(f'Product {p}, activity {i}, retrieved resources: {self.needed_groups(activity)} at time: '
+                  f'{retrieve_time}')
+        finish = self.env.timeout(duration)
+        finish.callbacks.append(lambda _: self.release(p, i, requests, request_time, retrieve_time))
+
+    def release(self, p, i, requests, request_time, retrieve_time):
+        self.release_machines(p, i, [machine for request in requests for machine in request.value], request_time,
+                              retrieve_time)
+
+    def release_machines(self, p, i, machines, request_time, retrieve_time):
+        end_time = self.env.now
+        self.factory.put(machines)
+        for r in machines:
+            if self.printing:
+                print(f'Product {p} released resources: {r.resource_group} at time: {end_time}')
+            self.resource_usage.append({"Activity": i,
+                                        "Product": p,
+                                        "Resource": r.resource_group,
+                                        "Check_resource_type": r.resource_group,
+                                        "Machine_id": r.id,
+                                        "Request moment": request_time,
+                                        "Retrieve moment": retrieve_time,
+                                        "Start": retrieve_time,
+                                        "Finish": end_time})
+        self.activity_completed()
+
+    def activity_completed(self):
+        """Count the completed activities, the run ends when all activities are completed or SIM_TIME is passed"""
+        self.nr_completed += 1
+        if (self.nr_completed == self.nr_activities or self.env.now >= self.horizon) and not self.completed.triggered:
+            self.completed.succeed()
+
+    def infeasible(self, reason):
+        """End the run with an infeasible result"""
+        self.feasible = False
+        self.infeasibility = reason
+        self.resource_usage = pd.DataFrame(self.resource_usage)
+        if self.printing:
+            print(f'WARNING: infeasible plan, {reason}')
+        return float("inf"), float("inf")
+
+    def product_generator(self):
+        """Release a product every 3 time units, in the order of the production sequence"""
+        if self.printing:
+            print(f"The products are processed according to the production sequence {self.plan.SEQUENCE}.")
+        for position, p in enumerate(self.plan.SEQUENCE):
+            self.env.process(self.product(p, position))
+            yield self.env.timeout(3)
+
+    def machine_store(self):
+        if self.dispatching != "fifo":
+            return PriorityMachineStore(self.env, self.RESOURCE_NAMES, self.CAPACITY)
+        return MachineStore(self.env, self.RESOURCE_NAMES, self.CAPACITY)
+
+    def activities_to_complete(self):
+        return sum(len(self.plan.PRODUCTS[p].ACTIVITIES) for p in self.plan.SEQUENCE)
+
+    def objectives(self):
+        """Makespan and total tardiness of the products in the sequence"""
+        makespan = self.resource_usage["Finish"].max()
+        finish = self.resource_usage.groupby("Product")["Finish"].max()
+        deadlines = pd.Series({p: self.plan.PRODUCTS[p].DEADLINE for p in self.plan.SEQUENCE})
+        tardiness = (finish[deadlines.index] - deadlines).clip(lower=0).sum()
+        return makespan, tardiness
+
+    def simulate(self, SIM_TIME, RANDOM_SEED, write=False, output_location="Results.csv"):
+        self.plan.SEQUENCE = [int(i) for i in self.plan.SEQUENCE]
+        if self.printing:
+            print(f'START Factory simulation for seed {RANDOM_SEED}')
+        if not self.deterministic:
+            random.seed(RANDOM_SEED)
+        self.env = simpy.Environment()
+        self.resource_usage = []
+        self.feasible = True
+        self.infeasibility = None
+        self.summary = None
+
+        # Activities that need more machines than the factory has can never start
+        problems = self.plan.check_feasibility()
+        if problems:
+            return self.infeasible(problems[0])
+
+        self.factory = self.machine_store()
+        self.nr_activities = self.activities_to_complete()
+        self.nr_completed = 0
+        self.horizon = SIM_TIME
+        self.completed = self.env.event()
+        self.env.process(self.product_generator())
+
+        # Execute! Without events left before all activities are completed, the simulation is stalled
+        try:
+            self.env.run(until=self.completed)
+        except RuntimeError:
+            if self.env.peek() != simpy.core.Infinity:
+                raise
+            return self.infeasible(f'stalled at time {self.env.now}, {self.nr_activities - self.nr_completed} '
+                                   f'activities can not obtain their resources')
+        if self.nr_completed < self.nr_activities:
+            return self.infeasible(f'not all activities are completed before SIM_TIME={SIM_TIME}')
+
+        # Process results
+        self.resource_usage = pd.DataFrame(self.resource_usage)
+        makespan, tardiness = self.objectives()
+
+        if self.summarise:
+            self.summary = critical_path(self.resource_usage, self.plan)
+
+        if self.printing:
+            print(f"The makespan corresponding to this schedule is {makespan}")
+            print(f"The lateness corresponding to this schedule is {tardiness}")
+        if write:
+            for problem in validate_schedule(self.resource_usage, self.plan, simulator="simulator_3"):
+                print(f'WARNING: invalid schedule in {output_location}, {problem}')
+            self.resource_usage.to_csv(output_location)
+
+        return makespan, tardiness
@@ -0,0 +1,130 @@
+"""
+Validation of a schedule, the resource_usage trace of a Simulator (or the csv it writes), against its plan and
+factory. All checks are numpy passes over the rows of the trace: sorting and a sweep line, without filtering per
+product or per machine.
+"""
+import numpy as np
+import pandas as pd
+from classes.compiled import CompiledPlan
+
+# How the simulators apply the temporal relation (0, i) with delay d:
+#   simulator_1: activity i starts exactly d after activity 0 starts
+#   simulator_2: activity i requests its machines exactly d after activity 0 requests its machines
+#   simulator_3: activity i obtains its machines at least d after activity 0 obtained its machines
+TEMPORAL_RULES = {"simulator_1": "start", "simulator_2": "request", "simulator_3": "retrieve",
+                  "simulator_3_lean": "retrieve"}
+
+
+def _violations(name, bad, describe, max_examples):
+    """Describe the first max_examples of the rows in the boolean mask bad"""
+    rows = np.flatnonzero(bad)
+    if len(rows) == 0:
+        return []
+    examples = "; ".join(describe(k) for k in rows[:max_examples])
+    return [f'{len(rows)} {name} violations, e.g. {examples}']
+
+
+def validate_schedule(trace, plan, factory=None, simulator="simulator_3", max_examples=3):
+    """
+    Check a schedule on:
+        - machines: every machine exists and claims at most one activity at a time ([Retrieve moment, Finish))
+        - capacity: per resource group at most CAPACITY machines are claimed at any time
+        - needs: every activity of every product claims exactly the machines in its NEEDS
+        - processing times: Finish - Start is within the PROCESSING_TIME bounds of the activity
+        - temporal relations: the offsets (0, i), as interpreted by the simulator (see TEMPORAL_RULES)
+    :param plan: Class ProductionPlan, CompactPlan or CompiledPlan; for many traces of one plan, pass a CompiledPlan
+    :param factory: Factory with the resource groups and capacities, by default the factory of the plan
+    :return: list of violations, empty if the schedule is valid
+    """
+    compiled = plan if isinstance(plan, CompiledPlan) else getattr(plan, "compiled", None)
+    if compiled is None:
+        compiled = CompiledPlan.from_plan(plan)
+    if factory is not None:
+        resource_names, capacity = list(factory.RESOURCE_NAMES), np.asarray(factory.CAPACITY)
+    else:
+        resource_names, capacity = compiled.metadata["resource_names"], compiled.capacity
+
+    product = np.asarray(trace["Product"], dtype=np.int64)
+    activity = np.asarray(trace["Activity"], dtype=np.int64)
+    machine = np.asarray(trace["Machine_id"], dtype=np.int64)
+    request = np.asarray(trace["Request moment"], dtype=float)
+    retrieve = np.asarray(trace["Retrieve moment"], dtype=float)
+    start = np.asarray(trace["Start"], dtype=float)
+    finish = np.asarray(trace["Finish"], dtype=float)
+    resource = np.asarray(trace["Resource"])
+    group = pd.Index(resource_names).get_indexer(resource)
+    problems = []
+
+    def where(k):
+        return f'product {product[k]} activity {activity[k]} on {resource[k]} id {machine[k]}'
+
+    # Machines: existence and no overlap of the claims of one machine
+    unknown = (group < 0) | (machine < 0) | (machine >= capacity[np.maximum(group, 0)])
+    problems += _violations("unknown machine", unknown, where, max_examples)
+    key = np.maximum(group, 0) * (machine.max(initial=0) + 1) + machine
+    order = np.lexsort((finish, retrieve, key))
+    overlap = np.zeros(len(order), dtype=bool)
+    overlap[order[1:]] = (key[order[1:]] == key[order[:-1]]) & (retrieve[order[1:]] < finish[order[:-1]])
+    problems += _violations("machine overlap", overlap, where, max_examples)
+
+    # Capacity: sweep line per resource group, releases before claims at the same time
+    known = np.flatnonzero(group >= 0)
+    events_group = np.concatenate([group[known], group[known]])
+    events_time = np.concatenate([retrieve[known], finish[known]])
+    delta = np.concatenate([np.ones(len(known)), -np.ones(len(known))])
+    events = np.lexsort((delta, events_time, events_group))
+    level = np.cumsum(delta[events])
+    over = level > capacity[events_group[events]]
+    for g in np.unique(events_group[events][over])[:max_examples]:
+        at = events_time[events][over & (events_group[events] == g)][0]
+        problems.append(f'capacity violation of {resource_names[g]}: '
+                        f'{int(level[over & (events_group[events] == g)].max())} machines claimed at time {at}, '
+                        f'the capacity is {capacity[g]}')
+
+    # Activity index of every row in the activity arrays
+    product_type = compiled.product_type
+    valid = (product >= 0) & (product < len(product_type))
+    first = compiled.type_activity_ptr[product_type[np.where(valid, product, 0)]]
+    last = compiled.type_activity_ptr[product_type[np.where(valid, product, 0)] + 1]
+    valid &= (activity >= 0) & (activity < last - first)
+    problems += _violations("unknown activity", ~valid, where, max_examples)
+    a = np.where(valid, first + activity, 0)
+
+    # Needs: number of claimed machines per product, activity and resource group
+    nr_activities = len(compiled.activity_id)
+    dense = np.zeros((nr_activities, len(resource_names)), dtype=np.int64)
+    dense[np.repeat(np.arange(nr_activities), np.diff(compiled.need_ptr)), compiled.need_group] = \
+        compiled.need_count
+    row_key = (product * nr_activities + a) * len(resource_names) + np.maximum(group, 0)
+    _, inverse, counts = np.unique(row_key, return_inverse=True, return_counts=True)
+    wrong_count = valid & (group >= 0) & (counts[inverse] != dense[a, np.maximum(group, 0)])
+    problems += _violations("needs", wrong_count, where, max_examples)
+    cumulative = np.concatenate([[0], np.cumsum(dense.sum(axis=1))])
+    per_type = cumulative[compiled.type_activity_ptr[1:]] - cumulative[compiled.type_activity_ptr[:-1]]
+    expected_rows = per_type[product_type].sum()
+    if len(product) != expected_rows:
+        problems.append(f'the trace has {len(product)} claims, the plan needs {expected_rows}')
+
+    # Processing times
+    duration = finish - start
+    wrong_duration = valid & ((duration < compiled.activity_min[a]) | (duration > compiled.activity_max[a]))
+    problems += _violations("processing time", wrong_duration, where, max_examples)
+
+    # Temporal relations, relative to the rows of activity 0 of the same product
+    rule = TEMPORAL_RULES[simulator]
+    moment = {"start": start, "request": request, "retrieve": retrieve}[rule]
+    reference = np.full(len(product_type), np.nan)
+    is_first = valid & (activity == 0)
+    reference[product[is_first]] = moment[is_first]
+    offset = moment - reference[np.where(valid, product, 0)]
+    delay = compiled.activity_offset[a]
+    if rule == "retrieve":
+        wrong_offset = valid & (offset < delay)
+    else:
+        wrong_offset = valid & (offset != delay)
+    if rule == "request":
+        wrong_offset |= retrieve < request
+    if rule != "start":
+        wrong_offset |= start != retrieve
+    problems += _violations(f"temporal relation ({rule})", wrong_offset, where, max_examples)
+    return problems
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import pickle
+import random
+import time
+import numpy as np
+
+
+class AskTell:
+    """
+    Ask/tell interface of a search method. The method is written as a generator steps(), that yields a list of
+    candidate sequences and receives the list of their fitnesses. ask() returns the candidates the search waits for,
+    tell() gives their fitnesses and advances the search to its next candidates. The search is finished when ask()
+    returns no candidates. Many searches can so be driven by one loop, that evaluates the candidates of all of them
+    in one batch, in parallel or asynchronously.
+    The methods read the time with clock() instead of time.time(), so that a run can be checkpointed and resumed,
+    see checkpoint().
+    """
+    def __init__(self):
+        self.nr_evaluations = 0
+        self.stopped = False
+        self._steps = None
+        self._candidates = []
+        self._checkpoint = None
+
+    def steps(self):
+        raise NotImplementedError
+
+    def ask(self):
+        if self._steps is None and not self.stopped:
+            if self._checkpoint is not None:
+                self._start_checkpointing()
+            self._steps = self.steps()
+            self._advance(None)
+        # Candidates of which the fitnesses are in the log of the checkpoint are not evaluated again
+        while self._checkpoint is not None and self._checkpoint["replay"] is not None and self._candidates:
+            self._replay()
+        return list(self._candidates)
+
+    def tell(self, fitnesses):
+        fitnesses = list(fitnesses)
+        if len(fitnesses) != len(self._candidates):
+            raise ValueError(f'{len(fitnesses)} fitnesses for {len(self._candidates)} candidates')
+        self.nr_evaluations += len(fitnesses)
+        checkpoint = self._checkpoint
+        live = checkpoint is not None and checkpoint["replay"] is None
+        if checkpoint is not None:
+            # Digest of the evaluated candidates, a resumed run must propose the same ones
+            checkpoint["digest"].update(np.asarray(self._candidates, dtype=np.int64).tobytes())
+        if live:
+            checkpoint["fitness_log"].extend(fitnesses)
+        self._advance(fitnesses)
+        if live and not self.stopped and time.time() - checkpoint["saved"] >= checkpoint["every"]:
+            self.save_checkpoint()
+
+    def _advance(self, fitnesses):
+        try:
+            self._candidates = self._steps.send(fitnesses)
+        except StopIteration:
+            self.stopped = True
+            self._candidates = []
+            if self._checkpoint is not None and self._checkpoint["replay"] is None:
+                self.remove_checkpoint()
+
+    def clock(self):
+        """Time in seconds, replayed from the log of the checkpoint while a run is resumed"""
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            return time.time()
+        replay = checkpoint["replay"]
+        if replay is not None and replay["clock_cursor"] < len(replay["clock"]):
+            replay["clock_cursor"] += 1
+            return float(replay["clock"][replay["clock_cursor"] - 1])
+        value = time.time() - checkpoint["offset"]
+        checkpoint["clock_log"].append(value)
+        return value
+
+    def stop(self):
+        """End the search, the best sequence so far is kept"""
+        if self._steps is not None:
+            self._steps.close()
+        self.stopped = True
+        self._candidates = []
+
+    def run(self, f_eval):
+        """Evaluate the candidates one by one with f_eval(x, i), i counts the evaluations from 1"""
+        while True:
+            candidates = self.ask()
+            if not candidates:
+                return self
+            self.tell([f_eval(x, self.nr_evaluations + k + 1) for k, x in enumerate(candidates)])
+
+    def run_batch(self, f_eval_batch):
+        """Evaluate all candidates of an ask() with one call f_eval_batch(list of sequences), e.g. on a process pool"""
+        while True:
+            candidates = self.ask()
+            if not candidates:
+                return self
+            self.tell(f_eval_batch(candidates))
+
+    def checkpoint(self, file_name, every=60, resume=False):
+        """
+        Write a checkpoint of the run every `every` seconds; call before the first ask(). The told fitnesses and the
+        readings of clock() are appended to the logs <file_name>.fitness and <file_name>.clock. The checkpoint
+        itself holds the evaluation count, the random and np.random states, the best sequence and fitness, the
+        number of rows of the history, the lengths of the logs and a digest of the evaluated candidates. It is
+        written to a temporary file that is renamed, so a killed run always leaves a complete checkpoint. A resumed
+        run replays the search on the logged fitnesses without evaluating them again, and continues with the random
+        states of the checkpoint, so it gives the same result as an uninterrupted run. The files are removed when the
+        search finishes.
+        :param resume: continue from the checkpoint in file_name, if it exists
+        """
+        self._checkpoint = {"file_name": file_name, "every": every, "saved": time.time(), "offset": 0.0,
+                            "fitness_log": [], "clock_log": [], "nr_clock": 0, "replay": None, "state": None,
+                            "digest": hashlib.sha1()}
+        if resume and os.path.exists(file_name):
+            with open(file_name, "rb") as file:
+                state = pickle.load(file)
+            logs = {}
+            for name, length in [("fitness", state["nr_evaluations"]), ("clock", state["nr_clock"])]:
+                # Entries written after the checkpoint are dropped, they are computed again
+                with open(f'{file_name}.{name}', "r+b") as file:
+                    file.truncate(8 * length)
+                logs[name] = np.fromfile(f'{file_name}.{name}', dtype=np.float64)
+            self._checkpoint.update({"state": state, "nr_clock": state["nr_clock"],
+                                     "replay": {"fitness": logs["fitness"], "clock": logs["clock"],
+                                                "clock_cursor": 0}})
+        return self
+
+    def _start_checkpointing(self):
+        checkpoint = self._checkpoint
+        if checkpoint["state"] is not None:
+            random.setstate(checkpoint["state"]["random_start"])
+            np.random.set_state(checkpoint["state"]["numpy_start"])
+            checkpoint["random_start"] = checkpoint["state"]["random_start"]
+            checkpoint["numpy_start"] = checkpoint["state"]["numpy_start"]
+        else:
+            checkpoint["random_start"] = random.getstate()
+            checkpoint["numpy_start"] = np.random.get_state()
+            directory = os.path.dirname(checkpoint["file_name"])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            for name in ["fitness", "clock"]:
+                open(f'{checkpoint["file_name"]}.{name}', "wb").close()
+
+    def _replay(self):
+        checkpoint = self._checkpoint
+        replay = checkpoint["replay"]
+        fitnesses = replay["fitness"][self.nr_evaluations:self.nr_evaluations + len(self._candidates)]
+        if len(fitnesses) < len(self._candidates):
+            raise RuntimeError(f'The search does not resume the run of the checkpoint {checkpoint["file_name"]}, '
+                               f'the method or its parameters have changed')
+        self.tell(fitnesses.tolist())
+        if self.nr_evaluations == len(replay["fitness"]):
+            self._end_replay()
+
+    def _end_replay(self):
+        checkpoint = self._checkpoint
+        state = checkpoint["state"]
+        if checkpoint["digest"].hexdigest() != state["digest"] or len(getattr(self, "fitnesses", [])) != \
+                state["history"] or self.best_fitness != state["best_fitness"]:
+            raise RuntimeError(f'The search does not resume the run of the checkpoint {checkpoint["file_name"]}, '
+                               f'the method or its parameters have changed')
+        random.setstate(state["random"])
+        np.random.set_state(state["numpy"])
+        # The clock continues from the time of the checkpoint
+        clock = checkpoint["replay"]["clock"]
+        checkpoint["offset"] = time.time() - clock[-1] if len(clock) else 0.0
+        checkpoint["replay"] = None
+        checkpoint["saved"] = time.time()
+
+    def save_checkpoint(self):
+        checkpoint = self._checkpoint
+        file_name = checkpoint["file_name"]
+        for name in ["fitness", "clock"]:
+            with open(f'{file_name}.{name}', "ab") as file:
+                file.write(np.asarray(checkpoint[f'{name}_log'], dtype=np.float64).tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+        checkpoint["nr_clock"] += len(checkpoint["clock_log"])
+        checkpoint["fitness_log"], checkpoint["clock_log"] = [], []
+        state = {"nr_evaluations": self.nr_evaluations, "nr_clock": checkpoint["nr_clock"],
+                 "random_start": checkpoint["random_start"], "numpy_start": checkpoint["numpy_start"],
+                 "random": random.getstate(), "numpy": np.random.get_state(),
+                 "best_sequence": None if self.best_sequence is None else [int(i) for i in self.best_sequence],
+                 "best_fitness": self.best_fitness, "history": len(getattr(self, "fitnesses", [])),
+                 "digest": checkpoint["digest"].hexdigest()}
+        with open(f'{file_name}.tmp', "wb") as file:
+            pickle.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f'{file_name}.tmp', file_name)
+        checkpoint["saved"] = time.time()
+
+    def remove_checkpoint(self):
+        file_name = self._checkpoint["file_name"]
+        for path in [file_name, f'{file_name}.fitness', f'{file_name}.clock', f'{file_name}.tmp']:
+            if os.path.exists(path):
+                os.remove(path)
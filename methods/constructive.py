@@ -0,0 +1,109 @@
+"""
+Constructive heuristics, that build an initial sequence from the data of the production plan only, without
+simulating it. They are selected with Settings.init:
+    "edd"                earliest deadline first
+    "slack"              least slack first, the slack is the deadline minus the minimal flow time of the product
+                         (the fermentation and the activities after it)
+    "fermenter_balance"  earliest deadline group first; within a group the next product is the one of which the
+                         fermenter is free first, given the fermentations sequenced before it
+    "constructive"       the best of the heuristics above, each checked with one simulation
+"random" (no initial sequence) and "sorted" (the identity) are kept as before.
+"""
+
+
+def _per_product(plan, f):
+    """f(product type) for every product in the plan, computed once per product type"""
+    values = {}
+    for product_id in plan.PRODUCT_IDS:
+        if int(product_id) not in values:
+            values[int(product_id)] = f(plan.FACTORY.PRODUCTS[int(product_id)])
+    return [values[int(product_id)] for product_id in plan.PRODUCT_IDS]
+
+
+def earliest_deadline_first(plan):
+    deadlines = [int(deadline) for deadline in plan.DEADLINES]
+    return sorted(range(0, len(deadlines)), key=lambda i: deadlines[i])
+
+
+def least_slack(plan):
+    flow_times = _per_product(plan, lambda product: product.min_flow_time())
+    slack = [int(deadline) - flow_time for deadline, flow_time in zip(plan.DEADLINES, flow_times)]
+    return sorted(range(0, len(slack)), key=lambda i: slack[i])
+
+
+def fermenter_balance(plan):
+    capacity = plan.FACTORY.CAPACITY
+    # Fermentation (activity 0) of every product: the machines it needs and its duration per unit of capacity
+    fermentations = _per_product(plan, lambda product: tuple(
+        (r, need * product.ACTIVITIES[0].PROCESSING_TIME[0] / capacity[r])
+        for r, need in enumerate(product.ACTIVITIES[0].NEEDS) if need > 0))
+    deadlines = [int(deadline) for deadline in plan.DEADLINES]
+
+    # Load of every resource per unit of capacity, by the fermentations sequenced so far
+    load = [0.0] * len(capacity)
+    sequence = []
+    order = earliest_deadline_first(plan)
+    start = 0
+    while start < len(order):
+        end = start
+        while end < len(order) and deadlines[order[end]] == deadlines[order[start]]:
+            end += 1
+        # Products of a deadline group with the same fermentation are taken in order of their index
+        queues = {}
+        for i in order[start:end]:
+            queues.setdefault(fermentations[i], []).append(i)
+        for queue in queues.values():
+            queue.reverse()
+        while queues:
+            fermentation = min(queues, key=lambda f: max((load[r] for r, _ in f), default=0))
+            i = queues[fermentation].pop()
+            if not queues[fermentation]:
+                del queues[fermentation]
+            for r, duration in fermentation:
+                load[r] += duration
+            sequence.append(i)
+        start = end
+    return sequence
+
+
+RULES = {"edd": earliest_deadline_first,
+         "slack": least_slack,
+         "fermenter_balance": fermenter_balance}
+
+
+def best_constructive(plan, f_eval, rules=None):
+    """
+    Simulate the sequence of every heuristic once
+    :param f_eval: f_eval(x, i) returns the fitness of sequence x
+    :return: best sequence and a dictionary with the fitness of every heuristic
+    """
+    fitnesses = {}
+    best_sequence, best_fitness = None, float("inf")
+    for name in rules or RULES:
+        sequence = RULES[name](plan)
+        fitnesses[name] = f_eval(sequence, 0)
+        if best_sequence is None or fitnesses[name] < best_fitness:
+            best_sequence, best_fitness = sequence, fitnesses[name]
+    return best_sequence, fitnesses
+
+
+def initial_sequence(setting, plan, f_eval=None):
+    """
+    Initial sequence of Settings.init for a search method
+    :param f_eval: fitness function, only used for init="constructive"; these simulations are not part of the
+    budget of the search
+    :return: list of product indices, or None for a random initial sequence
+    """
+    if setting.init == "random":
+        return None
+    elif setting.init == "sorted":
+        return [i for i in range(0, setting.size)]
+    elif setting.init in RULES:
+        return RULES[setting.init](plan)
+    elif setting.init == "constructive":
+        if f_eval is None:
+            raise ValueError('init="constructive" needs a fitness function')
+        sequence, fitnesses = best_constructive(plan, f_eval)
+        print(f'Fitness of the constructive heuristics {fitnesses}')
+        return sequence
+    raise ValueError(f'Unknown init {setting.init}, use "random", "sorted", "constructive" or one of {list(RULES)}')
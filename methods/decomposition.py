@@ -0,0 +1,84 @@
+"""
+Decomposition of a production plan by deadline month. The products of every month are optimised in a subproblem of
+their own, all months in parallel worker processes. The subproblem of a month starts from the state of the factory
+at the release of its first product, reached by the products of the earlier months in their initial order: they are
+frozen as in classes.rescheduling, and only the products of the month are simulated from that state. The months are
+so independent of each other. The optimised months are combined with general.combine_sequences, and the combined
+sequence can be polished with a local search over all products.
+"""
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from classes.compiled import CompiledPlan
+from classes.general import combine_sequences, evaluator_simpy
+from classes.rescheduling import Rescheduler
+from methods.local_search import local_search
+
+_compiled = None
+
+
+def months(plan):
+    """
+    Products per deadline month, in the order of the deadlines
+    :return: list with the product indices of every month, each a range of consecutive products
+    """
+    deadlines = np.asarray(plan.DEADLINES)
+    if np.any(np.diff(deadlines) < 0):
+        raise ValueError("The products of the plan are not ordered by deadline, as the instance generator makes them")
+    _, first = np.unique(deadlines, return_index=True)
+    bounds = list(first) + [len(deadlines)]
+    return [list(range(bounds[k], bounds[k + 1])) for k in range(0, len(first))]
+
+
+def _initialise(compiled):
+    global _compiled
+    _compiled = compiled
+
+
+def _solve_month(task):
+    month, boundary, products, method, budget, seed, l1, l2, sim_time, claim, dispatching = task
+    random.seed(seed)
+    np.random.seed(seed)
+    rescheduler = Rescheduler(_compiled, boundary + products, freeze_time=3 * len(boundary), l1=l1, l2=l2,
+                              seed=seed, sim_time=sim_time, claim=claim, dispatching=dispatching)
+    _, fitness = rescheduler.reschedule(method=method, stop_criterium="Budget", budget=budget)
+    return month, rescheduler.tail, fitness
+
+
+def month_decomposition(plan, setting, budget_per_month, polish_budget=0, init=None, method="local_search",
+                        processes=None, sim_time=10000000):
+    """
+    Optimise every deadline month in parallel, combine the months and polish the result
+    :param plan: Class ProductionPlan
+    :param setting: Settings with the seed, the weights l1 and l2 and the simulator of the polishing pass
+    :param budget_per_month: number of evaluations of every month subproblem
+    :param polish_budget: number of evaluations of the local search over all products, no polishing if 0
+    :param init: sequence that gives the initial order of the products within every month, by default the identity
+    :param method: search method of the subproblems, "local_search" or "iterated_greedy"
+    :param processes: number of worker processes, by default the number of cores
+    :return: production sequence and the fitness of every month subproblem
+    """
+    groups = months(plan)
+    order = list(init) if init is not None else list(range(0, len(plan.DEADLINES)))
+    month_of = {p: k for k, products in enumerate(groups) for p in products}
+    initial = [[int(p) for p in order if month_of[p] == k] for k in range(0, len(groups))]
+
+    tasks = [(k, [p for products in initial[:k] for p in products], initial[k], method, budget_per_month,
+              setting.seed, setting.l1, setting.l2, sim_time, setting.claim, setting.dispatching)
+             for k in range(0, len(groups))]
+    compiled = CompiledPlan.from_plan(plan)
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), initializer=_initialise,
+                             initargs=(compiled,)) as pool:
+        results = list(pool.map(_solve_month, tasks))
+
+    # The best sequence of every month, in the indices of the month
+    best_sequences = {k: np.asarray(tail) - groups[k][0] for k, tail, _ in results}
+    sequence = combine_sequences(best_sequences)
+    month_fitnesses = {k: fitness for k, _, fitness in results}
+
+    if polish_budget > 0:
+        f_eval = lambda x, i: evaluator_simpy(plan=plan, setting=setting, sequence=x, sim_time=sim_time)
+        _, sequence = local_search(n=len(sequence), f_eval=f_eval, stop_criterium="Budget", budget=polish_budget,
+                                   printing=False, write=False, init=sequence)
+    return [int(p) for p in sequence], month_fitnesses
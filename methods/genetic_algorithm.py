@@ -0,0 +1,129 @@
+import numpy as np
+import copy
+import pandas as pd
+import time
+
+
+def order_crossover(parent1, parent2):
+    """
+    Order crossover (OX1): copy a random slice of parent1, fill the remaining positions with the missing items
+    in the order in which they appear in parent2
+    """
+    n = len(parent1)
+    i1, i2 = np.sort(np.random.choice(n + 1, 2, replace=False))
+    child = np.full(n, -1)
+    child[i1:i2] = parent1[i1:i2]
+    in_slice = np.zeros(n, dtype=bool)
+    in_slice[parent1[i1:i2]] = True
+    rest = [item for item in np.roll(parent2, -i2) if not in_slice[item]]
+    positions = np.roll(np.arange(n), -i2)[:n - (i2 - i1)]
+    child[positions] = rest
+    return child
+
+
+def swap_mutation(sequence, probability):
+    seq = copy.copy(sequence)
+    if np.random.random() < probability:
+        i1, i2 = np.random.randint(0, len(seq), 2)
+        seq[i1], seq[i2] = seq[i2], seq[i1]
+    return seq
+
+
+def tournament(population, fitnesses, k=2):
+    competitors = np.random.randint(0, len(population), k)
+    winner = competitors[np.argmin([fitnesses[i] for i in competitors])]
+    return population[winner]
+
+
+def genetic_algorithm(n, f_eval, f_eval_batch=None, population_size=20, elite=2, mutation_probability=0.5,
+                      time_limit=200, stop_criterium="Time", budget=400, output_file="results_genetic_algorithm.txt",
+                      printing=True, write=True, init=None):
+    """
+    Permutation genetic algorithm with tournament selection, order crossover, swap mutation and elitism.
+    Every generation is evaluated with one call to f_eval_batch, which can evaluate the sequences in parallel.
+    :param f_eval: f_eval(x, i) returns the fitness of sequence x, used if f_eval_batch is None
+    :param f_eval_batch: f_eval_batch(list of sequences) returns the list of their fitnesses
+    :param elite: number of best sequences that are kept in the next generation, less than population_size
+    """
+    if elite >= population_size:
+        raise ValueError(f'elite={elite} leaves no place for offspring in a population of {population_size}')
+    if f_eval_batch is None:
+        f_eval_batch = lambda sequences: [f_eval(x, i) for i, x in enumerate(sequences)]
+
+    count_eval = 0
+    sequences = []
+    fitnesses = []
+    best_sequences = []
+    best_fitnesses = []
+    runtime = []
+    count_evaluations = []
+
+    # Start algorithm
+    population = [np.random.permutation(np.arange(n)) for _ in range(0, population_size)]
+    if init is not None:
+        population[0] = np.array(copy.copy(init))
+
+    start = time.time()
+    best_sequence = None
+    best_fitness = None
+    stop = False
+    generation = 0
+    population_fitness = []
+    while not stop:
+        if generation > 0:
+            # Keep the elite, fill the rest of the generation with offspring
+            order = np.argsort(population_fitness)
+            offspring = [population[i] for i in order[:elite]]
+            while len(offspring) < population_size:
+                parent1 = tournament(population, population_fitness)
+                parent2 = tournament(population, population_fitness)
+                child = order_crossover(parent1, parent2)
+                offspring.append(swap_mutation(child, mutation_probability))
+            candidates = offspring[elite:]
+            elite_fitness = [population_fitness[i] for i in order[:elite]]
+        else:
+            offspring = population
+            candidates = population
+            elite_fitness = []
+
+        if stop_criterium != "Time":
+            candidates = candidates[:max(0, int(budget) - count_eval + 1)]
+        candidate_fitness = list(f_eval_batch(candidates))
+        population = offspring[:len(elite_fitness) + len(candidates)]
+        population_fitness = elite_fitness + candidate_fitness
+
+        for x, fitness in zip(candidates, candidate_fitness):
+            count_eval += 1
+            if best_fitness is None or fitness < best_fitness:
+                best_sequence = copy.copy(x)
+                best_fitness = fitness
+            sequences.append(list(x))
+            fitnesses.append(fitness)
+            best_sequences.append(list(best_sequence))
+            best_fitnesses.append(best_fitness)
+            runtime.append(time.time() - start)
+            count_evaluations.append(count_eval)
+
+        generation += 1
+        if printing:
+            print(f"Generation {generation}: best fitness so far is {best_fitness}, {count_eval} evaluations")
+
+        if stop_criterium == "Time":
+            if time.time() - start >= time_limit:
+                print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
+                stop = True
+        elif count_eval > budget:
+            print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
+            stop = True
+
+    results = pd.DataFrame()
+    results['Sequence'] = sequences
+    results['Fitness'] = fitnesses
+    results['Best_sequence'] = best_sequences
+    results['Best_fitness'] = best_fitnesses
+    results['Time'] = runtime
+    results["Number of evaluations"] = count_evaluations
+    if write:
+        results.to_csv(output_file, header=True, index=False)
+
+    return count_eval, best_sequence
@@ -1,26 +1,34 @@
 import copy
+import math
 import random
 import numpy as np
-import time
 import pandas as pd
+from methods.ask_tell import AskTell
 
 
-def best_insert(x, item, count_eval, f_eval):
+def first_best(candidates, fitnesses):
+    """First candidate with the lowest fitness"""
+    best = 0
+    for k in range(1, len(candidates)):
+        if fitnesses[k] < fitnesses[best]:
+            best = k
+    return copy.copy(candidates[best]), copy.copy(fitnesses[best])
+
+
+def best_insert_steps(x, item, count_eval):
+    """Insert item at its best position in x, all positions are evaluated as one batch"""
     print("Start best insert")
-    best_insert_x = np.insert(x, 0, item)
-    best_insert_fitness = f_eval(best_insert_x, count_eval)
-    count_eval += 1
-    for k in range(1, len(x) - 1):
-        test_x = np.insert(x, k, item)
-        test_fitness = f_eval(test_x, count_eval)
-        count_eval += 1
-        if test_fitness < best_insert_fitness:
-            best_insert_fitness = test_fitness
-            best_insert_x = test_x
-    return best_insert_x, best_insert_fitness, count_eval
+    candidates = [np.insert(x, k, item) for k in [0] + list(range(1, len(x) - 1))]
+    fitnesses = yield candidates
+    best_insert_x, best_insert_fitness = first_best(candidates, fitnesses)
+    return best_insert_x, best_insert_fitness, count_eval + len(candidates)
 
 
-def IterativeImprovementInsertion(x, fitness_x, count_eval, f_eval, budget=1000):
+def iterative_improvement_insertion_steps(x, fitness_x, count_eval, budget=1000):
+    """
+    Move every item to its best position, until no move improves. The positions of an item are evaluated as one
+    batch, that ends when the budget is reached.
+    """
     print("Start iterated improvement")
     n = len(x)
     improve = True
@@ -33,20 +41,17 @@ def IterativeImprovementInsertion(x, fitness_x, count_eval, f_eval, budget=1000)
         for i in indices:
             item = x[i]
             y = np.delete(x, i)
-            best_insert_x = np.insert(y, 0, item)
-            best_insert_fitness = f_eval(best_insert_x, count_eval)
-            count_eval += 1
-            for k in range(1, n-2):
-                test_x = np.insert(y, k, item)
-                test_fitness = f_eval(test_x, count_eval)
-                count_eval += 1
-                if test_fitness < best_insert_fitness:
-                    best_insert_fitness = copy.copy(test_fitness)
-                    best_insert_x = copy.copy(test_x)
-
-                if count_eval >= budget:
+            # Positions after the first position are evaluated until the budget is reached
+            positions = list(range(1, n-2))
+            if positions:
+                last = max(1, math.ceil(budget - count_eval - 1))
+                if last <= positions[-1]:
+                    positions = positions[:last]
                     stop_loop = True
-                    break
+            candidates = [np.insert(y, k, item) for k in [0] + positions]
+            fitnesses = yield candidates
+            count_eval += len(candidates)
+            best_insert_x, best_insert_fitness = first_best(candidates, fitnesses)
 
             if best_insert_fitness < fitness_x:
                 fitness_x = copy.copy(best_insert_fitness)
@@ -59,130 +64,198 @@ def IterativeImprovementInsertion(x, fitness_x, count_eval, f_eval, budget=1000)
     return x, fitness_x, count_eval
 
 
-def iterated_greedy(n, f_eval, d=7, seed=1, time_limit=200, output_file="results_random_search.txt", printing=True,
-                     write=True, stop_criterium="Time", budget=400, init=None):
-    random.seed(seed)
-    np.random.seed(seed)
-    count_eval = 1
-    sequences = []
-    fitnesses = []
-    best_sequences = []
-    best_fitnesses = []
-    runtime = []
-    count_evaluations = []
-
-    # Start algorithm
-    if init is None:
-        x = np.random.permutation(np.arange(n))
-    else:
-        x = copy.copy(init)
-    fitness_x = f_eval(x, count_eval)
-    count_eval += 1
-
-    # Save results
-    start = time.time()
-    x_best = copy.copy(x)
-    fitness_best = copy.copy(fitness_x)
-    print(f'First sequence is {x} with fitness {fitness_x}')
-    sequences.append(x)
-    runtime.append(time.time() - start)
-    fitnesses.append(fitness_x)
-    best_sequences.append(x_best)
-    best_fitnesses.append(fitness_best)
-    count_evaluations.append(count_eval)
-    stop = False
-
-    # First iterative improvement
-    x, fitness_x, count_eval = IterativeImprovementInsertion(x, fitness_x, count_eval, f_eval, budget=budget)
-
-    # Save results
-    if fitness_x < fitness_best:
+def run_steps(steps, count_eval, f_eval):
+    """Run a generator of batches, with f_eval(x, i) per candidate"""
+    try:
+        fitnesses = None
+        while True:
+            candidates = steps.send(fitnesses)
+            fitnesses = []
+            for x in candidates:
+                fitnesses.append(f_eval(x, count_eval))
+                count_eval += 1
+    except StopIteration as stop:
+        return stop.value
+
+
+def best_insert(x, item, count_eval, f_eval):
+    return run_steps(best_insert_steps(x, item, count_eval), count_eval, f_eval)
+
+
+def IterativeImprovementInsertion(x, fitness_x, count_eval, f_eval, budget=1000):
+    return run_steps(iterative_improvement_insertion_steps(x, fitness_x, count_eval, budget=budget), count_eval,
+                     f_eval)
+
+
+class IteratedGreedy(AskTell):
+    """
+    Iterated greedy with an ask/tell interface. Every ask() returns the insert positions of one item, that can be
+    evaluated as a batch.
+    """
+    def __init__(self, n, d=7, seed=1, time_limit=200, printing=True, stop_criterium="Time", budget=400, init=None):
+        super().__init__()
+        self.n = n
+        self.d = d
+        self.seed = seed
+        self.time_limit = time_limit
+        self.printing = printing
+        self.stop_criterium = stop_criterium
+        self.budget = budget
+        self.init = init
+        self.count_eval = 1
+        self.sequences = []
+        self.fitnesses = []
+        self.best_sequences = []
+        self.best_fitnesses = []
+        self.runtime = []
+        self.count_evaluations = []
+        self.best_sequence = None
+        self.best_fitness = float("inf")
+
+    def steps(self):
+        random.seed(self.seed)
+        np.random.seed(self.seed)
+        n, d, budget = self.n, self.d, self.budget
+        count_eval = 1
+
+        # Start algorithm
+        if self.init is None:
+            x = np.random.permutation(np.arange(n))
+        else:
+            x = copy.copy(self.init)
+        fitness_x, = yield [x]
+        count_eval += 1
+        self.count_eval = count_eval
+
+        # Save results
+        start = self.clock()
         x_best = copy.copy(x)
         fitness_best = copy.copy(fitness_x)
+        self.best_sequence, self.best_fitness = x_best, fitness_best
+        print(f'First sequence is {x} with fitness {fitness_x}')
+        self.sequences.append(x)
+        self.runtime.append(self.clock() - start)
+        self.fitnesses.append(fitness_x)
+        self.best_sequences.append(x_best)
+        self.best_fitnesses.append(fitness_best)
+        self.count_evaluations.append(count_eval)
+        stop = False
 
-    print(f'After first IterativeImprovement, sequence is {x} with fitness {fitness_x}')
-    print("Best so far", x_best, fitness_best)
+        # First iterative improvement
+        x, fitness_x, count_eval = yield from iterative_improvement_insertion_steps(x, fitness_x, count_eval,
+                                                                                    budget=budget)
+        self.count_eval = count_eval
 
-    sequences.append(list(x))
-    runtime.append(time.time() - start)
-    fitnesses.append(fitness_x)
-    best_sequences.append(list(x_best))
-    best_fitnesses.append(fitness_best)
-    count_evaluations.append(count_eval)
+        # Save results
+        if fitness_x < fitness_best:
+            x_best = copy.copy(x)
+            fitness_best = copy.copy(fitness_x)
+        self.best_sequence, self.best_fitness = x_best, fitness_best
 
-    if stop_criterium == "Time":
-        if time.time() - start >= time_limit:
-            print(f"Stop because of time")
-            stop = True
-    elif count_eval > budget:
-        print(f"Stop because of budget")
-        stop = True
-
-    while not stop:
-        x_ = copy.copy(x)
-
-        # destruction phase
-        to_remove_idx = np.random.choice(range(0, n), d, replace=False)
-        print(f'alternative to remove_idx {to_remove_idx}')
-        to_remove_items = x_[to_remove_idx]
-        x_ = np.delete(x_, to_remove_idx)
-
-        # construction phase
-        for j in range(0, d):
-            item = to_remove_items[j]
-            x_, fitness_x_, count_eval = best_insert(x_, item, count_eval, f_eval)
-        print("After construction", x_, fitness_x_, len(x_))
-
-        if stop_criterium == "Time":
-            if time.time() - start >= time_limit:
-                print("Stop because of time")
-                stop = True
-        elif count_eval > budget:
-            print(f"Stop because of budget")
-            stop = True
+        print(f'After first IterativeImprovement, sequence is {x} with fitness {fitness_x}')
+        print("Best so far", x_best, fitness_best)
 
-        if stop:
-            if fitness_x_ < fitness_x:
-                x = copy.copy(x_)
-                fitness_x = copy.copy(fitness_x_)
-                if fitness_x < fitness_best:
-                    x_best = copy.copy(x)
-                    fitness_best = copy.copy(fitness_x)
+        self.record(x, fitness_x, x_best, fitness_best, count_eval, start)
 
-        else:
-            x_, fitness_x_, count_eval = IterativeImprovementInsertion(x_, fitness_x_, count_eval, f_eval, budget=budget)
-            if fitness_x_ < fitness_x:
-                x = copy.copy(x_)
-                fitness_x = copy.copy(fitness_x_)
-                if fitness_x < fitness_best:
-                    x_best = copy.copy(x)
-                    fitness_best = copy.copy(fitness_x)
-
-        sequences.append(list(x))
-        runtime.append(time.time() - start)
-        fitnesses.append(fitness_x)
-        best_sequences.append(list(x_best))
-        best_fitnesses.append(fitness_best)
-        count_evaluations.append(count_eval)
-        print("Best so far", x_best, fitness_best, count_eval)
-
-        if stop_criterium == "Time":
-            if time.time() - start >= time_limit:
+        if self.stop_criterium == "Time":
+            if self.clock() - start >= self.time_limit:
                 print(f"Stop because of time")
                 stop = True
         elif count_eval > budget:
             print(f"Stop because of budget")
             stop = True
 
-    if write:
+        while not stop:
+            x_ = copy.copy(x)
+
+            # destruction phase
+            to_remove_idx = np.random.choice(range(0, n), d, replace=False)
+            print(f'alternative to remove_idx {to_remove_idx}')
+            to_remove_items = x_[to_remove_idx]
+            x_ = np.delete(x_, to_remove_idx)
+
+            # construction phase
+            for j in range(0, d):
+                item = to_remove_items[j]
+                x_, fitness_x_, count_eval = yield from best_insert_steps(x_, item, count_eval)
+            self.count_eval = count_eval
+            print("After construction", x_, fitness_x_, len(x_))
+
+            if self.stop_criterium == "Time":
+                if self.clock() - start >= self.time_limit:
+                    print("Stop because of time")
+                    stop = True
+            elif count_eval > budget:
+                print(f"Stop because of budget")
+                stop = True
+
+            if stop:
+                if fitness_x_ < fitness_x:
+                    x = copy.copy(x_)
+                    fitness_x = copy.copy(fitness_x_)
+                    if fitness_x < fitness_best:
+                        x_best = copy.copy(x)
+                        fitness_best = copy.copy(fitness_x)
+
+            else:
+                x_, fitness_x_, count_eval = yield from iterative_improvement_insertion_steps(x_, fitness_x_,
+                                                                                             count_eval,
+                                                                                             budget=budget)
+                self.count_eval = count_eval
+                if fitness_x_ < fitness_x:
+                    x = copy.copy(x_)
+                    fitness_x = copy.copy(fitness_x_)
+                    if fitness_x < fitness_best:
+                        x_best = copy.copy(x)
+                        fitness_best = copy.copy(fitness_x)
+            self.best_sequence, self.best_fitness = x_best, fitness_best
+
+            self.record(x, fitness_x, x_best, fitness_best, count_eval, start)
+            print("Best so far", x_best, fitness_best, count_eval)
+
+            if self.stop_criterium == "Time":
+                if self.clock() - start >= self.time_limit:
+                    print(f"Stop because of time")
+                    stop = True
+            elif count_eval > budget:
+                print(f"Stop because of budget")
+                stop = True
+
+    def record(self, x, fitness_x, x_best, fitness_best, count_eval, start):
+        self.sequences.append(list(x))
+        self.runtime.append(self.clock() - start)
+        self.fitnesses.append(fitness_x)
+        self.best_sequences.append(list(x_best))
+        self.best_fitnesses.append(fitness_best)
+        self.count_evaluations.append(count_eval)
+
+    def results(self):
         results = pd.DataFrame()
-        results['Time'] = runtime
-        results['Fitness'] = fitnesses
-        results['Sequence'] = sequences
-        results['Best_sequence'] = best_sequences
-        results['Best_fitness'] = best_fitnesses
-        results["Number of evaluations"] = count_evaluations
-        print("Total number of fitness evaluations", count_eval)
-        results.to_csv(output_file, header=True, index=False)
-
-    return count_eval - 1, x_best
\ No newline at end of file
+        results['Time'] = self.runtime
+        results['Fitness'] = self.fitnesses
+        results['Sequence'] = self.sequences
+        results['Best_sequence'] = self.best_sequences
+        results['Best_fitness'] = self.best_fitnesses
+        results["Number of evaluations"] = self.count_evaluations
+        return results
+
+
+def iterated_greedy(n, f_eval, d=7, seed=1, time_limit=200, output_file="results_random_search.txt", printing=True,
+                     write=True, stop_criterium="Time", budget=400, init=None, checkpoint_file=None, checkpoint_every=60,
+                     resume=False):
+    """
+    :param checkpoint_file: write a checkpoint of the run to this file every checkpoint_every seconds, see
+    AskTell.checkpoint
+    :param resume: continue the run of the checkpoint in checkpoint_file, if it exists
+    """
+    search = IteratedGreedy(n, d=d, seed=seed, time_limit=time_limit, printing=printing,
+                            stop_criterium=stop_criterium, budget=budget, init=init)
+    if checkpoint_file is not None:
+        search.checkpoint(checkpoint_file, every=checkpoint_every, resume=resume)
+    search.run(f_eval)
+
+    if write:
+        print("Total number of fitness evaluations", search.count_eval)
+        search.results().to_csv(output_file, header=True, index=False)
+
+    return search.count_eval - 1, search.best_sequence
@@ -2,99 +2,189 @@ import numpy as np
 import copy
 import random
 import pandas as pd
-import time
+from collections import deque
+from methods.ask_tell import AskTell
 
 
-def swap_random(sequence):
+def swap(sequence, i1, i2):
     seq = copy.copy(sequence)
-    i1, i2 = np.random.randint(0, len(seq), 2)
     seq[i1], seq[i2] = seq[i2], seq[i1]
     return seq
 
 
-def local_search(n, f_eval, time_limit=200, stop_criterium="Time", budget=400,
-                 output_file="results_local_search.txt", printing=True, write=True, init=None):
-    # Initialize
-    iteration = 1
-    sequences = []
-    fitnesses = []
-    best_sequences = []
-    best_fitnesses = []
-    runtime = []
-
-    # Start algorithm
-    if init is None:
-        sequence = np.random.permutation(np.arange(n))
-    else:
-        sequence = copy.copy(init)
-
-    # Write first sequence to output file
-    fitness = f_eval(sequence, iteration)
-    start = time.time()
-    print(f'Initial fitness is {fitness}')
-    print(f'Initial sequence is {sequence}')
-    # best sequence
-    best_sequence = copy.copy(sequence)
-    best_fitness = copy.copy(fitness)
-    print(f"best fitness is {best_fitness}")
-    sequences.append(list(sequence.copy()))
-    fitnesses.append(fitness)
-    best_sequences.append(list(best_sequence.copy()))
-    best_fitnesses.append(best_fitness)
-    runtime.append(time.time() - start)
-
-    stop = False
-
-    it = 1
-    while not stop:
-        it += 1
-        # Mutation: swap two items in permutation
-        candidate_sequence = swap_random(sequence)
-
-        # write new sequence to output file
-        candidate_fitness = f_eval(candidate_sequence, it)
-        if printing:
-            print(f"Candidate fitness {candidate_fitness}")
-
-        sequences.append(list(sequence.copy()))
-        fitnesses.append(fitness)
-        best_sequences.append(list(best_sequence.copy()))
-        best_fitnesses.append(best_fitness)
-        runtime.append(time.time() - start)
-
-        # accept / reject
-        if candidate_fitness < fitness:
-            sequence = copy.copy(candidate_sequence)
-            fitness = copy.copy(candidate_fitness)
-            if printing:
-                print("Solution is accepted")
-
-            if fitness < best_fitness:
-                best_sequence = copy.copy(sequence)
-                best_fitness = candidate_fitness
-
+def swap_random(sequence):
+    i1, i2 = np.random.randint(0, len(sequence), 2)
+    return swap(sequence, i1, i2)
+
+
+def random_pair(n, positions=None, focus_rate=0.8):
+    """
+    Two random positions of a sequence of length n. With focus positions, the first one is drawn from them with
+    probability focus_rate, the second one is drawn from all positions.
+    """
+    if positions and np.random.random() < focus_rate:
+        return np.array([positions[np.random.randint(0, len(positions))], np.random.randint(0, n)])
+    return np.random.randint(0, n, 2)
+
+
+class LocalSearch(AskTell):
+    """
+    Local search with random swaps, with an ask/tell interface. Every ask() returns batch_size random swaps of the
+    current sequence, that can be evaluated in parallel (speculative evaluation). Of a batch, either the first
+    improving swap in proposal order (accept="first") or the best swap (accept="best") is accepted. Every evaluated
+    swap is an iteration, the last batch is cut so the budget is never exceeded.
+    With reproducible=True and accept="first", the swaps proposed after the accepted one are not counted and are
+    proposed again on the new sequence, so the search follows the same path as with batch_size=1 for the same seed;
+    only the number of simulations (nr_evaluations) is higher.
+    With focus, a function of a sequence that returns the positions of the products that drive its objectives (e.g.
+    CriticalPathEvaluator.focus), one item of a swap is one of these products with probability focus_rate.
+    """
+    def __init__(self, n, time_limit=200, stop_criterium="Time", budget=400, printing=True, init=None, batch_size=1,
+                 accept="first", reproducible=False, focus=None, focus_rate=0.8):
+        super().__init__()
+        if accept not in ("first", "best"):
+            raise ValueError(f'Unknown acceptance {accept}, use "first" or "best"')
+        self.n = n
+        self.time_limit = time_limit
+        self.stop_criterium = stop_criterium
+        self.budget = budget
+        self.printing = printing
+        self.init = init
+        self.batch_size = batch_size
+        self.accept = accept
+        self.reproducible = reproducible
+        self.focus = focus
+        self.focus_rate = focus_rate
+        self.iterations = 0
+        self.sequences = []
+        self.fitnesses = []
+        self.best_sequences = []
+        self.best_fitnesses = []
+        self.runtime = []
+        self.best_sequence = None
+        self.best_fitness = float("inf")
+
+    def steps(self):
+        # Start algorithm
+        if self.init is None:
+            sequence = np.random.permutation(np.arange(self.n))
         else:
-            if printing:
-                print("Solution is rejected")
+            sequence = copy.copy(self.init)
+
+        # Write first sequence to output file
+        fitness, = yield [sequence]
+        start = self.clock()
+        print(f'Initial fitness is {fitness}')
+        print(f'Initial sequence is {sequence}')
+        # best sequence
+        self.best_sequence = copy.copy(sequence)
+        self.best_fitness = copy.copy(fitness)
+        print(f"best fitness is {self.best_fitness}")
+        self.record(sequence, fitness, start)
+
+        stop = False
+
+        it = 1
+        self.iterations = it
+        # Swap positions that are proposed but not used yet
+        pairs = deque()
+        while not stop:
+            size = self.batch_size
+            if self.stop_criterium != "Time":
+                size = int(max(1, min(size, self.budget + 1 - it)))
+            # Mutation: swap two items in permutation
+            positions = self.focus(sequence) if self.focus is not None else None
+            while len(pairs) < size:
+                pairs.append(random_pair(len(sequence), positions, self.focus_rate))
+            candidates = [swap(sequence, i1, i2) for i1, i2 in list(pairs)[:size]]
+
+            # write new sequences to output file
+            candidate_fitnesses = yield candidates
+            if self.accept == "best":
+                j = min(range(0, size), key=lambda k: candidate_fitnesses[k])
+                used = size
+            else:
+                j = next((k for k in range(0, size) if candidate_fitnesses[k] < fitness), size - 1)
+                used = j + 1 if self.reproducible else size
+            for _ in range(0, used):
+                pairs.popleft()
+            if not self.reproducible:
+                pairs.clear()
+
+            for k in range(0, used):
+                it += 1
+                if self.printing:
+                    print(f"Candidate fitness {candidate_fitnesses[k]}")
+                self.record(sequence, fitness, start)
+            self.iterations = it
+
+            # accept / reject
+            candidate_sequence, candidate_fitness = candidates[j], candidate_fitnesses[j]
+            if candidate_fitness < fitness:
+                sequence = copy.copy(candidate_sequence)
+                fitness = copy.copy(candidate_fitness)
+                if self.printing:
+                    print("Solution is accepted")
+
+                if fitness < self.best_fitness:
+                    self.best_sequence = copy.copy(sequence)
+                    self.best_fitness = candidate_fitness
+
+            else:
+                if self.printing:
+                    print("Solution is rejected")
+
+            if self.printing:
+                print(f"Best sequence so far has fitness {self.best_fitness}")
+
+            if self.stop_criterium == "Time":
+                if self.clock() - start >= self.time_limit:
+                    print(f"Final best sequence so far is {self.best_sequence}, with fitness {self.best_fitness}")
+                    stop = True
+            elif it > self.budget:
+                print(f"Final best sequence so far is {self.best_sequence}, with fitness {self.best_fitness}")
+                stop = True
 
-        if printing:
-            print(f"Best sequence so far has fitness {best_fitness}")
+    def record(self, sequence, fitness, start):
+        self.sequences.append(list(sequence.copy()))
+        self.fitnesses.append(fitness)
+        self.best_sequences.append(list(self.best_sequence.copy()))
+        self.best_fitnesses.append(self.best_fitness)
+        self.runtime.append(self.clock() - start)
 
-        if stop_criterium=="Time":
-            if time.time() - start >= time_limit:
-                print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
-                stop = True
-        elif it > budget:
-            print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
-            stop = True
-
-    results = pd.DataFrame()
-    results['Sequence'] = sequences
-    results['Fitness'] = fitnesses
-    results['Best_sequence'] = best_sequences
-    results['Best_fitness'] = best_fitnesses
-    results['Time'] = runtime
+    def results(self):
+        results = pd.DataFrame()
+        results['Sequence'] = self.sequences
+        results['Fitness'] = self.fitnesses
+        results['Best_sequence'] = self.best_sequences
+        results['Best_fitness'] = self.best_fitnesses
+        results['Time'] = self.runtime
+        return results
+
+
+def local_search(n, f_eval, time_limit=200, stop_criterium="Time", budget=400,
+                 output_file="results_local_search.txt", printing=True, write=True, init=None, batch_size=1,
+                 accept="first", reproducible=False, f_eval_batch=None, focus=None, focus_rate=0.8,
+                 checkpoint_file=None, checkpoint_every=60, resume=False):
+    """
+    :param batch_size: number of swaps evaluated at once, see LocalSearch
+    :param f_eval_batch: f_eval_batch(list of sequences) returns the list of their fitnesses, e.g. evaluated by a
+    SharedPlanPool; if None, the swaps are evaluated one by one with f_eval
+    :param focus: function of a sequence that returns the positions to focus the swaps on, see LocalSearch
+    :param checkpoint_file: write a checkpoint of the run to this file every checkpoint_every seconds, see
+    AskTell.checkpoint
+    :param resume: continue the run of the checkpoint in checkpoint_file, if it exists
+    """
+    search = LocalSearch(n, time_limit=time_limit, stop_criterium=stop_criterium, budget=budget, printing=printing,
+                         init=init, batch_size=batch_size, accept=accept, reproducible=reproducible, focus=focus,
+                         focus_rate=focus_rate)
+    if checkpoint_file is not None:
+        search.checkpoint(checkpoint_file, every=checkpoint_every, resume=resume)
+    if f_eval_batch is None:
+        search.run(f_eval)
+    else:
+        search.run_batch(f_eval_batch)
     if write:
-        results.to_csv(output_file, header=True, index=False)
+        search.results().to_csv(output_file, header=True, index=False)
 
-    return it, best_sequence
\ No newline at end of file
+    return search.iterations, search.best_sequence
@@ -0,0 +1,111 @@
+import os
+import math
+import random
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from classes.general import Settings, evaluator_simpy
+from methods.rolling_horizon import combine_sequences
+
+
+def evaluate_configuration(configuration, instance_name, size, budget, seed, simulator="simulator_3", l1=0.5, l2=0.5):
+    """
+    Run one configuration of a search method on one instance with the given budget (number of evaluations)
+    :param configuration: dictionary with "method", "init" and the parameters of the method, e.g. {"d": 5} for
+                          iterated_greedy or {"k": 40, "m": 10} for rolling_horizon
+    :return: fitness of the best sequence that was found
+    """
+    from methods.local_search import local_search
+    from methods.random_search import random_search
+    from methods.iterated_greedy import iterated_greedy
+    from methods.rolling_horizon import rolling_horizon
+    from methods.constructive import initial_sequence
+
+    random.seed(seed)
+    np.random.seed(seed)
+    setting = Settings(method=configuration["method"], stop_criterium="Budget", budget=budget, instance=instance_name,
+                       size=size, simulator=simulator, init=configuration.get("init", "random"), seed=seed,
+                       l1=l1, l2=l2)
+    instance = pd.read_pickle(f"factory_data/instances/instance_{instance_name}.pkl")
+    f_eval = lambda x, i: evaluator_simpy(plan=instance, sequence=x, setting=setting, sim_time=size*1000000)
+    init = initial_sequence(setting, instance, f_eval=f_eval)
+
+    if setting.method == "local_search":
+        _, best_sequence = local_search(n=size, f_eval=f_eval, stop_criterium="Budget", budget=budget, printing=False,
+                                        write=False, init=init)
+    elif setting.method == "random_search":
+        _, best_sequence = random_search(n=size, f_eval=f_eval, stop_criterium="Budget", budget=budget,
+                                         printing=False, write=False)
+    elif setting.method == "iterated_greedy":
+        _, best_sequence = iterated_greedy(n=size, f_eval=f_eval, d=configuration.get("d", 7), seed=seed,
+                                           stop_criterium="Budget", budget=budget, printing=False, write=False,
+                                           init=init)
+    elif setting.method == "rolling_horizon":
+        f_eval_fixed = lambda fixed, x, i: f_eval(combine_sequences(fixed, x), i)
+        best_sequence = rolling_horizon(n=size, f_eval=f_eval_fixed, k=configuration.get("k", 40),
+                                        m=configuration.get("m", 10), budget=budget, printing=False)
+    else:
+        raise ValueError(f'Unknown method {setting.method}')
+
+    return f_eval(best_sequence, 0)
+
+
+def _evaluate(task):
+    configuration, instance_name, size, budget, seed, simulator, l1, l2 = task
+    return evaluate_configuration(configuration, instance_name, size, budget, seed, simulator, l1, l2)
+
+
+def successive_halving(configurations, instances, min_budget=50, eta=2, seeds=(1,), simulator="simulator_3", l1=0.5,
+                       l2=0.5, processes=None, output_file=None, min_pairs_dominance=5,
+                       nr_survivors=1):
+    """
+    Race configurations of search methods by successive halving. In every round all surviving configurations are run
+    in parallel on all (instance, seed) pairs, the configurations are ranked per pair, and only the best 1/eta part
+    on mean rank survives. Configurations that are dominated by another configuration on every pair are dropped as
+    well, if there are at least min_pairs_dominance pairs. The budget per run is multiplied by eta every round, until
+    nr_survivors configurations are left.
+    :param configurations: list of dictionaries, see evaluate_configuration
+    :param instances: list of (instance name, size) tuples, the budget of a run is min_budget * size / 20 in round 0
+    :return: list of the surviving configurations and a DataFrame with all results
+    """
+    survivors = list(range(0, len(configurations)))
+    pairs = [(instance_name, size, seed) for instance_name, size in instances for seed in seeds]
+    table = []
+    budget_factor = min_budget
+    round_id = 0
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        while True:
+            tasks = [(configurations[c], instance_name, size, budget_factor * size / 20, seed, simulator, l1, l2)
+                     for c in survivors for instance_name, size, seed in pairs]
+            fitnesses = np.array(list(pool.map(_evaluate, tasks))).reshape(len(survivors), len(pairs))
+            for c, row in zip(survivors, fitnesses):
+                for (instance_name, size, seed), fitness in zip(pairs, row):
+                    table.append({"round": round_id, "configuration": str(configurations[c]),
+                                  "instance": instance_name, "seed": seed, "budget": budget_factor * size / 20,
+                                  "fitness": fitness})
+
+            # Rank per (instance, seed) pair, ties get the mean rank
+            ranks = pd.DataFrame(fitnesses).rank(axis=0).to_numpy()
+            mean_rank = ranks.mean(axis=1)
+            dominated = [any(np.all(fitnesses[other] <= fitnesses[c]) and np.any(fitnesses[other] < fitnesses[c])
+                             for other in range(0, len(survivors))) and len(pairs) >= min_pairs_dominance
+                         for c in range(0, len(survivors))]
+            print(f"Round {round_id}, budget factor {budget_factor}:")
+            for c, rank, is_dominated in zip(survivors, mean_rank, dominated):
+                print(f"    {configurations[c]} has mean rank {rank}{', dominated' if is_dominated else ''}")
+
+            if len(survivors) <= nr_survivors:
+                break
+            keep = max(nr_survivors, math.ceil(len(survivors) / eta))
+            order = [c for c in np.argsort(mean_rank, kind="stable") if not dominated[c]][:keep]
+            survivors = [survivors[c] for c in sorted(order)]
+            if len(survivors) <= nr_survivors:
+                break
+            budget_factor *= eta
+            round_id += 1
+
+    print(f"Survivors: {[configurations[c] for c in survivors]}")
+    table = pd.DataFrame(table)
+    if output_file is not None:
+        table.to_csv(output_file)
+    return [configurations[c] for c in survivors], table
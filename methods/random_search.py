@@ -1,83 +1,113 @@
 import numpy as np
 import copy
 import pandas as pd
-import time
-
-
-def random_search(n, f_eval, time_limit=200, stop_criterium="Time", budget=400,
-                  printing=True, write=True, output_file="results_random_search.txt"):
-    # Set-up algorithm parameters
-
-    iteration = 1
-    sequences = []
-    fitnesses = []
-    best_sequences = []
-    best_fitnesses = []
-    runtime = []
-
-    # Start algorithm
-    sequence = np.random.permutation(np.arange(n))
-
-    # write first sequence to output file
-    fitness = f_eval(sequence, iteration)
-    start = time.time()
-    print(f'Initial sequence is {sequence + 1} with fitness {fitness}')
-
-    # best sequence
-    best_sequence = copy.copy(sequence)
-    best_fitness = fitness
-
-    # Store data
-    best_sequences.append(list(best_sequence.copy()))
-    best_fitnesses.append(best_fitness)
-    sequences.append(list(sequence.copy()))
-    fitnesses.append(fitness)
-    runtime.append(time.time() - start)
-    print(f"best fitness is {best_fitness}")
-    stop = False
-    it = 1
-    while stop == False:
-        it += 1
-
-        # Random new sequence
-        sequence = np.random.permutation(np.arange(n))
-
-        # write new sequence to output file
-        fitness = f_eval(sequence, it)
-
-        if printing:
-            print(f"New sequence is {sequence} with fitness {fitness}")
+from methods.ask_tell import AskTell
+
+
+class RandomSearch(AskTell):
+    """
+    Random search with an ask/tell interface. Every ask() returns batch_size random sequences, the fitnesses are
+    processed in order and the candidates after the stopping criterion are discarded, so the search gives the same
+    result for every batch size.
+    """
+    def __init__(self, n, time_limit=200, stop_criterium="Time", budget=400, printing=True, batch_size=1):
+        super().__init__()
+        self.n = n
+        self.time_limit = time_limit
+        self.stop_criterium = stop_criterium
+        self.budget = budget
+        self.printing = printing
+        self.batch_size = batch_size
+        self.iterations = 0
+        self.sequences = []
+        self.fitnesses = []
+        self.best_sequences = []
+        self.best_fitnesses = []
+        self.runtime = []
+        self.best_sequence = None
+        self.best_fitness = float("inf")
+
+    def steps(self):
+        # Start algorithm
+        sequence = np.random.permutation(np.arange(self.n))
+
+        # write first sequence to output file
+        fitness, = yield [sequence]
+        start = self.clock()
+        print(f'Initial sequence is {sequence + 1} with fitness {fitness}')
+
+        # best sequence
+        self.best_sequence = copy.copy(sequence)
+        self.best_fitness = fitness
 
         # Store data
-        best_sequences.append(list(best_sequence.copy()))
-        best_fitnesses.append(best_fitness)
-        sequences.append(list(sequence.copy()))
-        fitnesses.append(fitness)
-        runtime.append(time.time() - start)
-
-        if fitness < best_fitness:
-            best_sequence = copy.copy(sequence)
-            best_fitness = fitness
+        self.record(sequence, fitness, start)
+        print(f"best fitness is {self.best_fitness}")
+        stop = False
+        it = 1
+        self.iterations = it
+        while stop == False:
+            # Random new sequences
+            batch = [np.random.permutation(np.arange(self.n)) for _ in range(0, self.batch_size)]
+            batch_fitnesses = yield batch
+            for sequence, fitness in zip(batch, batch_fitnesses):
+                it += 1
+                self.iterations = it
+
+                if self.printing:
+                    print(f"New sequence is {sequence} with fitness {fitness}")
+
+                # Store data
+                self.record(sequence, fitness, start)
+
+                if fitness < self.best_fitness:
+                    self.best_sequence = copy.copy(sequence)
+                    self.best_fitness = fitness
+
+                if self.printing:
+                    print(f'At end of iteration {it}, current sequence is {sequence}')
+                    print(f"Best fitness so far is {self.best_fitness} from sequence {self.best_sequence}")
+
+                if self.stop_criterium == "Time":
+                    if self.clock() - start >= self.time_limit:
+                        print(f"Final best sequence so far is {self.best_sequence}, with fitness {self.best_fitness}")
+                        stop = True
+                elif it > self.budget:
+                    print(f"Final best sequence so far is {self.best_sequence}, with fitness {self.best_fitness}")
+                    stop = True
+                if stop:
+                    break
+
+    def record(self, sequence, fitness, start):
+        self.best_sequences.append(list(self.best_sequence.copy()))
+        self.best_fitnesses.append(self.best_fitness)
+        self.sequences.append(list(sequence.copy()))
+        self.fitnesses.append(fitness)
+        self.runtime.append(self.clock() - start)
+
+    def results(self):
+        results = pd.DataFrame()
+        results['Sequence'] = self.sequences
+        results['Fitness'] = self.fitnesses
+        results['Best_sequence'] = self.best_sequences
+        results['Best_fitness'] = self.best_fitnesses
+        results['Time'] = self.runtime
+        return results
 
-        if printing:
-            print(f'At end of iteration {it}, current sequence is {sequence}')
-            print(f"Best fitness so far is {best_fitness} from sequence {best_sequence}")
-
-        if stop_criterium == "Time":
-            if time.time() - start >= time_limit:
-                print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
-                stop = True
-        elif it > budget:
-            print(f"Final best sequence so far is {best_sequence}, with fitness {best_fitness}")
-            stop = True
-
-    results = pd.DataFrame()
-    results['Sequence'] = sequences
-    results['Fitness'] = fitnesses
-    results['Best_sequence'] = best_sequences
-    results['Best_fitness'] = best_fitnesses
-    results['Time'] = runtime
 
+def random_search(n, f_eval, time_limit=200, stop_criterium="Time", budget=400,
+                  printing=True, write=True, output_file="results_random_search.txt", checkpoint_file=None,
+                  checkpoint_every=60, resume=False):
+    """
+    :param checkpoint_file: write a checkpoint of the run to this file every checkpoint_every seconds, see
+    AskTell.checkpoint
+    :param resume: continue the run of the checkpoint in checkpoint_file, if it exists
+    """
+    search = RandomSearch(n, time_limit=time_limit, stop_criterium=stop_criterium, budget=budget,
+                          printing=printing)
+    if checkpoint_file is not None:
+        search.checkpoint(checkpoint_file, every=checkpoint_every, resume=resume)
+    search.run(f_eval)
     if write:
-        results.to_csv(output_file, header=True, index=False)
-    return it, best_sequence
\ No newline at end of file
+        search.results().to_csv(output_file, header=True, index=False)
+    return search.iterations, search.best_sequence
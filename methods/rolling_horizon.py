@@ -0,0 +1,40 @@
+import copy
+import numpy as np
+from methods.local_search import local_search
+
+
+def combine_sequences(fixed, x):
+    """
+    Sequence of the fixed products followed by the products of x, as evaluated by the f_eval of rolling_horizon
+    """
+    return list(np.concatenate([fixed, x]))
+
+
+def rolling_horizon(n, f_eval, k=40, m=10, budget=400, search_method=local_search, printing=True):
+    """
+    Optimize windows of k products, after every window the first m products are fixed
+    :param f_eval: f_eval(fixed, x, i) returns the fitness of the fixed products followed by sequence x
+    :param search_method: search method with the signature of local_search
+    :param printing: print the windows and the fixed products
+    :return: the production sequence
+    """
+    productionplan = list(range(0, n))
+    fixed = []
+    nr_iterations = n/m
+    budget_per_iteration = round(budget/nr_iterations)
+
+    for i in range(0, round(nr_iterations)):
+        x = copy.copy(productionplan[i*m:i*m+k])
+        if printing:
+            print(f'To optimize is {x}')
+        # Important, the f_eval considers the previously solved subinstances
+        _, best_sequence = search_method(n=n, f_eval=lambda y, j: f_eval(fixed, y, j), stop_criterium="Budget",
+                                         budget=budget_per_iteration, printing=False, write=False, init=x)
+        if printing:
+            print(best_sequence)
+        productionplan[i*m:i*m+k] = copy.copy(best_sequence)
+        fixed = productionplan[0: (i+1) * m]
+        if printing:
+            print(f'We now fixed {fixed}')
+
+    return productionplan
@@ -0,0 +1,247 @@
+import numpy as np
+import copy
+import pandas as pd
+from methods.ask_tell import AskTell
+from methods.local_search import random_pair
+
+
+class PermutationHash:
+    """
+    Zobrist-style hash of a permutation, as the XOR of random keys of its edges (x[p], x[p+1]). The permutation is
+    closed into a cycle through a sentinel n, such that the set of edges determines the permutation. A swap or an
+    insert move changes at most six edges, so the hash of a neighbour is computed in O(1).
+    """
+    def __init__(self, n):
+        self.n = n
+        self.keys = np.random.randint(0, 2 ** 62, size=(n + 1, n + 1), dtype=np.int64).tolist()
+
+    def _item(self, x, p):
+        return self.n if p < 0 or p >= len(x) else x[p]
+
+    def full(self, x):
+        value = self.keys[self.n][x[0]] ^ self.keys[x[-1]][self.n]
+        for p in range(0, len(x) - 1):
+            value ^= self.keys[x[p]][x[p + 1]]
+        return value
+
+    def swap(self, value, x, i, j):
+        """
+        Hash after swapping the items at positions i and j
+        """
+        if i == j:
+            return value
+        if i > j:
+            i, j = j, i
+
+        def moved(p):
+            return x[j] if p == i else x[i] if p == j else self._item(x, p)
+
+        for p in {i - 1, i, j - 1, j}:
+            value ^= self.keys[self._item(x, p)][self._item(x, p + 1)] ^ self.keys[moved(p)][moved(p + 1)]
+        return value
+
+    def insert(self, value, x, i, k):
+        """
+        Hash after removing the item at position i and inserting it at position k of the result
+        """
+        if i == k:
+            return value
+        item = x[i]
+        keys = self.keys
+        # Remove the item
+        value ^= keys[self._item(x, i - 1)][item] ^ keys[item][self._item(x, i + 1)] ^ \
+            keys[self._item(x, i - 1)][self._item(x, i + 1)]
+
+        # Insert it between y[k - 1] and y[k] of the remaining sequence y
+        def remaining(p):
+            return self._item(x, p if p < i else p + 1) if 0 <= p < len(x) - 1 else self.n
+
+        value ^= keys[remaining(k - 1)][remaining(k)] ^ keys[remaining(k - 1)][item] ^ keys[item][remaining(k)]
+        return value
+
+
+def apply_move(sequence, move):
+    kind, i, j = move
+    seq = copy.copy(sequence)
+    if kind == "swap":
+        seq[i], seq[j] = seq[j], seq[i]
+    else:
+        seq = np.insert(np.delete(seq, i), j, sequence[i])
+    return seq
+
+
+class TabuSearch(AskTell):
+    """
+    Tabu search over swap and insert moves, with an ask/tell interface. Per iteration a sample of neighbours is
+    drawn; neighbours that were visited before or that move an item back to a tabu position are rejected on their
+    hash, before they are evaluated. The remaining neighbours are asked for as one batch, and the search moves to the
+    best of them, also if it is worse. The last batch is cut so the budget is never exceeded.
+    With focus, a function of a sequence that returns the positions of the products that drive its objectives (e.g.
+    CriticalPathEvaluator.focus), one item of a move is one of these products with probability focus_rate.
+    """
+    def __init__(self, n, time_limit=200, stop_criterium="Time", budget=400, printing=True, init=None,
+                 neighbourhood_size=10, tenure=None, moves="mixed", focus=None, focus_rate=0.8, max_idle=100):
+        super().__init__()
+        self.n = n
+        self.time_limit = time_limit
+        self.stop_criterium = stop_criterium
+        self.budget = budget
+        self.printing = printing
+        self.init = init
+        self.neighbourhood_size = neighbourhood_size
+        self.tenure = tenure if tenure is not None else max(1, n // 4)
+        self.moves = moves
+        self.focus = focus
+        self.focus_rate = focus_rate
+        self.max_idle = max_idle
+        self.saved = 0
+        self.sequences = []
+        self.fitnesses = []
+        self.best_sequences = []
+        self.best_fitnesses = []
+        self.runtime = []
+        self.count_evaluations = []
+        self.saved_evaluations = []
+        self.best_sequence = None
+        self.best_fitness = float("inf")
+
+    def steps(self):
+        n = self.n
+        hasher = PermutationHash(n)
+        visited = set()
+        tabu = {}
+
+        # Start algorithm
+        if self.init is None:
+            sequence = np.random.permutation(np.arange(n))
+        else:
+            sequence = np.array(copy.copy(self.init))
+        sequence_hash = hasher.full(sequence)
+        visited.add(sequence_hash)
+
+        fitness, = yield [sequence]
+        start = self.clock()
+        self.best_sequence = copy.copy(sequence)
+        self.best_fitness = fitness
+        print(f'Initial sequence is {sequence} with fitness {fitness}')
+        self.record(sequence, fitness, start)
+
+        stop = False
+        iteration = 0
+        idle = 0
+        while not stop:
+            iteration += 1
+            candidates = []
+            sampled = set()
+            positions = self.focus(sequence) if self.focus is not None else None
+            for _ in range(0, self.neighbourhood_size):
+                kind = self.moves if self.moves != "mixed" else ("swap" if np.random.random() < 0.5 else "insert")
+                i, j = random_pair(n, positions, self.focus_rate)
+                if i == j:
+                    # Not a move, the sequence itself is no saved evaluation
+                    continue
+                if kind == "swap":
+                    candidate_hash = hasher.swap(sequence_hash, sequence, i, j)
+                    placed = [(sequence[i], j), (sequence[j], i)]
+                else:
+                    candidate_hash = hasher.insert(sequence_hash, sequence, i, j)
+                    placed = [(sequence[i], j)]
+                if candidate_hash in visited or candidate_hash in sampled or \
+                        any(tabu.get(place, 0) >= iteration for place in placed):
+                    self.saved += 1
+                    continue
+                sampled.add(candidate_hash)
+                candidates.append(((kind, i, j), candidate_hash))
+            idle = idle + 1 if not candidates else 0
+            if self.stop_criterium != "Time":
+                candidates = candidates[:max(0, int(self.budget) + 1 - self.nr_evaluations)]
+
+            best_move = None
+            if candidates:
+                neighbours = [apply_move(sequence, move) for move, _ in candidates]
+                neighbour_fitnesses = yield neighbours
+                for (move, candidate_hash), candidate, candidate_fitness in \
+                        zip(candidates, neighbours, neighbour_fitnesses):
+                    # Only evaluated neighbours are visited, the ones cut off by the budget can be sampled again
+                    visited.add(candidate_hash)
+                    if best_move is None or candidate_fitness < best_move[1]:
+                        best_move = (candidate, candidate_fitness, move, candidate_hash)
+
+            if best_move is not None:
+                candidate, candidate_fitness, (kind, i, j), candidate_hash = best_move
+                # Moving the items back to their old positions is tabu
+                tabu[(sequence[i], i)] = iteration + self.tenure
+                if kind == "swap":
+                    tabu[(sequence[j], j)] = iteration + self.tenure
+                sequence, fitness, sequence_hash = candidate, candidate_fitness, candidate_hash
+                if fitness < self.best_fitness:
+                    self.best_sequence = copy.copy(sequence)
+                    self.best_fitness = fitness
+
+            self.record(sequence, fitness, start)
+            if self.printing:
+                print(f"Iteration {iteration}: fitness {fitness}, best fitness so far is {self.best_fitness}, "
+                      f"{self.saved} evaluations saved by hashing")
+
+            if self.stop_criterium == "Time":
+                if self.clock() - start >= self.time_limit:
+                    stop = True
+            elif self.nr_evaluations > self.budget:
+                stop = True
+            if idle >= self.max_idle:
+                print(f"No unvisited neighbours that are not tabu in {idle} iterations, the search is stopped")
+                stop = True
+        print(f"Final best sequence so far is {self.best_sequence}, with fitness {self.best_fitness}")
+        print(f"Number of evaluations saved by hashing: {self.saved}")
+
+    def record(self, sequence, fitness, start):
+        self.sequences.append(list(sequence))
+        self.fitnesses.append(fitness)
+        self.best_sequences.append(list(self.best_sequence))
+        self.best_fitnesses.append(self.best_fitness)
+        self.runtime.append(self.clock() - start)
+        self.count_evaluations.append(self.nr_evaluations)
+        self.saved_evaluations.append(self.saved)
+
+    def results(self):
+        results = pd.DataFrame()
+        results['Sequence'] = self.sequences
+        results['Fitness'] = self.fitnesses
+        results['Best_sequence'] = self.best_sequences
+        results['Best_fitness'] = self.best_fitnesses
+        results['Time'] = self.runtime
+        results["Number of evaluations"] = self.count_evaluations
+        results["Saved evaluations"] = self.saved_evaluations
+        return results
+
+
+def tabu_search(n, f_eval, time_limit=200, stop_criterium="Time", budget=400, output_file="results_tabu_search.txt",
+                printing=True, write=True, init=None, neighbourhood_size=10, tenure=None, moves="mixed", focus=None,
+                focus_rate=0.8, max_idle=100, f_eval_batch=None, checkpoint_file=None, checkpoint_every=60,
+                resume=False):
+    """
+    :param neighbourhood_size: number of neighbours that is sampled per iteration
+    :param tenure: number of iterations that the old position of a moved item is tabu, by default n // 4
+    :param moves: "swap", "insert" or "mixed"
+    :param focus: function of a sequence that returns the positions to focus the moves on, see TabuSearch
+    :param max_idle: the search stops after this many iterations in a row without a neighbour to evaluate, e.g. when
+                     all neighbours of a small instance are visited
+    :param f_eval_batch: f_eval_batch(list of sequences) returns the list of their fitnesses, e.g. evaluated by a
+    SharedPlanPool; if None, the neighbours are evaluated one by one with f_eval
+    :param checkpoint_file: write a checkpoint of the run to this file every checkpoint_every seconds, see
+    AskTell.checkpoint
+    :param resume: continue the run of the checkpoint in checkpoint_file, if it exists
+    """
+    search = TabuSearch(n, time_limit=time_limit, stop_criterium=stop_criterium, budget=budget, printing=printing,
+                        init=init, neighbourhood_size=neighbourhood_size, tenure=tenure, moves=moves, focus=focus,
+                        focus_rate=focus_rate, max_idle=max_idle)
+    if checkpoint_file is not None:
+        search.checkpoint(checkpoint_file, every=checkpoint_every, resume=resume)
+    if f_eval_batch is None:
+        search.run(f_eval)
+    else:
+        search.run_batch(f_eval_batch)
+    if write:
+        search.results().to_csv(output_file, header=True, index=False)
+
+    return search.nr_evaluations, search.best_sequence
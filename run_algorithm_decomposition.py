@@ -0,0 +1,95 @@
+from methods.decomposition import month_decomposition, months
+from methods.constructive import initial_sequence
+from classes.general import Settings
+from classes.results_store import ResultsStore
+from classes.run_cache import RunCache, source_files
+import pandas as pd
+import time
+"""
+This script optimises the instances per deadline month: the months are solved in parallel worker processes, from
+the state that the earlier months leave, and the combined sequence is polished with a local search over all
+products. 80% of the budget goes to the months, the rest to the polishing.
+"""
+
+if __name__ == '__main__':
+    setting_list = []
+    data_table = []
+    simulator = "simulator_3"
+    factory_name = "factory_1"
+    for seed in range(4, 5):
+        for size in [120, 240]:
+            for id in range(1, 10):
+                for l1 in [0.5]:
+                    l2 = 1 - l1
+                    for search_method in ["local_search"]:
+                        for init in ["sorted"]:
+                            setting = Settings(method=f"decomposition_{search_method}", instance=f'{size}_{id}_{factory_name}',
+                                               size=size, simulator=simulator, stop_criterium="Budget", budget=(size/20)*200,
+                                               objective=f'l1={l1}_l2={l2}', init=init, seed=seed, l1=l1, l2=l2)
+                            setting_list.append(setting)
+
+    store = ResultsStore()
+    cache = RunCache()
+    for setting in setting_list:
+        file_name = setting.make_file_name()
+        # Skip runs of which the settings, instance, simulator and methods are unchanged
+        instance_file = f"factory_data/instances/instance_{setting.instance}.pkl"
+        # The month subproblems are simulated with the rescheduling simulator
+        sources = source_files(setting.simulator, ["decomposition", "local_search", "constructive"]) + \
+            ["classes/rescheduling.py", "classes/simulator_3_lean.py", "classes/compact.py"]
+        key = cache.key(setting, instance_file, sources)
+        if key in cache:
+            print(f"Reuse cached run {file_name}")
+            data_table.append(cache.load(key))
+            pd.DataFrame(data_table).to_csv("results/summary_tables/decomposition.csv")
+            continue
+
+        start = time.time()
+        instance = pd.read_pickle(instance_file)
+        nr_months = len(months(instance))
+        budget_per_month = round(0.8 * setting.budget / nr_months)
+        productionplan, month_fitnesses = month_decomposition(instance, setting, budget_per_month=budget_per_month,
+                                                              polish_budget=round(setting.budget - nr_months * budget_per_month),
+                                                              init=initial_sequence(setting, instance),
+                                                              method=setting.method[len("decomposition_"):],
+                                                              sim_time=setting.size*1000000)
+        print(f"Fitness of the month subproblems {month_fitnesses}")
+
+        if setting.simulator == "simulator_1":
+            from classes.simulator_1 import Simulator
+        if setting.simulator == "simulator_2":
+            from classes.simulator_2 import Simulator
+        if setting.simulator == "simulator_3":
+            from classes.simulator_3 import Simulator
+        if setting.simulator == "simulator_3_lean":
+            from classes.simulator_3_lean import Simulator
+        instance.set_sequence(productionplan)
+        simulator = Simulator(instance, printing=False, claim=setting.claim, dispatching=setting.dispatching)
+        makespan, lateness = simulator.simulate(SIM_TIME=setting.size*1000000, RANDOM_SEED=setting.seed, write=True,
+                                                output_location=f"results/resource_usage/{file_name}.csv")
+        runtime = time.time() - start
+        results = pd.DataFrame()
+        results['Makespan'] = [makespan]
+        results['Lateness'] = [lateness]
+        results['Time'] = [runtime]
+        results['Fitness'] = [setting.l1 * makespan + setting.l2 * lateness]
+        results['Sequence'] = [productionplan]
+        results['Best_fitness'] = [setting.l1 * makespan + setting.l2 * lateness]
+        results['Best_sequence'] = [productionplan]
+        results.to_csv(f'results/results_algorithm/{file_name}.txt', header=True, index=False)
+        store.save(setting, results)
+        data_table.append({"instance": setting.instance,
+                           "method": setting.method,
+                           "budget": setting.budget,
+                           "fitness": setting.l1 * makespan + setting.l2 * lateness,
+                           "makespan": makespan,
+                           "lateness": lateness,
+                           "costs": 0.5 * makespan + 0.5 * lateness,
+                           "l1": setting.l1,
+                           "l2": setting.l2,
+                           "seed": setting.seed,
+                           "time": runtime})
+        dataframe = pd.DataFrame(data_table)
+        dataframe.to_csv("results/summary_tables/decomposition.csv")
+        cache.save(key, setting, instance_file, sources, data_table[-1],
+                   files=[f'results/results_algorithm/{file_name}.txt', f"results/resource_usage/{file_name}.csv"])
@@ -5,6 +5,12 @@ from classes.general import Settings, evaluator_simpy
 from methods.local_search import local_search
 from methods.random_search import random_search
 from methods.iterated_greedy import iterated_greedy
+from methods.genetic_algorithm import genetic_algorithm
+from methods.tabu_search import tabu_search
+from methods.constructive import initial_sequence
+from classes.shared_plan import SharedPlanPool
+from classes.results_store import ResultsStore
+from classes.run_cache import RunCache, source_files
 
 
 if __name__ == '__main__':
@@ -13,6 +19,11 @@ if __name__ == '__main__':
     settings_list = []
     data_table = []
     factory_name = "factory_1"
+    # Methods and initial sequences of the sweep over 20, 120 and 240 products. Also available are the methods
+    # "parallel_local_search", "tabu_search" and "genetic_algorithm", and the inits "constructive", "edd", "slack"
+    # and "fermenter_balance"
+    search_methods = ["local_search"]
+    search_inits = ["random", "sorted"]
     for simulator in ["simulator_3"]:
         for size in [20, 40]:
             for seed in [4]:
@@ -33,8 +44,8 @@ if __name__ == '__main__':
                 for id in range(1, 10):
                     for l1 in [0.5]:
                         l2 = 1 - l1
-                        for method in ["local_search"]:
-                            for init in ["random", 'sorted']:
+                        for method in search_methods:
+                            for init in search_inits:
                                 setting = Settings(method=method, stop_criterium="Budget", budget=budget,
                                                    instance=f'{size}_{id}_{factory_name}', size=size, simulator=simulator,
                                                    objective=f'l1={l1}_l2={l2}', init=init, seed=seed, l1=l1, l2=l2)
@@ -46,26 +57,47 @@ if __name__ == '__main__':
                                                    objective=f'l1={l1}_l2={l2}', init=init, seed=seed, l1=l1, l2=l2)
                                 settings_list.append(setting)
 
+    store = ResultsStore()
+    cache = RunCache()
     for setting in settings_list:
+        file_name = setting.make_file_name()
+        # Skip runs of which the settings, instance, simulator and method are unchanged
+        instance_file = f"factory_data/instances/instance_{setting.instance}.pkl"
+        sources = source_files(setting.simulator, [setting.method] +
+                               (["constructive"] if setting.init not in ["random", "sorted"] else []))
+        key = cache.key(setting, instance_file, sources)
+        if key in cache:
+            print(f"Reuse cached run {file_name}")
+            data_table.append(cache.load(key))
+            pd.DataFrame(data_table).to_csv("results/summary_tables/global search.csv")
+            continue
+
         print(f"Start new instance {setting.instance}")
         # Set seed
         random.seed(setting.seed)
         np.random.seed(setting.seed)
-        instance = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
-        file_name = setting.make_file_name()
+        instance = pd.read_pickle(instance_file)
 
         f_eval = lambda x, i: evaluator_simpy(plan=instance, sequence=x, setting=setting, sim_time=size*1000000,
                                               printing=False)
 
-        if setting.init == "random":
-            init = None
-        elif setting.init == "sorted":
-            init = [i for i in range(0, setting.size)]
+        init = initial_sequence(setting, instance, f_eval=f_eval)
 
+        # Long runs write a checkpoint every minute, a killed run continues from it when the script is restarted
+        checkpoint_file = f'results/checkpoints/{file_name}.pkl'
         if setting.method == "local_search":
             nr_iterations, best_sequence = local_search(n=setting.size, stop_criterium=setting.stop_criterium, budget=setting.budget, f_eval=f_eval,
                                                         time_limit=setting.time_limit, output_file=f'results/results_algorithm/{file_name}.txt', write=True,
-                                                        printing=printing, init=init)
+                                                        printing=printing, init=init, checkpoint_file=checkpoint_file, resume=True)
+        elif setting.method == "parallel_local_search":
+            # A batch of swaps, one per core, is evaluated at once by a pool of worker processes
+            with SharedPlanPool(instance, simulator=setting.simulator, sim_time=size*1000000, claim=setting.claim,
+                                dispatching=setting.dispatching) as pool:
+                f_eval_batch = lambda sequences: pool.fitness_many(sequences, setting)
+                nr_iterations, best_sequence = local_search(n=setting.size, stop_criterium=setting.stop_criterium, budget=setting.budget, f_eval=f_eval,
+                                                            time_limit=setting.time_limit, output_file=f'results/results_algorithm/{file_name}.txt', write=True,
+                                                            printing=printing, init=init, batch_size=pool.processes,
+                                                            f_eval_batch=f_eval_batch)
         elif setting.method == "random_search":
             nr_iterations, best_sequence = random_search(n=setting.size, stop_criterium=setting.stop_criterium,
                                                         budget=setting.budget, f_eval=f_eval,
@@ -73,7 +105,24 @@ if __name__ == '__main__':
                                                         printing=printing)
         elif setting.method == "iterated_greedy":
             nr_iterations, best_sequence = iterated_greedy(n=setting.size, init=init, stop_criterium=setting.budget, budget=setting.budget,
-                                                           f_eval=f_eval, printing=False, output_file=f'results/results_algorithm/{file_name}.txt')
+                                                           f_eval=f_eval, printing=False, output_file=f'results/results_algorithm/{file_name}.txt',
+                                                           checkpoint_file=checkpoint_file, resume=True)
+        elif setting.method == "tabu_search":
+            nr_iterations, best_sequence = tabu_search(n=setting.size, stop_criterium=setting.stop_criterium, budget=setting.budget, f_eval=f_eval,
+                                                       time_limit=setting.time_limit, output_file=f'results/results_algorithm/{file_name}.txt', write=True,
+                                                       printing=printing, init=init, checkpoint_file=checkpoint_file, resume=True)
+        elif setting.method == "genetic_algorithm":
+            # A whole generation is evaluated at once by a pool of worker processes, using all cores
+            with SharedPlanPool(instance, simulator=setting.simulator, sim_time=size*1000000, claim=setting.claim,
+                                dispatching=setting.dispatching) as pool:
+                f_eval_batch = lambda sequences: pool.fitness_many(sequences, setting)
+                nr_iterations, best_sequence = genetic_algorithm(n=setting.size, init=init, stop_criterium=setting.stop_criterium,
+                                                                 budget=setting.budget, f_eval=f_eval, f_eval_batch=f_eval_batch,
+                                                                 time_limit=setting.time_limit, printing=printing,
+                                                                 output_file=f'results/results_algorithm/{file_name}.txt')
+
+        # Keep the history of the run in the binary results store
+        store.import_text(setting, f'results/results_algorithm/{file_name}.txt')
 
         # Save output in resource usage table
         if setting.simulator == "simulator_1":
@@ -82,13 +131,15 @@ if __name__ == '__main__':
             from classes.simulator_2 import Simulator
         elif setting.simulator == "simulator_3":
             from classes.simulator_3 import Simulator
+        elif setting.simulator == "simulator_3_lean":
+            from classes.simulator_3_lean import Simulator
         else:
             print('WARNING: simulator not defined')
 
         plan = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
         sequence = best_sequence
         plan.set_sequence(sequence)
-        simulator = Simulator(plan, printing=False)
+        simulator = Simulator(plan, printing=False, claim=setting.claim, dispatching=setting.dispatching)
         makespan, lateness = simulator.simulate(SIM_TIME=size*1000000, RANDOM_SEED=setting.seed, write=True,
                                                          output_location=f"results/resource_usage/{file_name}.csv")
 
@@ -101,9 +152,12 @@ if __name__ == '__main__':
                            "costs": 0.5 * makespan + 0.5 * lateness,
                            "l1": setting.l1,
                            "l2": setting.l2,
-                           "seed": setting.seed})
+                           "seed": setting.seed,
+                           "seed_independent": plan.is_deterministic()})
         dataframe = pd.DataFrame(data_table)
         dataframe.to_csv("results/summary_tables/global search.csv")
+        cache.save(key, setting, instance_file, sources, data_table[-1],
+                   files=[f'results/results_algorithm/{file_name}.txt', f"results/resource_usage/{file_name}.csv"])
 
 
 
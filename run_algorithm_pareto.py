@@ -0,0 +1,31 @@
+import numpy as np
+import random
+import pandas as pd
+from classes.general import Settings, evaluator_simpy_objectives
+from classes.pareto import ParetoArchive
+from methods.local_search import local_search
+"""
+This script runs one local search per instance and keeps all non-dominated (makespan, tardiness) trade-offs it
+evaluates. The best sequence for every weight vector (l1, l2) of the grid is then read from the archive, instead of
+running a search per weight vector.
+"""
+
+if __name__ == '__main__':
+    grid = [(round(l1, 1), round(1 - l1, 1)) for l1 in np.arange(0, 1.05, 0.1)]
+    for id in range(1, 4):
+        setting = Settings(method="local_search", stop_criterium="Budget", budget=200, instance=f'20_{id}_factory_1',
+                           size=20, simulator="simulator_3", objective="pareto", init="random", seed=1, l1=0.5, l2=0.5)
+        random.seed(setting.seed)
+        np.random.seed(setting.seed)
+        instance = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
+
+        archive = ParetoArchive()
+        f_objectives = lambda x: evaluator_simpy_objectives(plan=instance, sequence=x, setting=setting,
+                                                            sim_time=setting.size * 1000000)
+        f_eval = archive.evaluator(f_objectives, weights=(setting.l1, setting.l2))
+        local_search(n=setting.size, stop_criterium=setting.stop_criterium, budget=setting.budget, f_eval=f_eval,
+                     printing=False, write=False)
+
+        print(f"{setting.instance}: {len(archive)} non-dominated sequences in {archive.nr_evaluations} evaluations")
+        archive.to_dataframe().to_csv(f"results/summary_tables/pareto front {setting.instance}.csv")
+        archive.grid(grid).to_csv(f"results/summary_tables/pareto grid {setting.instance}.csv")
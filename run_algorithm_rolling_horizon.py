@@ -1,15 +1,12 @@
-import numpy as np
-import copy
 from methods.local_search import local_search
+from methods.rolling_horizon import rolling_horizon, combine_sequences
 from classes.general import evaluator_simpy, Settings
+from classes.results_store import ResultsStore
+from classes.run_cache import RunCache, source_files
 import pandas as pd
 import time
 
 
-def combine_sequences(fixed, i):
-    return list(np.concatenate([fixed, i]))
-
-
 setting_list = []
 data_table = []
 simulator = "simulator_3"
@@ -29,32 +26,27 @@ for seed in range(4, 5):
                                            objective=f'l1={l1}_l2={l2}', init="random", seed=seed, l1=l1, l2=l2, k=k, m=m)
                         setting_list.append(setting)
 
+store = ResultsStore()
+cache = RunCache()
 for setting in setting_list:
-    start = time.time()
     file_name = setting.make_file_name()
-    instance = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
+    # Skip runs of which the settings, instance, simulator and methods are unchanged
+    instance_file = f"factory_data/instances/instance_{setting.instance}.pkl"
+    sources = source_files(setting.simulator, ["rolling_horizon", "local_search"])
+    key = cache.key(setting, instance_file, sources)
+    if key in cache:
+        print(f"Reuse cached run {file_name}")
+        data_table.append(cache.load(key))
+        pd.DataFrame(data_table).to_csv("results/summary_tables/rolling horizon")
+        continue
 
-    fixed = []
-    # Important, the f_eval considers the previously solved subinstances
-    f_eval = lambda x, i: evaluator_simpy(plan=instance, sequence=combine_sequences(fixed, x), setting=setting,
-                                          sim_time=setting.size*300000, printing=False)
-
-    k = setting.k
-    m = setting.m
-    n = setting.size
-    productionplan = list(range(0, n))
-    nr_iterations = n/m
-    budget_per_iteration = round(setting.budget/nr_iterations)
+    start = time.time()
+    instance = pd.read_pickle(instance_file)
 
-    for i in range(0, round(nr_iterations)):
-        x = copy.copy(productionplan[i*m:i*m+k])
-        print(f'To optimize is {x}')
-        nr_iterations, best_sequence = local_search(n=n, f_eval=f_eval, stop_criterium="Budget",
-                                                    budget=budget_per_iteration,  printing=False, write=False, init=x)
-        print(best_sequence)
-        productionplan[i*m:i*m+k] = copy.copy(best_sequence)
-        fixed = productionplan[0: (i+1) * m]
-        print(f'We now fixed {fixed}')
+    f_eval = lambda fixed, x, i: evaluator_simpy(plan=instance, sequence=combine_sequences(fixed, x), setting=setting,
+                                                 sim_time=setting.size*300000, printing=False)
+    productionplan = rolling_horizon(n=setting.size, f_eval=f_eval, k=setting.k, m=setting.m, budget=setting.budget,
+                                     search_method=local_search)
 
     if setting.simulator == "simulator_1":
         from classes.simulator_1 import Simulator
@@ -62,7 +54,9 @@ for setting in setting_list:
         from classes.simulator_2 import Simulator
     if setting.simulator == "simulator_3":
         from classes.simulator_3 import Simulator
-    simulator = Simulator(instance, printing=False)
+    if setting.simulator == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
+    simulator = Simulator(instance, printing=False, claim=setting.claim, dispatching=setting.dispatching)
     makespan, lateness = simulator.simulate(SIM_TIME=setting.size*300000, RANDOM_SEED=setting.seed, write=True,
                                              output_location=f"results/resource_usage/{file_name}.csv")
     runtime = time.time() - start
@@ -75,6 +69,7 @@ for setting in setting_list:
     results['Best_fitness'] = [setting.l1 * makespan + setting.l2 * lateness]
     results['Best_sequence'] = [productionplan]
     results.to_csv(f'results/results_algorithm/{file_name}.txt', header=True, index=False)
+    store.save(setting, results)
     data_table.append({"instance": setting.instance,
                        "method": setting.method,
                        "budget": setting.budget,
@@ -88,5 +83,7 @@ for setting in setting_list:
                        "time": runtime})
     dataframe = pd.DataFrame(data_table)
     dataframe.to_csv("results/summary_tables/rolling horizon")
+    cache.save(key, setting, instance_file, sources, data_table[-1],
+               files=[f'results/results_algorithm/{file_name}.txt', f"results/resource_usage/{file_name}.csv"])
 
 
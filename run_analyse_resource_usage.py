@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+from classes.analytics import compare_schedules
+"""
+This script computes utilisation, waiting times and bottleneck shares per resource group for all resource usage
+tables in results/resource_usage, and writes them to one summary table.
+"""
+
+factory_name = "factory_1"
+factory = pd.read_pickle(f"factory_data/{factory_name}.pkl")
+
+traces = {}
+for file_name in sorted(os.listdir("results/resource_usage")):
+    if file_name.endswith(".csv") and factory_name in file_name:
+        trace = pd.read_csv(f"results/resource_usage/{file_name}", index_col=0)
+        if "Resource" in trace:
+            traces[file_name[:-4]] = trace
+
+table = compare_schedules(traces, capacity=factory)
+print(table.groupby("Resource")[["Utilisation", "Mean wait", "Bottleneck share"]].mean())
+table.to_csv("results/summary_tables/resource analytics.csv")
@@ -0,0 +1,14 @@
+from classes.results_store import ResultsStore
+"""
+This script adds all runs in results/results_algorithm to the binary results store, and summarises the best fitness
+per method and instance size from the index of the store, without opening the runs.
+"""
+
+if __name__ == '__main__':
+    store = ResultsStore()
+    new_runs = store.import_directory()
+    print(f"{len(new_runs)} runs added, the store has {len(store.index)} runs")
+
+    summary = store.index.groupby(["method", "size", "objective"])["best_fitness"].agg(["count", "mean", "min"])
+    print(summary)
+    summary.to_csv("results/summary_tables/results store summary.csv")
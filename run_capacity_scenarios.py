@@ -0,0 +1,27 @@
+import pandas as pd
+from classes.general import Settings
+from classes.results_store import ResultsStore
+from classes.scenarios import run_scenarios, capacity_variants
+"""
+This script evaluates the best sequence found by a search algorithm under capacity what-if scenarios: one machine
+more or less per resource group, and faster filtration. All scenarios are simulated in parallel.
+"""
+
+if __name__ == '__main__':
+    l1 = 0.5
+    l2 = 0.5
+    setting = Settings(method="local_search", stop_criterium="Budget", budget=200 * (20 / 20),
+                       instance=f'20_1_factory_1', size=20, simulator="simulator_3",
+                       objective=f'l1={l1}_l2={l2}', init="random", seed=1, l1=l1, l2=l2)
+
+    # read in best sequence
+    sequence = ResultsStore().best_sequence(setting)
+
+    plan = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
+    scenarios = capacity_variants(plan.FACTORY)
+    scenarios.append({"name": "Filters A 20% faster", "processing_time_factor": {"Filters A": 0.8}})
+
+    table = run_scenarios(plan, sequence, scenarios, simulator=setting.simulator, seeds=range(1, 4))
+    table["Fitness"] = l1 * table["Makespan"] + l2 * table["Tardiness"]
+    print(table.groupby("Scenario", sort=False)[["Makespan", "Tardiness", "Fitness"]].mean())
+    table.to_csv(f"results/summary_tables/capacity scenarios {setting.instance}.csv")
@@ -0,0 +1,21 @@
+from classes.evaluation_server import EvaluationServer
+"""
+This script starts a local evaluation server, that keeps the production plans loaded and evaluates the sequences
+of many search processes in batches. Search processes connect with classes.evaluation_server.EvaluationClient,
+which can be used as f_eval:
+
+    f_eval = EvaluationClient(setting, address="127.0.0.1:8765", sim_time=size*1000000)
+"""
+
+address = "127.0.0.1:8765"  # or the path of a Unix socket, e.g. "/tmp/simpy_manufacturing.sock"
+processes = None  # number of worker processes, None uses all cores
+instances = []
+factory_name = "factory_1"
+for size in [20, 40]:
+    for id in range(1, 10):
+        instances.append(f'{size}_{id}_{factory_name}')
+
+if __name__ == '__main__':
+    server = EvaluationServer(address=address, processes=processes, batch_window=0.005, max_batch=64,
+                              instances=instances)
+    server.run()
@@ -0,0 +1,21 @@
+import sys
+import pandas as pd
+from classes.run_cache import RunCache
+"""
+This script lists the cached experiment runs, or removes the stale ones: runs of which the instance, simulator or
+search method has changed since they were computed.
+    python run_manage_run_cache.py list
+    python run_manage_run_cache.py gc
+"""
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    cache = RunCache()
+    if command == "list":
+        table = pd.DataFrame(cache.list())
+        print(table.to_string() if len(table) else "The run cache is empty")
+    elif command == "gc":
+        removed = cache.gc()
+        print(f"Removed {len(removed)} stale runs, {len(cache.keys())} runs are left")
+    else:
+        print(f"Unknown command {command}, use list or gc")
@@ -1,4 +1,5 @@
 from classes.general import Settings
+from classes.results_store import ResultsStore
 import pandas as pd
 """
 This script can be used to obtain the resource usage of a solution to a problem instance
@@ -25,17 +26,16 @@ for setting in settings_list:
         from classes.simulator_2 import Simulator
     elif setting.simulator == "simulator_3":
         from classes.simulator_3 import Simulator
+    elif setting.simulator == "simulator_3_lean":
+        from classes.simulator_3_lean import Simulator
 
     # read in best sequence
-    data = pd.read_csv(f'results/results_algorithm/{file_name}.txt')
-    data_x = data["Best_sequence"].tolist()[-1]
-    data_x = data_x[1:-1].split(", ")
-    data_x = [int(i) for i in data_x]
+    data_x = ResultsStore().best_sequence(setting)
 
     plan = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
     sequence = data_x
     for SEED in range(1, 2):
         plan.set_sequence(sequence)
-        simulator = Simulator(plan, printing=True)
+        simulator = Simulator(plan, printing=True, claim=setting.claim, dispatching=setting.dispatching)
         makespan, tardiness = simulator.simulate(SIM_TIME=300000, RANDOM_SEED=SEED, write=True,
                                                  output_location=f"results/resource_usage/{file_name}.csv")
\ No newline at end of file
@@ -0,0 +1,16 @@
+from classes.gantt import render_directory
+"""
+This script rasterises the gannt charts of all resource usage tables in results/resource_usage in parallel.
+It only needs numpy and pandas, which makes it suitable for large (e.g. 240 product) schedules.
+"""
+
+processes = None  # number of worker processes, None uses all cores
+width = 2000  # number of pixels of the time axis
+row_height = 12  # number of pixels per machine
+window = None  # e.g. (0, 2000) to plot only a time window
+resources = None  # e.g. ["Fermenter_1", "Filters A"] to plot only a subset of the resource groups
+
+if __name__ == '__main__':
+    written = render_directory(input_dir="results/resource_usage", output_dir="results/gannts", processes=processes,
+                               width=width, row_height=row_height, window=window, resources=resources)
+    print(f'Saved {len(written)} gannt charts to "results/gannts"')
@@ -1,6 +1,6 @@
 import altair_viewer
 import pandas as pd
-import altair as alt
+from classes.gantt import gantt_chart
 from classes.general import Settings
 """
 This script can be used to make a gannt chart from the resource usage table
@@ -11,6 +11,9 @@ It requires the altair_viewer / altair package
 simulator_name = "simulator_3"
 
 modus = "save"
+max_width = 2000
+window = None  # e.g. (0, 2000) to plot only a time window
+resources = None  # e.g. ["Fermenter_1", "Filters A"] to plot only a subset of the resource groups
 settings_list = []
 for factory_name in ["factory_1"]:
     for seed in range(1, 2):
@@ -33,18 +36,8 @@ for setting in settings_list:
     schedule["Machine_id"] = [f'_id={i}' for i in schedule["Machine_id"].tolist()]
     schedule['Machine'] = schedule['Resource'] + schedule['Machine_id']
 
-    width_formula = max(schedule["Finish"])
-    # Plot schedule for claim times
-    chart1 = alt.Chart(schedule).mark_bar().encode(
-        x='Retrieve moment',
-        x2='Finish',
-        y='Machine',
-        color=alt.Color('Product:N',
-                        legend=alt.Legend(padding=5))
-    ).properties(
-        width=width_formula,
-        height=700
-    )
+    # Bars are aggregated to the time per pixel and the chart width is bounded, see classes/gantt.py
+    chart1 = gantt_chart(schedule, max_width=max_width, height=700, window=window, resources=resources)
 
     if modus == "save":
         chart1.save(f'results/gannts/{file_name}.png')
@@ -0,0 +1,28 @@
+import time
+import pandas as pd
+from classes.general import Settings
+from classes.results_store import ResultsStore
+from classes.rescheduling import Rescheduler
+"""
+This script adds new orders to the best sequence found by a search algorithm while it is being executed: the products
+released before the wall time are frozen, the new orders are appended and the rest of the sequence is optimised
+again with local search, without simulating the frozen part.
+"""
+
+if __name__ == '__main__':
+    l1 = 0.5
+    l2 = 0.5
+    setting = Settings(method="local_search", stop_criterium="Budget", budget=200 * (20 / 20),
+                       instance=f'20_1_factory_1', size=20, simulator="simulator_3",
+                       objective=f'l1={l1}_l2={l2}', init="random", seed=1, l1=l1, l2=l2)
+
+    # read in best sequence
+    sequence = ResultsStore().best_sequence(setting)
+    plan = pd.read_pickle(f"factory_data/instances/instance_{setting.instance}.pkl")
+
+    start = time.time()
+    rescheduler = Rescheduler(plan, sequence, freeze_time=30, l1=l1, l2=l2, seed=setting.seed)
+    new_products = rescheduler.add_orders([(plan.FACTORY.PRODUCTS[0].NAME, 500), (plan.FACTORY.PRODUCTS[1].NAME, 800)])
+    print(f"Fitness with the new orders {new_products} at the end: {rescheduler.evaluate(rescheduler.tail)}")
+    sequence, fitness = rescheduler.reschedule(method="local_search", budget=50)
+    print(f"Rescheduled sequence {sequence} with fitness {fitness}, in {time.time() - start:.1f} seconds")
@@ -0,0 +1,26 @@
+from methods.racing import successive_halving
+"""
+This script tunes the search methods by racing: all configurations run in parallel on a shared budget and the
+configurations with a bad mean rank are dropped early (successive halving), instead of running every setting with
+the full budget.
+"""
+
+factory_name = "factory_1"
+sizes = [20, 40]
+instances = [(f'{size}_{id}_{factory_name}', size) for size in sizes for id in range(1, 6)]
+seeds = [1, 2]
+
+configurations = []
+for d in [3, 5, 7, 9]:
+    for init in ["random", "sorted"]:
+        configurations.append({"method": "iterated_greedy", "init": init, "d": d})
+for init in ["random", "sorted"]:
+    configurations.append({"method": "local_search", "init": init})
+configurations.append({"method": "random_search", "init": "random"})
+for (k, m) in [(10, 5), (20, 10), (40, 10), (40, 20)]:
+    configurations.append({"method": "rolling_horizon", "k": k, "m": m})
+
+if __name__ == '__main__':
+    survivors, table = successive_halving(configurations, instances, min_budget=25, eta=2, seeds=seeds,
+                                          simulator="simulator_3", l1=0.5, l2=0.5,
+                                          output_file=f"results/summary_tables/racing {factory_name}.csv")
@@ -0,0 +1,117 @@
+import os
+import random
+import pytest
+import simpy
+import pandas as pd
+from importlib import import_module
+from classes.classes import Factory, Product, Activity, ProductionPlan
+from classes.resources import MachineStore, PriorityMachineStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIMULATORS = ["simulator_1", "simulator_2", "simulator_3", "simulator_3_lean"]
+
+
+def load_instance(name):
+    return pd.read_pickle(os.path.join(ROOT, "factory_data", "instances", f"instance_{name}.pkl"))
+
+
+def small_plan(needs):
+    """Plan of two products with one activity of 10 time units, that needs `needs` machines of a group of 2"""
+    factory = Factory(NAME="Test", RESOURCE_NAMES=["Tank"], CAPACITY=[2])
+    product = Product(NAME="Enzyme", ID=0)
+    product.add_activity(activity=Activity(ID=0, PROCESSING_TIME=[10, 10], PRODUCT="Enzyme", PRODUCT_ID="0",
+                                           NEEDS=[needs]))
+    product.set_temporal_relations(TEMPORAL_RELATIONS={})
+    factory.add_product(product=product)
+    plan = ProductionPlan(ID=0, SIZE=2, NAME="Test", FACTORY=factory, PRODUCT_IDS=[0, 0], DEADLINES=[20, 30])
+    plan.list_products()
+    plan.set_sequence(sequence=[0, 1])
+    return plan
+
+
+@pytest.mark.parametrize("simulator_name", SIMULATORS)
+@pytest.mark.parametrize("instance", ["20_1_factory_1", "20_3_factory_1"])
+def test_bundle_claims_match_unit_claims_on_factory_1(simulator_name, instance):
+    # In factory_1 no activity needs several machines that are contended, so both claims give the same schedule
+    Simulator = import_module(f"classes.{simulator_name}").Simulator
+    plan = load_instance(instance)
+    for k in range(0, 3):
+        plan.set_sequence(random.Random(k).sample(range(0, 20), 20))
+        unit = Simulator(plan, claim="unit").simulate(SIM_TIME=20000000, RANDOM_SEED=1)
+        bundle = Simulator(plan, claim="bundle").simulate(SIM_TIME=20000000, RANDOM_SEED=1)
+        assert unit == bundle
+
+
+def test_machine_store_does_not_hold_machines_of_a_waiting_bundle():
+    env = simpy.Environment()
+    store = MachineStore(env, ["A", "B"], [1, 1])
+    granted = {}
+
+    def claim(name, needs, start, duration):
+        yield env.timeout(start)
+        machines = yield store.get(needs)
+        granted[name] = env.now
+        yield env.timeout(duration)
+        yield store.put(machines)
+
+    env.process(claim("holder", [("B", 1)], 0, 10))
+    env.process(claim("bundle", [("A", 1), ("B", 1)], 1, 1))
+    env.process(claim("single", [("A", 1)], 2, 3))
+    env.run()
+    # The single request is granted while the bundle waits for B, the bundle when both are free again
+    assert granted == {"holder": 0, "single": 2, "bundle": 10}
+
+
+def test_priority_store_serves_lowest_priority_first():
+    env = simpy.Environment()
+    store = PriorityMachineStore(env, ["A"], [1])
+    order = []
+
+    def claim(name, priority, start, duration):
+        yield env.timeout(start)
+        machines = yield store.get([("A", 1)], priority=priority)
+        order.append(name)
+        yield env.timeout(duration)
+        yield store.put(machines)
+
+    env.process(claim("holder", 0, 0, 10))
+    env.process(claim("late", 3, 1, 1))
+    env.process(claim("first", 1, 2, 1))
+    env.process(claim("second", 1, 3, 1))
+    env.run()
+    # Lowest priority first, ties in the order of arrival
+    assert order == ["holder", "first", "second", "late"]
+
+
+@pytest.mark.parametrize("dispatching", ["fifo", "sequence", "deadline", "slack"])
+@pytest.mark.parametrize("claim", ["unit", "bundle"])
+def test_lean_simulator_matches_simulator_3_under_priority_dispatching(dispatching, claim):
+    from classes.simulator_3 import Simulator
+    from classes.simulator_3_lean import Simulator as LeanSimulator
+    plan = load_instance("20_3_factory_1")
+    plan.set_sequence(random.Random(1).sample(range(0, 20), 20))
+    result = Simulator(plan, claim=claim, dispatching=dispatching).simulate(SIM_TIME=20000000, RANDOM_SEED=1)
+    assert result[0] < float("inf")
+    assert LeanSimulator(plan, claim=claim, dispatching=dispatching).simulate(SIM_TIME=20000000,
+                                                                              RANDOM_SEED=1) == result
+
+
+@pytest.mark.parametrize("simulator_name", SIMULATORS)
+def test_plan_that_does_not_fit_is_infeasible(simulator_name):
+    Simulator = import_module(f"classes.{simulator_name}").Simulator
+    simulator = Simulator(small_plan(needs=3))
+    assert simulator.simulate(SIM_TIME=1000, RANDOM_SEED=1) == (float("inf"), float("inf"))
+    assert not simulator.feasible
+    assert "the capacity is 2" in simulator.infeasibility
+
+
+@pytest.mark.parametrize("simulator_name", SIMULATORS)
+@pytest.mark.parametrize("claim", ["unit", "bundle"])
+def test_stalled_simulation_ends_early(simulator_name, claim):
+    Simulator = import_module(f"classes.{simulator_name}").Simulator
+    plan = small_plan(needs=3)
+    # Skip the check up front, the activity then waits for machines that never come
+    plan.check_feasibility = lambda: []
+    simulator = Simulator(plan, claim=claim)
+    assert simulator.simulate(SIM_TIME=1000000, RANDOM_SEED=1) == (float("inf"), float("inf"))
+    assert simulator.infeasibility.startswith("stalled")